@@ -5,6 +5,9 @@ import easygraph.utils
 
 import easygraph.datasets
 
+import easygraph.readwrite
+from easygraph.readwrite import *
+
 import easygraph.functions
 from easygraph.functions import *
 
@@ -1,2 +1,4 @@
 from .graph import Graph
-from .directed_graph import DiGraph
\ No newline at end of file
+from .directed_graph import DiGraph
+from .csr_graph import CSRGraph
+from .graph_view import SubgraphView
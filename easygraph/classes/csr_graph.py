@@ -0,0 +1,578 @@
+from collections.abc import Mapping
+
+import numpy as np
+
+__all__ = [
+    "CSRGraph"
+]
+
+
+class CSRGraph(object):
+    """
+    Read-only snapshot of a Graph or DiGraph in compressed sparse row (CSR) form.
+
+    The adjacency is kept in three flat NumPy arrays instead of a dict-of-dict:
+    the neighbors of the node with index `i` are ``indices[indptr[i]:indptr[i+1]]``
+    and the corresponding edge weights are ``weights[indptr[i]:indptr[i+1]]``.
+    Nodes are mapped to contiguous indices by `index_of_node` / `node_of_index`.
+
+    A `CSRGraph` is immutable. Traversal-heavy functions, e.g. `single_source_bfs`,
+    `betweenness_centrality`, `closeness_centrality` and `connected_components`,
+    detect it and run directly on the arrays. All the other functions still work
+    through the read-only `adj` view, at the speed of the dict-based graph.
+
+    Parameters
+    ----------
+    indptr : numpy.ndarray
+        Row pointer array of length n + 1.
+
+    indices : numpy.ndarray
+        Column (neighbor) index array of length indptr[-1].
+
+    weights : numpy.ndarray
+        Edge weight array aligned with *indices*.
+
+    nodes : list
+        The node of each index.
+
+    directed : boolean, optional (default : False)
+        Whether the snapshot is directed.
+
+    weight : string or None, optional (default : 'weight')
+        The edge attribute key the weights were read from.
+
+    node_attr : list of dict or None, optional (default : None)
+        The node attributes aligned with *nodes*.
+
+    graph_attr : dict or None, optional (default : None)
+        Attributes of the graph.
+
+    See Also
+    --------
+    Graph.freeze
+    DiGraph.freeze
+
+    Examples
+    --------
+    Take a snapshot of an existing graph *G*
+
+    >>> G_csr = G.freeze()
+
+    or equivalently
+
+    >>> G_csr = eg.CSRGraph.from_graph(G, weight='weight')
+
+    The arrays and node mapping
+
+    >>> G_csr.indptr, G_csr.indices, G_csr.weights
+    >>> G_csr.index_of_node['Jack']
+
+    """
+
+    def __init__(self, indptr, indices, weights, nodes, directed=False, weight='weight',
+                 node_attr=None, graph_attr=None):
+        self.indptr = _readonly(indptr)
+        self.indices = _readonly(indices)
+        self.weights = _readonly(weights)
+        self.node_of_index = list(nodes)
+        self.index_of_node = {node: i for i, node in enumerate(self.node_of_index)}
+        self.weight = weight
+        self.graph = dict(graph_attr or {})
+        if node_attr is None:
+            node_attr = [dict() for i in range(len(self.node_of_index))]
+        self._node = dict(zip(self.node_of_index, node_attr))
+        self._directed = directed
+        self._in_csr = None
+        self._tails = None
+        self._csgraph = None
+        assert len(self.indptr) == len(self.node_of_index) + 1, \
+            "indptr must have one more entry than there are nodes."
+        assert len(self.indices) == len(self.weights) == self.indptr[-1], \
+            "indices and weights must both have indptr[-1] entries."
+
+    @classmethod
+    def from_graph(cls, G, weight='weight'):
+        """Returns a CSR snapshot of *G*.
+
+        Parameters
+        ----------
+        G : easygraph.Graph or easygraph.DiGraph
+
+        weight : string or None, optional (default : 'weight')
+            The key for edge weight. Edges without this attribute get weight 1.
+            If None, all the weights will be 1.
+
+        Returns
+        -------
+        G_csr : easygraph.CSRGraph
+            The read-only snapshot of *G*.
+
+        """
+        if isinstance(G, CSRGraph):
+            return G
+        nodes = list(G.nodes)
+        n = len(nodes)
+        index_of_node = {node: i for i, node in enumerate(nodes)}
+        adj = G.adj
+        degrees = np.fromiter((len(adj[u]) for u in nodes), dtype=np.int64, count=n)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(degrees, out=indptr[1:])
+        m = int(indptr[-1])
+        indices = np.fromiter((index_of_node[v] for u in nodes for v in adj[u]),
+                              dtype=_index_dtype(n), count=m)
+        if weight is None:
+            weights = np.ones(m, dtype=np.float64)
+        else:
+            weights = np.fromiter((data.get(weight, 1) for u in nodes for data in adj[u].values()),
+                                  dtype=np.float64, count=m)
+        node_attr = [dict(G.nodes[u]) for u in nodes]
+        return cls(indptr, indices, weights, nodes, directed=G.is_directed(), weight=weight,
+                   node_attr=node_attr, graph_attr=G.graph)
+
+    def __getstate__(self):
+        # Cached derived arrays are cheap to rebuild, do not ship them to other processes
+        state = self.__dict__.copy()
+        state['_in_csr'] = state['_tails'] = state['_csgraph'] = None
+        return state
+
+    def __iter__(self):
+        return iter(self.node_of_index)
+
+    def __len__(self):
+        return len(self.node_of_index)
+
+    def __contains__(self, node):
+        try:
+            return node in self.index_of_node
+        except TypeError:
+            return False
+
+    def __getitem__(self, node):
+        return _CSRNeighborView(self, self.index_of_node[node])
+
+    @property
+    def adj(self):
+        return _CSRAdjacencyView(self)
+
+    @property
+    def nodes(self):
+        return self._node
+
+    @property
+    def edges(self):
+        edges = list()
+        nodes = self.node_of_index
+        indptr, indices, weights = self.indptr.tolist(), self.indices.tolist(), self.weights.tolist()
+        for i in range(len(nodes)):
+            for p in range(indptr[i], indptr[i + 1]):
+                j = indices[p]
+                if self._directed or i <= j:
+                    edges.append((nodes[i], nodes[j], self._edge_attr(weights[p])))
+        return edges
+
+    def _edge_attr(self, w):
+        return {} if self.weight is None else {self.weight: float(w)}
+
+    def is_directed(self):
+        return self._directed
+
+    def freeze(self, weight='weight'):
+        return self
+
+    def has_node(self, node):
+        return node in self
+
+    def has_edge(self, u, v):
+        try:
+            return v in self[u]
+        except KeyError:
+            return False
+
+    def number_of_nodes(self):
+        """Returns the number of nodes.
+
+        Returns
+        -------
+        number_of_nodes : int
+            The number of nodes.
+        """
+        return len(self.node_of_index)
+
+    def number_of_edges(self):
+        """Returns the number of edges.
+
+        Returns
+        -------
+        number_of_edges : int
+            The number of edges.
+        """
+        return int(self.size())
+
+    def neighbors(self, node):
+        """Returns an iterator of a node's neighbors (successors for directed snapshot).
+
+        Parameters
+        ----------
+        node : object
+            The target node.
+
+        Returns
+        -------
+        neighbors : iterator
+            An iterator of a node's neighbors.
+
+        """
+        try:
+            i = self.index_of_node[node]
+        except KeyError:
+            print("No node {}".format(node))
+            return
+        nodes = self.node_of_index
+        return (nodes[j] for j in self.indices[self.indptr[i]:self.indptr[i + 1]])
+
+    successors = neighbors
+
+    def predecessors(self, node):
+        """Returns an iterator of a node's predecessors.
+
+        Parameters
+        ----------
+        node : object
+            The target node.
+
+        Returns
+        -------
+        predecessors : iterator
+            An iterator of a node's predecessors.
+
+        """
+        try:
+            i = self.index_of_node[node]
+        except KeyError:
+            print("No node {}".format(node))
+            return
+        in_indptr, in_indices, _ = self.in_csr()
+        nodes = self.node_of_index
+        return (nodes[j] for j in in_indices[in_indptr[i]:in_indptr[i + 1]])
+
+    def all_neighbors(self, node):
+        if not self._directed:
+            return self.neighbors(node)
+        neighbors = list(self.neighbors(node))
+        neighbors.extend(self.predecessors(node))
+        return iter(neighbors)
+
+    def in_csr(self):
+        """Returns the CSR arrays of the reversed adjacency.
+
+        For undirected snapshot they are the same arrays as `indptr`, `indices`, `weights`.
+
+        Returns
+        -------
+        in_indptr, in_indices, in_weights : numpy.ndarray
+            The in-neighbors of the node with index `i` are ``in_indices[in_indptr[i]:in_indptr[i+1]]``.
+
+        """
+        if not self._directed:
+            return self.indptr, self.indices, self.weights
+        if self._in_csr is None:
+            n = len(self)
+            order = np.argsort(self.indices, kind='stable')
+            in_indptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.indices, minlength=n), out=in_indptr[1:])
+            self._in_csr = (_readonly(in_indptr), _readonly(self.tails()[order]),
+                            _readonly(self.weights[order]))
+        return self._in_csr
+
+    def out_degree(self, weight='weight'):
+        """Returns the weighted out degree of each node.
+
+        Only the weight the snapshot was taken with is available. For any other
+        *weight* key, all the weights will be regarded as 1.
+
+        Parameters
+        ----------
+        weight : string, optinal (default : 'weight')
+            Weight key of the original weighted graph.
+
+        Returns
+        -------
+        out_degree : dict
+            Each node's (key) weighted out degree (value).
+
+        """
+        return dict(zip(self.node_of_index, self._degree_array(self.indptr, self.weights, weight).tolist()))
+
+    def in_degree(self, weight='weight'):
+        """Returns the weighted in degree of each node.
+
+        Only the weight the snapshot was taken with is available. For any other
+        *weight* key, all the weights will be regarded as 1.
+
+        Parameters
+        ----------
+        weight : string, optinal (default : 'weight')
+            Weight key of the original weighted graph.
+
+        Returns
+        -------
+        in_degree : dict
+            Each node's (key) weighted in degree (value).
+
+        """
+        in_indptr, _, in_weights = self.in_csr()
+        return dict(zip(self.node_of_index, self._degree_array(in_indptr, in_weights, weight).tolist()))
+
+    def degree(self, weight='weight'):
+        """Returns the weighted degree of each node.
+
+        For directed snapshot, it returns the sum of out degree and in degree.
+        Only the weight the snapshot was taken with is available. For any other
+        *weight* key, all the weights will be regarded as 1.
+
+        Parameters
+        ----------
+        weight : string, optinal (default : 'weight')
+            Weight key of the original weighted graph.
+
+        Returns
+        -------
+        degree : dict
+            Each node's (key) weighted degree (value).
+
+        """
+        degree = self._degree_array(self.indptr, self.weights, weight)
+        if self._directed:
+            in_indptr, _, in_weights = self.in_csr()
+            degree = degree + self._degree_array(in_indptr, in_weights, weight)
+        else:
+            # Self-loops are stored once but counted twice, as in Graph.degree
+            loops = self.tails() == self.indices
+            if loops.any():
+                loop_weights = self.weights[loops] if self._is_weight_key(weight) \
+                    else np.ones(int(loops.sum()))
+                degree = degree + np.bincount(self.indices[loops], weights=loop_weights,
+                                              minlength=len(self))
+        return dict(zip(self.node_of_index, degree.tolist()))
+
+    def _is_weight_key(self, weight):
+        return weight is not None and weight == self.weight
+
+    def _degree_array(self, indptr, weights, weight):
+        if not self._is_weight_key(weight):
+            return np.diff(indptr)
+        sums = np.zeros(len(self), dtype=np.float64)
+        nonempty = np.diff(indptr) > 0
+        if nonempty.any():
+            sums[nonempty] = np.add.reduceat(weights, indptr[:-1][nonempty])
+        return sums
+
+    def size(self, weight=None):
+        """Returns the number of edges or total of all edge weights.
+
+        Parameters
+        -----------
+        weight : String or None, optional
+            The weight key. If None, it will calculate the number of
+            edges, instead of total of all edge weights.
+
+        Returns
+        -------
+        size : int or float, optional (default: None)
+            The number of edges or total of all edge weights.
+
+        """
+        if self._directed:
+            s = self._degree_array(self.indptr, self.weights, weight).sum()
+            return int(s) if weight is None else float(s)
+        s = sum(self.degree(weight=weight).values())
+        return s // 2 if weight is None else s / 2
+
+    def copy(self):
+        """Returns a mutable deep copy of the snapshot.
+
+        Returns
+        -------
+        copy : easygraph.Graph or easygraph.DiGraph
+            A mutable graph with the same nodes, edges and edge weights.
+
+        Examples
+        --------
+        >>> G2 = G_csr.copy()
+        >>> G2.add_edge('Jack', 'Tom')
+
+        """
+        from easygraph.classes.graph import Graph
+        from easygraph.classes.directed_graph import DiGraph
+        G = DiGraph() if self._directed else Graph()
+        G.graph.update(self.graph)
+        for node, node_attr in self._node.items():
+            G.add_node(node, **node_attr)
+        for u, v, edge_data in self.edges:
+            G.add_edge(u, v, **edge_data)
+        return G
+
+    def without_nodes(self, nodes):
+        """Returns a read-only view of the graph with *nodes* hidden.
+
+        Nothing is copied, the view hides the nodes and their edges on the fly.
+        It is much cheaper than `copy` followed by `remove_nodes` when many
+        slightly different graphs are only read, e.g. to test the removal of
+        each node in turn.
+
+        Parameters
+        ----------
+        nodes : iterable of nodes
+            The nodes to hide.
+
+        Returns
+        -------
+        view : easygraph.SubgraphView
+            The view of the graph without *nodes*.
+
+        See Also
+        --------
+        SubgraphView
+
+        Examples
+        --------
+        >>> G_without_a = G.without_nodes(['a'])
+        >>> eg.connected_components(G_without_a)
+
+        """
+        from easygraph.classes.graph_view import SubgraphView
+        return SubgraphView(self, nodes)
+
+    def nodes_subgraph(self, from_nodes: list):
+        """Returns a mutable subgraph of some nodes.
+
+        Parameters
+        ----------
+        from_nodes : list of object
+            The nodes in subgraph.
+
+        Returns
+        -------
+        nodes_subgraph : easygraph.Graph or easygraph.DiGraph
+            The subgraph consisting of *from_nodes*.
+
+        """
+        from easygraph.classes.graph import Graph
+        from easygraph.classes.directed_graph import DiGraph
+        G = DiGraph() if self._directed else Graph()
+        G.graph.update(self.graph)
+        from_nodes = set(node for node in from_nodes if node in self.index_of_node)
+        for node in from_nodes:
+            G.add_node(node, **self._node[node])
+            for v, edge_data in self[node].items():
+                if v in from_nodes:
+                    G.add_edge(node, v, **edge_data)
+        return G
+
+    def ego_subgraph(self, center):
+        """Returns an ego network graph of a node.
+
+        Parameters
+        ----------
+        center : object
+            The center node of the ego network graph
+
+        Returns
+        -------
+        ego_subgraph : easygraph.Graph or easygraph.DiGraph
+            The ego network graph of *center*.
+
+        """
+        neighbors_of_center = list(self.all_neighbors(center))
+        neighbors_of_center.append(center)
+        return self.nodes_subgraph(from_nodes=neighbors_of_center)
+
+    def tails(self):
+        """Returns the index of the source node of each stored edge entry.
+
+        Returns
+        -------
+        tails : numpy.ndarray
+            The source node index of each entry, aligned with `indices` and `weights`.
+
+        """
+        if self._tails is None:
+            n = len(self)
+            self._tails = _readonly(np.repeat(np.arange(n, dtype=self.indices.dtype),
+                                              np.diff(self.indptr)))
+        return self._tails
+
+    def _as_csgraph(self):
+        if self._csgraph is None:
+            import scipy.sparse as sps
+            n = len(self)
+            self._csgraph = sps.csr_matrix((self.weights, self.indices, self.indptr), shape=(n, n))
+        return self._csgraph
+
+
+class _CSRAdjacencyView(Mapping):
+    """Read-only ``adj[u][v] -> edge attribute`` view of a CSRGraph."""
+    __slots__ = ('_csr',)
+
+    def __init__(self, csr):
+        self._csr = csr
+
+    def __getitem__(self, node):
+        return self._csr[node]
+
+    def __iter__(self):
+        return iter(self._csr.node_of_index)
+
+    def __len__(self):
+        return len(self._csr)
+
+    def __contains__(self, node):
+        return node in self._csr
+
+
+class _CSRNeighborView(Mapping):
+    """Read-only ``{neighbor: edge attribute}`` view of one row of a CSRGraph."""
+    __slots__ = ('_csr', '_start', '_stop')
+
+    def __init__(self, csr, index):
+        self._csr = csr
+        self._start = int(csr.indptr[index])
+        self._stop = int(csr.indptr[index + 1])
+
+    def _find(self, node):
+        j = self._csr.index_of_node.get(node, None)
+        if j is None:
+            return -1
+        row = self._csr.indices[self._start:self._stop]
+        hits = np.flatnonzero(row == j)
+        return self._start + int(hits[0]) if len(hits) else -1
+
+    def __getitem__(self, node):
+        p = self._find(node)
+        if p < 0:
+            raise KeyError(node)
+        return self._csr._edge_attr(self._csr.weights[p])
+
+    def __contains__(self, node):
+        try:
+            return self._find(node) >= 0
+        except TypeError:
+            return False
+
+    def __iter__(self):
+        nodes = self._csr.node_of_index
+        return (nodes[j] for j in self._csr.indices[self._start:self._stop])
+
+    def __len__(self):
+        return self._stop - self._start
+
+
+def _index_dtype(n):
+    return np.int32 if n < np.iinfo(np.int32).max else np.int64
+
+
+def _readonly(array):
+    # A read-only view, so that arrays passed in by the caller stay writeable
+    array = np.asarray(array).view()
+    array.flags.writeable = False
+    return array
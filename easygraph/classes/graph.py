@@ -385,7 +385,8 @@ class Graph(object):
             except Exception as err:
                 print(err)
     
-    def add_edges_from_file(self, file, weighted=False):
+    def add_edges_from_file(self, file, weighted=False, delimiter=None, comments='#',
+                            nodetype=None, chunk_size=1 << 24):
         """Added edges from file
         For example, txt files,
 
@@ -393,15 +394,35 @@ class Graph(object):
         a b 23.0
         which denotes an edge (a, b) with weight 23.0.
 
+        The file is read chunk by chunk, and the edges of each chunk are added at once,
+        so that edge lists of millions of lines load in seconds.
+
         Parameters
         ----------
         file : string
-            The file path.
+            The file path. Files ending with `.gz` or `.bz2` are decompressed on the fly.
 
         weighted : boolean, optional (default : False)
             If the file consists of weight infomation, set `True`.
             The weight key will be set as 'weight'.
 
+        delimiter : string or None, optional (default : None)
+            The column separator. If None, any whitespace or comma.
+
+        comments : string or None, optional (default : '#')
+            The lines starting with it, after any leading whitespace, are ignored.
+            If None, there are no comments.
+
+        nodetype : callable or None, optional (default : None)
+            Converts the node labels, e.g. `int`. If None, the nodes are strings.
+
+        chunk_size : int, optional (default : 2 ** 24)
+            The approximate number of characters read at a time.
+
+        See Also
+        --------
+        easygraph.utils.iter_edge_list
+
         Examples
         --------
 
@@ -417,27 +438,43 @@ class Graph(object):
 
         >>> G.add_edges_from_file(file='./club_network.txt', weighted=True)
 
+        Read a compressed edge list of integer node ids
+
+        >>> G.add_edges_from_file(file='./youtube-links.txt.gz', nodetype=int)
+
 
         """
-        import re
-        with open(file, 'r') as fp:
-            edges = fp.readlines()
-        if weighted:
-            for edge in edges:
-                edge = re.sub(',', ' ', edge)
-                edge = edge.split()
-                try:
-                    self.add_edge(edge[0], edge[1], weight=float(edge[2]))
-                except:
-                    pass
+        import gc
+        from easygraph.utils.edgelist import iter_edge_list
+        # The millions of new dicts would trigger many useless garbage collections
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for us, vs, weights in iter_edge_list(file, delimiter=delimiter, comments=comments,
+                                                  nodetype=nodetype, weighted=weighted,
+                                                  chunk_size=chunk_size):
+                self._add_edges_in_bulk(us, vs, weights)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def _add_edges_in_bulk(self, us, vs, weights=None):
+        from itertools import chain
+        for node in dict.fromkeys(chain.from_iterable(zip(us, vs))):
+            if node not in self._node:
+                self._add_one_node(node)
+        adj = self._adj
+        factory = self.edge_attr_dict_factory
+        if weights is None:
+            for u, v in zip(us, vs):
+                if v not in adj[u]:
+                    adj[u][v] = adj[v][u] = factory()
         else:
-            for edge in edges:
-                edge = re.sub(',', ' ', edge)
-                edge = edge.split()
-                try:
-                    self.add_edge(edge[0], edge[1])
-                except:
-                    pass
+            for u, v, w in zip(us, vs, weights):
+                datadict = adj[u].get(v)
+                if datadict is None:
+                    datadict = adj[u][v] = adj[v][u] = factory()
+                datadict['weight'] = w
 
     def _add_one_edge(self, u_of_edge, v_of_edge, edge_attr: dict = {}):
         u, v = u_of_edge, v_of_edge
@@ -618,6 +655,69 @@ class Graph(object):
         
         return G
 
+    def freeze(self, weight='weight'):
+        """Returns a read-only CSR snapshot of the graph.
+
+        The snapshot stores the adjacency as NumPy `indptr` / `indices` / `weights`
+        arrays plus a node-index mapping, which takes far less memory than the
+        dict-of-dict adjacency. Traversal-heavy functions run directly on the arrays
+        when given a snapshot. Later changes to the graph do not affect the snapshot.
+
+        Parameters
+        ----------
+        weight : string or None, optional (default : 'weight')
+            The key for edge weight kept in the snapshot. Edges without this
+            attribute get weight 1. If None, all the weights will be 1.
+
+        Returns
+        -------
+        G_csr : easygraph.CSRGraph
+            The read-only snapshot of the graph.
+
+        See Also
+        --------
+        CSRGraph
+
+        Examples
+        --------
+        >>> G_csr = G.freeze()
+        >>> eg.betweenness_centrality(G_csr)
+
+        """
+        from easygraph.classes.csr_graph import CSRGraph
+        return CSRGraph.from_graph(self, weight=weight)
+
+    def without_nodes(self, nodes):
+        """Returns a read-only view of the graph with *nodes* hidden.
+
+        Nothing is copied, the view hides the nodes and their edges on the fly.
+        It is much cheaper than `copy` followed by `remove_nodes` when many
+        slightly different graphs are only read, e.g. to test the removal of
+        each node in turn.
+
+        Parameters
+        ----------
+        nodes : iterable of nodes
+            The nodes to hide.
+
+        Returns
+        -------
+        view : easygraph.SubgraphView
+            The view of the graph without *nodes*.
+
+        See Also
+        --------
+        SubgraphView
+
+        Examples
+        --------
+        >>> G_without_a = G.without_nodes(['a'])
+        >>> eg.connected_components(G_without_a)
+
+        """
+        from easygraph.classes.graph_view import SubgraphView
+        return SubgraphView(self, nodes)
+
     def nodes_subgraph(self, from_nodes: list):
         """Returns a subgraph of some nodes
         
@@ -641,6 +741,7 @@ class Graph(object):
         """
         G = self.__class__()
         G.graph.update(self.graph)
+        from_nodes_set = set(from_nodes)
         for node in from_nodes:
             try:
                 G.add_node(node, **self._node[node])
@@ -648,9 +749,8 @@ class Graph(object):
                 pass
 
             # Edge
-            from_nodes = set(from_nodes)
             for v, edge_data in self._adj[node].items():
-                if v in from_nodes:
+                if v in from_nodes_set:
                     G.add_edge(node, v, **edge_data)
         return G
 
@@ -0,0 +1,249 @@
+from collections.abc import Mapping
+
+__all__ = [
+    "SubgraphView"
+]
+
+
+class SubgraphView(object):
+    """
+    Read-only view of a graph with some nodes hidden.
+
+    The view keeps a reference to the underlying graph and the set of hidden
+    nodes, nothing is copied: creating a view is O(number of hidden nodes), and
+    each neighbor lookup skips the hidden nodes on the fly. It supports the
+    read-only API of the graph, so that functions working on `adj`, `nodes` and
+    iteration, e.g. `connected_components`, accept it as a graph. Changes to the
+    underlying graph show through the view.
+
+    Use `Graph.without_nodes` or `DiGraph.without_nodes` rather than building it directly.
+
+    Parameters
+    ----------
+    G : easygraph.Graph, easygraph.DiGraph or easygraph.CSRGraph
+        The underlying graph.
+
+    hidden_nodes : iterable of nodes
+        The nodes the view hides, with all their edges.
+
+    See Also
+    --------
+    Graph.without_nodes
+
+    Examples
+    --------
+    Test how removing each node changes the number of components, without copying *G*
+
+    >>> for node in G:
+    ...     print(node, eg.number_connected_components(G.without_nodes([node])))
+
+    """
+
+    def __init__(self, G, hidden_nodes):
+        self._graph = G
+        self._hidden = frozenset(node for node in hidden_nodes if node in G)
+        self.graph = G.graph
+        self._node = _HiddenNodesMapping(G.nodes, self._hidden)
+        self._adj = _HiddenNodesAdjacency(G.adj, self._hidden)
+
+    def __iter__(self):
+        return iter(self._node)
+
+    def __len__(self):
+        return len(self._node)
+
+    def __contains__(self, node):
+        return node in self._node
+
+    def __getitem__(self, node):
+        return self._adj[node]
+
+    @property
+    def adj(self):
+        return self._adj
+
+    @property
+    def nodes(self):
+        return self._node
+
+    @property
+    def edges(self):
+        edges = list()
+        seen = set()
+        directed = self.is_directed()
+        for u in self._adj:
+            for v, edge_data in self._adj[u].items():
+                if directed:
+                    edges.append((u, v, edge_data))
+                elif (u, v) not in seen:
+                    seen.add((u, v))
+                    seen.add((v, u))
+                    edges.append((u, v, edge_data))
+        return edges
+
+    def degree(self, weight='weight'):
+        """Returns the weighted degree of each node.
+
+        For directed graph, it returns the sum of out degree and in degree.
+
+        Parameters
+        ----------
+        weight : string, optional (default: 'weight')
+            Weight key of the original weighted graph.
+
+        Returns
+        -------
+        degree : dict
+            Each node's (key) weighted degree (value).
+
+        """
+        degree = dict.fromkeys(self._node, 0)
+        for u, v, d in self.edges:
+            degree[u] += d.get(weight, 1)
+            degree[v] += d.get(weight, 1)
+        return degree
+
+    def size(self, weight=None):
+        """Returns the number of edges or total of all edge weights.
+
+        Parameters
+        -----------
+        weight : String or None, optional
+            The weight key. If None, it will calculate the number of
+            edges, instead of total of all edge weights.
+
+        Returns
+        -------
+        size : int or float, optional (default: None)
+            The number of edges or total of all edge weights.
+
+        """
+        s = sum(self.degree(weight=weight).values())
+        return s // 2 if weight is None else s / 2
+
+    def neighbors(self, node):
+        """Returns an iterator of a node's neighbors (successors for directed graph)."""
+        try:
+            return iter(self._adj[node])
+        except KeyError:
+            print("No node {}".format(node))
+
+    successors = neighbors
+
+    def predecessors(self, node):
+        """Returns an iterator of a node's predecessors."""
+        if node not in self._node:
+            print("No node {}".format(node))
+            return
+        return (v for v in self._graph.predecessors(node) if v not in self._hidden)
+
+    def all_neighbors(self, node):
+        if not self.is_directed():
+            return self.neighbors(node)
+        neighbors = list(self.neighbors(node))
+        neighbors.extend(self.predecessors(node))
+        return iter(neighbors)
+
+    def has_node(self, node):
+        return node in self
+
+    def has_edge(self, u, v):
+        try:
+            return v in self._adj[u]
+        except KeyError:
+            return False
+
+    def number_of_nodes(self):
+        """Returns the number of visible nodes."""
+        return len(self)
+
+    def number_of_edges(self):
+        """Returns the number of edges between visible nodes."""
+        return int(self.size())
+
+    def is_directed(self):
+        return self._graph.is_directed()
+
+    def without_nodes(self, nodes):
+        """Returns a view of the underlying graph that also hides *nodes*.
+
+        Parameters
+        ----------
+        nodes : iterable of nodes
+            The nodes to hide besides the ones already hidden.
+
+        Returns
+        -------
+        view : easygraph.SubgraphView
+
+        """
+        return SubgraphView(self._graph, self._hidden.union(nodes))
+
+    def copy(self):
+        """Returns a mutable graph of the visible nodes and edges."""
+        return self.nodes_subgraph(from_nodes=list(self))
+
+    def freeze(self, weight='weight'):
+        """Returns a read-only CSR snapshot of the visible nodes and edges, see `Graph.freeze`."""
+        from easygraph.classes.csr_graph import CSRGraph
+        return CSRGraph.from_graph(self, weight=weight)
+
+    def nodes_subgraph(self, from_nodes: list):
+        """Returns a mutable subgraph of some visible nodes.
+
+        Parameters
+        ----------
+        from_nodes : list of object
+            The nodes in subgraph. Hidden nodes are left out.
+
+        Returns
+        -------
+        nodes_subgraph : easygraph.Graph or easygraph.DiGraph
+            The subgraph consisting of *from_nodes*.
+
+        """
+        return self._graph.nodes_subgraph([node for node in from_nodes if node not in self._hidden])
+
+    def ego_subgraph(self, center):
+        """Returns an ego network graph of a visible node."""
+        neighbors_of_center = list(self.all_neighbors(center))
+        neighbors_of_center.append(center)
+        return self.nodes_subgraph(from_nodes=neighbors_of_center)
+
+
+class _HiddenNodesMapping(Mapping):
+    """Read-only view of a mapping keyed by node, without the hidden nodes."""
+    __slots__ = ('_mapping', '_hidden')
+
+    def __init__(self, mapping, hidden):
+        self._mapping = mapping
+        self._hidden = hidden
+
+    def __getitem__(self, node):
+        if node in self._hidden:
+            raise KeyError(node)
+        return self._mapping[node]
+
+    def __contains__(self, node):
+        try:
+            return node not in self._hidden and node in self._mapping
+        except TypeError:
+            return False
+
+    def __iter__(self):
+        hidden = self._hidden
+        if not hidden:
+            return iter(self._mapping)
+        return (node for node in self._mapping if node not in hidden)
+
+    def __len__(self):
+        # Only the hidden nodes present in the mapping are counted out
+        return len(self._mapping) - sum(1 for node in self._hidden if node in self._mapping)
+
+
+class _HiddenNodesAdjacency(_HiddenNodesMapping):
+    """Read-only ``adj[u][v] -> edge attribute`` view without the hidden nodes."""
+    __slots__ = ()
+
+    def __getitem__(self, node):
+        return _HiddenNodesMapping(super().__getitem__(node), self._hidden)
@@ -132,23 +132,16 @@ def get_graph_youtube():
 
     """
     from urllib import request
-    import gzip
     url = 'http://socialnetworks.mpi-sws.mpg.de/data/youtube-links.txt.gz'
     zipped_data_path = './samples/youtube-links.txt.gz'
-    unzipped_data_path = './samples/youtube-links.txt'
 
     # Download .gz file
     print("Downloading Youtube dataset...")
     request.urlretrieve(url, zipped_data_path, _show_progress)
 
-    # Unzip
-    unzipped_data = gzip.GzipFile(zipped_data_path)
-    open(unzipped_data_path, 'wb+').write(unzipped_data.read())
-    unzipped_data.close()
-
-    # Returns graph
+    # Returns graph, read from the .gz file directly
     G = eg.Graph()
-    G.add_edges_from_file(file=unzipped_data_path)
+    G.add_edges_from_file(file=zipped_data_path)
     return G
 
 
@@ -167,23 +160,16 @@ def get_graph_flickr():
 
     """
     from urllib import request
-    import gzip
     url = 'http://socialnetworks.mpi-sws.mpg.de/data/flickr-links.txt.gz'
     zipped_data_path = './samples/flickr-links.txt.gz'
-    unzipped_data_path = './samples/flickr-links.txt'
 
     # Download .gz file
     print("Downloading Flickr dataset...")
     request.urlretrieve(url, zipped_data_path, _show_progress)
 
-    # Unzip
-    unzipped_data = gzip.GzipFile(zipped_data_path)
-    open(unzipped_data_path, 'wb+').write(unzipped_data.read())
-    unzipped_data.close()
-
-    # Returns graph
+    # Returns graph, read from the .gz file directly
     G = eg.Graph()
-    G.add_edges_from_file(file=unzipped_data_path)
+    G.add_edges_from_file(file=zipped_data_path)
     return G
 
 
@@ -6,5 +6,6 @@ from easygraph.functions.drawing import *
 
 from easygraph.functions.not_sorted import *
 from easygraph.functions.path import *
+from easygraph.functions.flow import *
 from easygraph.functions.centrality import *
 from easygraph.functions.graph_generator import *
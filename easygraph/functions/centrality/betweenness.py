@@ -1,16 +1,33 @@
 
+import numpy as np
+
+from easygraph.classes import CSRGraph
+
 __all__ = [
     "betweenness_centrality",
+    "edge_betweenness_centrality",
 ]
 
-def betweenness_centrality_parallel(nodes, G, path_length, accumulate):
+def betweenness_centrality_parallel(sources, shared):
+    G, path_length, accumulate = shared
     betweenness = {node: 0.0 for node in G}
-    for node in nodes:
+    for node, scale in sources:
         S, P, sigma = path_length(G, source=node)
-        betweenness = accumulate(betweenness, S, P, sigma, node)
+        betweenness = accumulate(betweenness, S, P, sigma, node, scale)
+    return np.fromiter(betweenness.values(), dtype=float, count=len(betweenness))
+
+def _betweenness_csr_parallel(sources, shared):
+    G, weighted, endpoints = shared
+    betweenness = np.zeros(len(G))
+    for node, scale in sources:
+        source = G.index_of_node[node]
+        levels, sigma = _single_source_path_csr(G, source, weighted)
+        betweenness = _accumulate_csr(betweenness, levels, sigma, source, endpoints, scale)
     return betweenness
 
-def betweenness_centrality(G, weight=None, normalized=True, endpoints=False):
+def betweenness_centrality(G, weight=None, normalized=True, endpoints=False, k=None,
+                           sampling='uniform', epsilon=None, delta=0.1, seed=None,
+                           n_workers=None, backend=None, chunk_size=None):
     '''Compute the shortest-path betweenness centrality for nodes.
 
     .. math::
@@ -23,6 +40,11 @@ def betweenness_centrality(G, weight=None, normalized=True, endpoints=False):
     If $s = t$, $\sigma(s, t) = 1$, and if $v \in {s, t}$,
     $\sigma(s, t|v) = 0$ [2]_.
 
+    By default the single-source searches run from every node, i.e. O(nm) time.
+    For large graphs the values can be estimated instead, either from the
+    searches of `k` sampled source nodes, or adaptively from random shortest
+    paths until the error is within `epsilon` with probability `1 - delta` [3]_ [4]_.
+
     Parameters
     ----------
     G : graph
@@ -31,6 +53,7 @@ def betweenness_centrality(G, weight=None, normalized=True, endpoints=False):
     weight : None or string, optional (default=None)
       If None, all edge weights are considered equal.
       Otherwise holds the name of the edge attribute used as weight.
+      For a `CSRGraph`, any non-None value uses the weights of the snapshot.
 
     normalized : bool, optional
       If True the betweenness values are normalized by `2/((n-1)(n-2))`
@@ -40,13 +63,83 @@ def betweenness_centrality(G, weight=None, normalized=True, endpoints=False):
     endpoints : bool, optional
       If True include the endpoints in the shortest path counts.
 
+    k : int or None, optional (default=None)
+      If not None, estimate the values from the searches of `k` sampled source nodes.
+
+    sampling : string, optional (default='uniform')
+      How the `k` sources are sampled. 'uniform' draws them without replacement,
+      'degree' draws them with replacement proportionally to their (out-)degree,
+      which favours the sources reaching the most shortest paths.
+
+    epsilon : float or None, optional (default=None)
+      If not None, estimate the values by sampling random shortest paths until,
+      with probability `1 - delta`, every value divided by `n(n-1)` is within
+      `epsilon` of the exact one. Cannot be used together with `k`.
+
+    delta : float, optional (default=0.1)
+      The failure probability of the `epsilon` guarantee.
+
+    seed : int or None, optional (default=None)
+      The random seed of the sampling.
+
+    n_workers : int or None, optional (default=None)
+      Number of workers sharing the single-source searches.
+      None for serial computing, -1 for one worker per CPU.
+
+    backend : string or None, optional (default=None)
+      One of 'serial', 'process', 'thread', see `easygraph.utils.parallel_map`.
+
+    chunk_size : int or None, optional (default=None)
+      Number of sources per task handed to a worker.
+
     Returns
     -------
     nodes : dictionary
        Dictionary of nodes with betweenness centrality as the value.
+
+    Examples
+    --------
+    >>> betweenness_centrality(G, k=1000, seed=1, n_workers=8)
+    >>> betweenness_centrality(G, epsilon=0.001, delta=0.1)
+
+    References
+    ----------
+    .. [3] Brandes U, Pich C. Centrality estimation in large networks[J].
+       International Journal of Bifurcation and Chaos, 2007, 17(07): 2303-2318.
+    .. [4] Riondato M, Kornaropoulos E M. Fast approximation of betweenness centrality
+       through sampling[J]. Data Mining and Knowledge Discovery, 2016, 30(2): 438-475.
     '''
     
+    from easygraph.utils.parallel import parallel_sum
+    if k is not None and epsilon is not None:
+        raise ValueError("Only one of k and epsilon can be given.")
+    if epsilon is not None:
+        betweenness = _estimate_betweenness_adaptive(G, weight, endpoints, epsilon, delta, seed,
+                                                     n_workers, backend, chunk_size)
+        return _rescale(betweenness, len(G), normalized=normalized,
+                        directed=G.is_directed(), endpoints=endpoints)
+
+    local_function, shared = _betweenness_local_function(G, weight, endpoints)
+    if k is None:
+        sources = [(node, 1.0) for node in G]
+    else:
+        sources = _sample_sources(G, k, sampling, seed)
+
+    ret = parallel_sum(local_function, sources, shared=shared, n_workers=n_workers,
+                       backend=backend, chunk_size=chunk_size)
+    if ret is None:
+        ret = np.zeros(len(G))
+    betweenness = dict(zip(G, ret.tolist()))
+
+    betweenness = _rescale(betweenness, len(G), normalized=normalized,
+                           directed=G.is_directed(), endpoints=endpoints)
+    return betweenness
+
+def _betweenness_local_function(G, weight, endpoints):
     import functools
+    if isinstance(G, CSRGraph):
+        # Run Brandes on the arrays, the weights are the ones of the snapshot
+        return _betweenness_csr_parallel, (G, weight is not None, endpoints)
     if weight is not None:
         path_length = functools.partial(_single_source_dijkstra_path, weight=weight)
     else:
@@ -56,41 +149,348 @@ def betweenness_centrality(G, weight=None, normalized=True, endpoints=False):
         accumulate = functools.partial(_accumulate_endpoints)
     else:
         accumulate = functools.partial(_accumulate_basic)
+    return betweenness_centrality_parallel, (G, path_length, accumulate)
 
-    nodes = G.nodes
-    betweenness = dict.fromkeys(G, 0.0)
-
-    if len(G) >= 1000:
-        #  use the parallel version for large graph 
-        from multiprocessing import Pool
-        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
-        from functools import partial
-        import random
-        nodes = list(nodes)
-        random.shuffle(nodes)
-
-        def split(nodes, n):
-            ret = []
-            length = len(nodes)  # 总长
-            step = int(length / n) + 1  # 每份的长度
-            for i in range(0, length, step):
-                ret.append(nodes[i:i + step])
-            return ret
-        
-        nodes = split(nodes, 4)
-        local_function = partial(betweenness_centrality_parallel, G=G, path_length=path_length, accumulate=accumulate)
-        with Pool(4) as p:
-            ret = p.map(local_function, nodes)
-        for key in betweenness:
-            betweenness[key] = sum(res[key] for res in ret)
+def _sample_sources(G, k, sampling, seed):
+    """Returns `(source, scale)` pairs, the scale makes the sum over the sources unbiased."""
+    nodes = list(G)
+    n = len(nodes)
+    if not 0 < k <= n:
+        raise ValueError("k should be in [1, {}], got {}.".format(n, k))
+    rng = np.random.RandomState(seed=seed)
+    if sampling == 'uniform':
+        chosen = rng.choice(n, size=k, replace=False)
+        return [(nodes[i], n / k) for i in sorted(chosen.tolist())]
+    elif sampling == 'degree':
+        if G.is_directed():
+            degree = G.out_degree()
+        else:
+            degree = G.degree()
+        p = np.fromiter((degree[node] for node in nodes), dtype=float, count=n)
+        if p.sum() == 0:
+            p[:] = 1.0
+        p /= p.sum()
+        chosen, times = np.unique(rng.choice(n, size=k, p=p), return_counts=True)
+        return [(nodes[i], t / (k * p[i])) for i, t in zip(chosen.tolist(), times.tolist())]
     else:
-        # use np-parallel version for small graph
-        for node in nodes:
-            S, P, sigma = path_length(G, source=node)
-            betweenness = accumulate(betweenness, S, P, sigma, node)
+        raise ValueError("sampling should be 'uniform' or 'degree', got {}.".format(sampling))
 
-    betweenness = _rescale(betweenness, len(G), normalized=normalized,
-                           directed=G.is_directed(), endpoints=endpoints)
+def _estimate_betweenness_adaptive(G, weight, endpoints, epsilon, delta, seed,
+                                   n_workers, backend, chunk_size):
+    """Estimates the betweenness from random shortest paths between random node pairs.
+
+    Each sample draws a pair `(s, t)` and one of the shortest s-t paths uniformly,
+    and counts the nodes inside it [4]_. The samples are drawn in rounds of doubling
+    size. The estimation stops as soon as the empirical Bernstein bound [5]_ of
+    every node is below `epsilon`, and at the latest after the number of samples
+    of [4]_, which by itself ensures the guarantee. Half of `delta` goes to each
+    of the two stopping rules.
+
+    .. [5] Maurer A, Pontil M. Empirical Bernstein bounds and sample variance penalization[J].
+       arXiv preprint arXiv:0907.3740, 2009.
+    """
+    import math
+    from easygraph.utils.parallel import parallel_sum
+    if not 0 < epsilon < 1 or not 0 < delta < 1:
+        raise ValueError("epsilon and delta should be in (0, 1).")
+    nodes = list(G)
+    n = len(nodes)
+    if n < 2:
+        return dict.fromkeys(nodes, 0.0)
+    vertex_diameter = _vertex_diameter_bound(G, weight)
+    r_max = math.ceil(0.5 / epsilon ** 2 * (math.floor(math.log2(max(vertex_diameter - 2, 1))) + 1
+                                           + math.log(2 / delta)))
+    rounds = math.ceil(math.log2(r_max / min(r_max, 1000))) + 1
+    # Each round tests the n nodes, so the other half of delta is split over all the tests
+    log_term = math.log(4 * rounds * n / (delta / 2))
+
+    rng = np.random.RandomState(seed=seed)
+    index = {node: i for i, node in enumerate(nodes)}
+    shared = (G, index, weight, endpoints)
+    counts = np.zeros(n)
+    r = 0
+    r_next = min(r_max, 1000)
+    while r < r_max:
+        size = r_next - r
+        s = rng.randint(n, size=size)
+        t = rng.randint(n - 1, size=size)
+        t += t >= s
+        path_seeds = rng.randint(2 ** 31 - 1, size=size)
+        pairs = [(nodes[a], nodes[b], c) for a, b, c in zip(s.tolist(), t.tolist(), path_seeds.tolist())]
+        counts += parallel_sum(_betweenness_sample_parallel, pairs, shared=shared, n_workers=n_workers,
+                               backend=backend, chunk_size=chunk_size)
+        r = r_next
+        r_next = min(r_max, 2 * r)
+        if r < r_max:
+            mean = counts / r
+            variance = mean * (1 - mean) * r / (r - 1)
+            bound = np.sqrt(2 * variance * log_term / r) + 7 * log_term / (3 * (r - 1))
+            if bound.max() <= epsilon:
+                break
+    # The estimation is on the values divided by n(n-1), the ordered pairs of nodes
+    return dict(zip(nodes, (counts / r * n * (n - 1)).tolist()))
+
+def _vertex_diameter_bound(G, weight):
+    """Returns an upper bound of the number of nodes on a shortest path."""
+    if G.is_directed() or weight is not None:
+        return len(G)
+    from easygraph.functions.components.connected import connected_components
+    from easygraph.functions.path import single_source_bfs
+    # 2 * eccentricity bounds the diameter of a connected component
+    return max(2 * max(single_source_bfs(G, next(iter(component))).values()) + 1
+               for component in connected_components(G))
+
+def _betweenness_sample_parallel(pairs, shared):
+    import random
+    G, index, weight, endpoints = shared
+    counts = np.zeros(len(index))
+    for s, t, path_seed in pairs:
+        path = _sample_shortest_path(G, s, t, weight, random.Random(path_seed))
+        if path is None:
+            continue
+        for v in path:
+            counts[index[v]] += 1
+        if endpoints:
+            counts[index[s]] += 1
+            counts[index[t]] += 1
+    return counts
+
+def _sample_shortest_path(G, s, t, weight, rng):
+    """Returns the inner nodes of a uniformly drawn shortest s-t path, None if t is unreachable."""
+    if isinstance(G, CSRGraph):
+        return _sample_shortest_path_csr(G, s, t, weight is not None, rng)
+    if weight is None:
+        P, sigma = _bfs_path_to_target(G, s, t)
+    else:
+        P, sigma = _dijkstra_path_to_target(G, s, t, weight)
+    if sigma.get(t, 0) == 0:
+        return None
+    path = []
+    w = t
+    while True:
+        # Going back from t, a predecessor v is on sigma[v] of the sigma[w] shortest paths
+        x = rng.random() * sigma[w]
+        for v in P[w]:
+            x -= sigma[v]
+            if x < 0:
+                break
+        if v == s:
+            return path
+        path.append(v)
+        w = v
+
+def _bfs_path_to_target(G, s, t):
+    from collections import deque
+    P = {s: []}
+    sigma = {s: 1.0}
+    D = {s: 0}
+    Q = deque([s])
+    adj = G.adj
+    while Q:
+        v = Q.popleft()
+        Dv = D[v]
+        # The level of t is complete once a node of the same level is popped
+        if t in D and Dv >= D[t]:
+            break
+        sigmav = sigma[v]
+        for w in adj[v]:
+            if w not in D:
+                Q.append(w)
+                D[w] = Dv + 1
+                sigma[w] = 0.0
+                P[w] = []
+            if D[w] == Dv + 1:
+                sigma[w] += sigmav
+                P[w].append(v)
+    return P, sigma
+
+def _dijkstra_path_to_target(G, s, t, weight):
+    from heapq import heappush, heappop
+    from itertools import count
+    P = {s: []}
+    sigma = {s: 1.0}
+    D = {}
+    seen = {s: 0}
+    Q = []
+    c = count()
+    adj = G.adj
+    heappush(Q, (0, next(c), s, s))
+    while Q:
+        (dist, _, pred, v) = heappop(Q)
+        if v in D:
+            continue
+        sigma[v] += sigma[pred]
+        D[v] = dist
+        # sigma[t] is final once t is popped
+        if v == t:
+            break
+        for w in adj[v]:
+            vw_dist = dist + adj[v][w].get(weight, 1)
+            if w not in D and (w not in seen or vw_dist < seen[w]):
+                seen[w] = vw_dist
+                heappush(Q, (vw_dist, next(c), v, w))
+                sigma[w] = 0.0
+                P[w] = [v]
+            elif vw_dist == seen[w]:  # handle equal paths
+                sigma[w] += sigma[v]
+                P[w].append(v)
+    return P, sigma
+
+def _sample_shortest_path_csr(G, s, t, weighted, rng):
+    source, target = G.index_of_node[s], G.index_of_node[t]
+    levels, sigma = _single_source_path_csr(G, source, weighted)
+    if sigma[target] == 0:
+        return None
+    tails = np.concatenate([level[0] for level in levels])
+    heads = np.concatenate([level[1] for level in levels])
+    path = []
+    w = target
+    while True:
+        preds = tails[heads == w]
+        weights = np.cumsum(sigma[preds])
+        v = int(preds[np.searchsorted(weights, rng.random() * weights[-1], side='right')])
+        if v == source:
+            return path
+        path.append(G.node_of_index[v])
+        w = v
+
+def edge_betweenness_centrality_parallel(sources, shared):
+    G, path_length, edge_index, m = shared
+    betweenness = np.zeros(m)
+    for node, scale in sources:
+        S, P, sigma = path_length(G, source=node)
+        betweenness = _accumulate_edges(betweenness, S, P, sigma, node, edge_index, scale)
+    return betweenness
+
+def _edge_betweenness_csr_parallel(sources, shared):
+    G, weighted = shared
+    betweenness = np.zeros(len(G.indices))
+    for node, scale in sources:
+        levels, sigma = _single_source_path_csr(G, G.index_of_node[node], weighted)
+        betweenness = _accumulate_edges_csr(betweenness, levels, sigma, scale)
+    return betweenness
+
+def edge_betweenness_centrality(G, weight=None, normalized=True, k=None, sampling='uniform',
+                                seed=None, n_workers=None, backend=None, chunk_size=None):
+    '''Compute the shortest-path betweenness centrality for edges.
+
+    .. math::
+
+        c_B(e) = \sum_{s,t \in V} \frac{\sigma(s, t|e)}{\sigma(s, t)}
+
+    where $V$ is the set of nodes, $\sigma(s, t)$ is the number of
+    shortest $(s, t)$-paths, and $\sigma(s, t|e)$ is the number of
+    those paths passing through edge $e$ [2]_.
+
+    The dependencies of the edges are accumulated in the backward pass of each
+    single-source search into one flat array indexed by edge, in the order of
+    `G.edges`.
+
+    Parameters
+    ----------
+    G : graph
+      A easygraph graph.
+
+    weight : None or string, optional (default=None)
+      If None, all edge weights are considered equal.
+      Otherwise holds the name of the edge attribute used as weight.
+      For a `CSRGraph`, any non-None value uses the weights of the snapshot.
+
+    normalized : bool, optional
+      If True the betweenness values are normalized by `1/(n(n-1))`
+      where `n` is the number of nodes in G.
+
+    k : int or None, optional (default=None)
+      If not None, estimate the values from the searches of `k` sampled source nodes.
+
+    sampling : string, optional (default='uniform')
+      How the `k` sources are sampled, 'uniform' or 'degree', see `betweenness_centrality`.
+
+    seed : int or None, optional (default=None)
+      The random seed of the sampling.
+
+    n_workers : int or None, optional (default=None)
+      Number of workers sharing the single-source searches.
+      None for serial computing, -1 for one worker per CPU.
+
+    backend : string or None, optional (default=None)
+      One of 'serial', 'process', 'thread', see `easygraph.utils.parallel_map`.
+
+    chunk_size : int or None, optional (default=None)
+      Number of sources per task handed to a worker.
+
+    Returns
+    -------
+    edges : dictionary
+       Dictionary of edges `(u, v)` with betweenness centrality as the value.
+
+    Examples
+    --------
+    >>> edge_betweenness_centrality(G, weight='weight', n_workers=4)
+
+    '''
+    import functools
+    from easygraph.utils.parallel import parallel_sum
+    edges = [(u, v) for u, v, _ in G.edges]
+    if isinstance(G, CSRGraph):
+        local_function = _edge_betweenness_csr_parallel
+        shared = (G, weight is not None)
+    else:
+        edge_index = {}
+        for i, (u, v) in enumerate(edges):
+            edge_index[(u, v)] = i
+            if not G.is_directed():
+                edge_index[(v, u)] = i
+        if weight is not None:
+            path_length = functools.partial(_single_source_dijkstra_path, weight=weight)
+        else:
+            path_length = functools.partial(_single_source_bfs_path)
+        local_function = edge_betweenness_centrality_parallel
+        shared = (G, path_length, edge_index, len(edges))
+
+    if k is None:
+        sources = [(node, 1.0) for node in G]
+    else:
+        sources = _sample_sources(G, k, sampling, seed)
+    ret = parallel_sum(local_function, sources, shared=shared, n_workers=n_workers,
+                       backend=backend, chunk_size=chunk_size)
+    if isinstance(G, CSRGraph):
+        ret = _csr_entries_to_edges(G, ret)
+    if ret is None:
+        ret = np.zeros(len(edges))
+    betweenness = dict(zip(edges, ret.tolist()))
+
+    betweenness = _rescale_e(betweenness, len(G), normalized=normalized,
+                             directed=G.is_directed())
+    return betweenness
+
+def _csr_entries_to_edges(G, betweenness):
+    """Sums the values of the CSR entries per edge, in the order of `G.edges`."""
+    if betweenness is None or G.is_directed():
+        return betweenness
+    # Each undirected edge is stored as two entries, (i, j) and (j, i)
+    n = len(G)
+    tails, heads = G.tails().astype(np.int64), G.indices.astype(np.int64)
+    canonical = np.flatnonzero(tails <= heads)
+    keys = np.minimum(tails, heads) * n + np.maximum(tails, heads)
+    order = np.argsort(keys[canonical], kind='stable')
+    edge_id = order[np.searchsorted(keys[canonical], keys, sorter=order)]
+    return np.bincount(edge_id, weights=betweenness, minlength=len(canonical))
+
+def _rescale_e(betweenness, n, normalized, directed=False):
+    if normalized:
+        if n <= 1:
+            scale = None  # no normalization b=0 for all nodes
+        else:
+            scale = 1 / (n * (n - 1))
+    else:  # rescale by 2 for undirected graphs
+        if not directed:
+            scale = 0.5
+        else:
+            scale = None
+    if scale is not None:
+        for v in betweenness:
+            betweenness[v] *= scale
     return betweenness
 
 def _rescale(betweenness, n, normalized,
@@ -173,8 +573,8 @@ def _single_source_dijkstra_path(G, source, weight="weight"):
                 P[w].append(v)
     return S, P, sigma
 
-def _accumulate_endpoints(betweenness, S, P, sigma, s):
-    betweenness[s] += len(S) - 1
+def _accumulate_endpoints(betweenness, S, P, sigma, s, scale=1.0):
+    betweenness[s] += (len(S) - 1) * scale
     delta = dict.fromkeys(S, 0)
     while S:
         w = S.pop()
@@ -182,10 +582,10 @@ def _accumulate_endpoints(betweenness, S, P, sigma, s):
         for v in P[w]:
             delta[v] += sigma[v] * coeff
         if w != s:
-            betweenness[w] += delta[w] + 1
+            betweenness[w] += (delta[w] + 1) * scale
     return betweenness
 
-def _accumulate_basic(betweenness, S, P, sigma, s):
+def _accumulate_basic(betweenness, S, P, sigma, s, scale=1.0):
     delta = dict.fromkeys(S, 0)
     while S:
         w = S.pop()
@@ -193,5 +593,66 @@ def _accumulate_basic(betweenness, S, P, sigma, s):
         for v in P[w]:
             delta[v] += sigma[v] * coeff
         if w != s:
-            betweenness[w] += delta[w]
-    return betweenness
\ No newline at end of file
+            betweenness[w] += delta[w] * scale
+    return betweenness
+
+def _single_source_path_csr(G, source, weighted):
+    """Brandes forward pass on the arrays of a CSRGraph.
+
+    Returns the shortest-path DAG edges as `(tails, heads, positions)` grouped by
+    the distance of their head, from nearest to farthest, and the number of
+    shortest paths `sigma`. The positions index the edge entries of the CSR arrays.
+    """
+    from scipy.sparse.csgraph import dijkstra
+    if weighted and (G.weights <= 0).any():
+        raise ValueError("Only positive edge weights are supported for CSRGraph.")
+    dist = dijkstra(G._as_csgraph(), directed=True, indices=source, unweighted=not weighted)
+    tails, heads = G.tails(), G.indices
+    edge_length = G.weights if weighted else 1.0
+    on_dag = np.flatnonzero(np.isfinite(dist[tails]) & (dist[tails] + edge_length == dist[heads]))
+    on_dag = on_dag[np.argsort(dist[heads[on_dag]], kind='stable')]
+    tails, heads = tails[on_dag], heads[on_dag]
+    bounds = np.flatnonzero(np.diff(dist[heads])) + 1
+    levels = list(zip(np.split(tails, bounds), np.split(heads, bounds), np.split(on_dag, bounds)))
+    sigma = np.zeros(len(G))
+    sigma[source] = 1.0
+    for tails, heads, _ in levels:
+        level_heads, inverse = np.unique(heads, return_inverse=True)
+        sigma[level_heads] += np.bincount(inverse, weights=sigma[tails])
+    return levels, sigma
+
+def _accumulate_csr(betweenness, levels, sigma, s, endpoints, scale=1.0):
+    delta = np.zeros(len(sigma))
+    for tails, heads, _ in reversed(levels):
+        coeff = (1 + delta[heads]) / sigma[heads]
+        level_tails, inverse = np.unique(tails, return_inverse=True)
+        delta[level_tails] += np.bincount(inverse, weights=sigma[tails] * coeff)
+    reached = sigma > 0
+    reached[s] = False
+    if endpoints:
+        betweenness[s] += np.count_nonzero(reached) * scale
+        betweenness[reached] += (delta[reached] + 1) * scale
+    else:
+        betweenness[reached] += delta[reached] * scale
+    return betweenness
+
+def _accumulate_edges(betweenness, S, P, sigma, s, edge_index, scale=1.0):
+    delta = dict.fromkeys(S, 0)
+    while S:
+        w = S.pop()
+        coeff = (1 + delta[w]) / sigma[w]
+        for v in P[w]:
+            c = sigma[v] * coeff
+            betweenness[edge_index[(v, w)]] += c * scale
+            delta[v] += c
+    return betweenness
+
+def _accumulate_edges_csr(betweenness, levels, sigma, scale=1.0):
+    """Accumulates the dependencies of the CSR edge entries into *betweenness*."""
+    delta = np.zeros(len(sigma))
+    for tails, heads, positions in reversed(levels):
+        c = sigma[tails] * (1 + delta[heads]) / sigma[heads]
+        betweenness[positions] += c * scale
+        level_tails, inverse = np.unique(tails, return_inverse=True)
+        delta[level_tails] += np.bincount(inverse, weights=c)
+    return betweenness
@@ -1,23 +1,25 @@
+import numpy as np
+
+from easygraph.classes import CSRGraph
 from easygraph.functions.path import *
 
 __all__ = [
     'closeness_centrality',
 ]
 
-def closeness_centrality_parallel(nodes, G, path_length):
-    ret = []
+def closeness_centrality_parallel(nodes, shared):
+    G, path_length = shared
+    ret = np.zeros(len(nodes))
     length = len(G)
-    for node in nodes:
+    for i, node in enumerate(nodes):
         x = path_length(G, node)
         dist = sum(x.values())
         cnt = len(x)
-        if dist == 0:
-            ret.append([node, 0])
-        else:
-            ret.append([node, (cnt-1)*(cnt-1)/(dist*(length-1))])
+        if dist != 0:
+            ret[i] = (cnt-1)*(cnt-1)/(dist*(length-1))
     return ret
 
-def closeness_centrality(G, weight=None):
+def closeness_centrality(G, weight=None, n_workers=None, backend=None, chunk_size=None):
     '''Compute closeness centrality for nodes.
 
     .. math::
@@ -36,6 +38,17 @@ def closeness_centrality(G, weight=None):
     weight : None or string, optional (default=None)
       If None, all edge weights are considered equal.
       Otherwise holds the name of the edge attribute used as weight.
+      For a `CSRGraph`, any non-None value uses the weights of the snapshot.
+
+    n_workers : int or None, optional (default=None)
+      Number of workers sharing the single-source searches.
+      None for serial computing, -1 for one worker per CPU.
+
+    backend : string or None, optional (default=None)
+      One of 'serial', 'process', 'thread', see `easygraph.utils.parallel_map`.
+
+    chunk_size : int or None, optional (default=None)
+      Number of sources per task handed to a worker.
 
     Returns
     -------
@@ -43,46 +56,41 @@ def closeness_centrality(G, weight=None):
       Dictionary of nodes with closeness centrality as the value.
 
     '''
-    closeness = dict()
-    nodes = G.nodes
-    length = len(nodes)
     import functools
-    if weight is not None:
-        path_length = functools.partial(single_source_dijkstra, weight=weight)
+    from easygraph.utils.parallel import parallel_map
+    if isinstance(G, CSRGraph):
+        # the weights are the ones of the snapshot
+        local_function = _closeness_csr_parallel
+        shared = (G, weight is not None)
     else:
-        path_length = functools.partial(single_source_bfs)
-    
-    if len(G) >= 1000:
-        # use parallel version for large graph
-        from multiprocessing import Pool
-        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
-        from functools import partial
-        import random
-        nodes = list(nodes)
-        random.shuffle(nodes)
-
-        def split(nodes, n):
-            ret = []
-            length = len(nodes)  # 总长
-            step = int(length / n) + 1  # 每份的长度
-            for i in range(0, length, step):
-                ret.append(nodes[i:i + step])
-            return ret
-        
-        nodes = split(nodes, 4)
-        local_function = partial(closeness_centrality_parallel, G=G, path_length=path_length)
-        with Pool(4) as p:
-            ret = p.map(local_function, nodes)
-        res = [x for i in ret for x in i]
-        closeness = dict(res)
-    else:
-        # use np-parallel version for samll graph
-        for node in nodes:
-            x = path_length(G, node)
-        dist = sum(x.values())
-        cnt = len(x)
-        if dist  == 0:
-            closeness[node] = 0
+        if weight is not None:
+            path_length = functools.partial(single_source_dijkstra, weight=weight)
         else:
-            closeness[node] = (cnt-1)*(cnt-1)/(dist*(length-1))
+            path_length = functools.partial(single_source_bfs)
+        local_function = closeness_centrality_parallel
+        shared = (G, path_length)
+
+    nodes = list(G.nodes)
+    ret = parallel_map(local_function, nodes, shared=shared, n_workers=n_workers,
+                       backend=backend, chunk_size=chunk_size)
+    values = np.concatenate(ret) if ret else np.zeros(0)
+    closeness = dict(zip(nodes, values.tolist()))
     return closeness
+
+def _closeness_csr_parallel(nodes, shared, batch_size=256):
+    from scipy.sparse.csgraph import dijkstra
+    G, weighted = shared
+    ret = []
+    length = len(G)
+    for begin in range(0, len(nodes), batch_size):
+        batch = nodes[begin:begin + batch_size]
+        dist = dijkstra(G._as_csgraph(), directed=True, unweighted=not weighted,
+                        indices=[G.index_of_node[node] for node in batch])
+        reachable = np.isfinite(dist)
+        cnt = np.count_nonzero(reachable, axis=1)
+        dist = np.where(reachable, dist, 0).sum(axis=1)
+        closeness = np.zeros(len(batch))
+        nonzero = dist != 0
+        closeness[nonzero] = (cnt[nonzero]-1)**2/(dist[nonzero]*(length-1))
+        ret.append(closeness)
+    return np.concatenate(ret) if ret else np.zeros(0)
@@ -1,11 +1,10 @@
-import collections
-import copy
+import numpy as np
 
 __all__ = [
     "flowbetweenness_centrality",
 ]
 
-def flowbetweenness_centrality(G):
+def flowbetweenness_centrality(G, k=None, seed=None, n_workers=None, backend=None, chunk_size=None):
     '''Compute the independent-path betweenness centrality for nodes in a flow network.
 
     .. math::
@@ -13,15 +12,33 @@ def flowbetweenness_centrality(G):
        c_B(v) =\sum_{s,t \in V} \frac{\sigma(s, t|v)}{\sigma(s, t)}
 
     where $V$ is the set of nodes, $\sigma(s, t)$ is the number of
-    independent $(s, t)$-paths,  and $\sigma(s, t|v)$ is the maximum 
-    number possible of those paths  passing through some  node $v$ 
-    other than $s, t$. If $s = t$, $\sigma(s, t) = 1$, and if $v \in {s, t}$,
-    $\sigma(s, t|v) = 0$ [2]_.
+    independent $(s, t)$-paths, i.e. the value of the maximum $(s, t)$-flow,
+    and $\sigma(s, t|v)$ is the number of those paths passing through some
+    node $v$ other than $s, t$, i.e. the flow going through $v$. If $s = t$,
+    $\sigma(s, t) = 1$, and if $v \in {s, t}$, $\sigma(s, t|v) = 0$ [2]_.
+
+    One maximum flow is computed per pair $(s, t)$, and the flow through every
+    other node is read from the decomposition of that flow into paths.
 
     Parameters
     ----------
     G : graph
-      A easygraph directed graph.
+      A easygraph directed graph. The 'weight' of an edge is its capacity, 1 by default.
+
+    k : int or None, optional (default=None)
+      If not None, estimate the values from `k` pairs $(s, t)$ sampled without replacement.
+
+    seed : int or None, optional (default=None)
+      The random seed of the sampling.
+
+    n_workers : int or None, optional (default=None)
+      Number of workers sharing the pairs. None for serial computing, -1 for one worker per CPU.
+
+    backend : string or None, optional (default=None)
+      One of 'serial', 'process', 'thread', see `easygraph.utils.parallel_map`.
+
+    chunk_size : int or None, optional (default=None)
+      Number of pairs per task handed to a worker.
 
     Returns
     -------
@@ -31,37 +48,54 @@ def flowbetweenness_centrality(G):
     Notes
     -----
     A flow network is a directed graph where each edge has a capacity and each edge receives a flow. 
+
+    Examples
+    --------
+    >>> flowbetweenness_centrality(G, k=10000, seed=1, n_workers=8)
+
     '''
     if G.is_directed() == False:
         print("Please input a directed graph")
         return 
-    flow_dict = NumberOfFlow(G)
-    nodes = G.nodes
-    result_dict = dict()
-    for node,_ in nodes.items():
-        result_dict[node] = 0
-    for node_v,_ in nodes.items():
-        for node_s,_ in nodes.items():
-            for node_t,_ in nodes.items():
-                num = 1
-                num_v = 0
-                if node_s  == node_t:
-                    num_v = 0
-                    num = 1
-                if node_v in [node_s,node_t]:
-                    num_v = 0
-                    num = 1
-                if node_v != node_s and node_v != node_t and node_s != node_t:
-                    num = flow_dict[node_s][node_t]
-                    num_v = min(flow_dict[node_s][node_v],flow_dict[node_v][node_t])
-                if num == 0:
-                    pass
-                else:
-                    result_dict[node_v] = result_dict[node_v]+num_v/num
-    return result_dict
+    from easygraph.functions.flow.network import FlowNetwork
+    from easygraph.utils.parallel import parallel_sum
+    network, index_of_node = FlowNetwork.from_graph(G, capacity="weight")
+    n = len(index_of_node)
+    pairs = n * (n - 1)
+    if k is None:
+        chosen, scale = range(pairs), 1.0
+    else:
+        if not 0 < k <= pairs:
+            raise ValueError("k should be in [1, {}], got {}.".format(pairs, k))
+        rng = np.random.RandomState(seed=seed)
+        chosen, scale = sorted(rng.choice(pairs, size=k, replace=False).tolist()), pairs / k
+    ret = None
+    if pairs > 0:
+        ret = parallel_sum(_flowbetweenness_parallel, chosen, shared=network, n_workers=n_workers,
+                           backend=backend, chunk_size=chunk_size)
+    if ret is None:
+        ret = np.zeros(n)
+    return dict(zip(index_of_node, (ret * scale).tolist()))
+
+def _flowbetweenness_parallel(pairs, network):
+    """Returns the sum over the chunk of pairs of the share of the maximum flow going through each node.
+
+    Pair number p is the source p // (n-1) and the p % (n-1)-th of the other nodes as sink.
+    """
+    n = network.n
+    betweenness = np.zeros(n)
+    for p in pairs:
+        s, t = divmod(p, n - 1)
+        t += t >= s
+        value, flow = network.max_flow(s, t)
+        if value > 0:
+            betweenness += network.throughput(flow, s, t) / value
+    return betweenness
 
 # flow betweenness
 def NumberOfFlow(G):
+    from easygraph.functions.flow.network import FlowNetwork
+    network, index_of_node = FlowNetwork.from_graph(G, capacity="weight")
     nodes = G.nodes
     result_dict = dict()
     for node1,_ in nodes.items():
@@ -70,61 +104,12 @@ def NumberOfFlow(G):
             if node1 == node2:
                 pass
             else:
-                result_dict[node1][node2] = edmonds_karp(G,node1,node2)
+                result_dict[node1][node2], _ = network.max_flow(index_of_node[node1], index_of_node[node2])
     return result_dict
 
 def edmonds_karp(G,source,sink):
-    nodes = G.nodes
-    parent = dict()
-    for node,_ in nodes.items():
-        parent[node] = -1
-      
-    adj = copy.deepcopy(G.adj) 
-    max_flow = 0
-    while bfs(G,source,sink,parent,adj):
-        path_flow = float("inf")
-        s = sink
-        while s != source:
-            path_flow = min(path_flow,adj[parent[s]][s].get("weight",1))
-            s = parent[s]
-        max_flow += path_flow
-        v = sink
-        while v != source:
-            u = parent[v]
-            x = adj[u][v].get("weight",1)
-            adj[u][v].update({"weight":x})
-            adj[u][v]["weight"] -= path_flow
-
-            flag = 0
-            if v not in adj:
-                adj[v] = dict()
-            if u not in adj[v]:
-                adj[v][u] = dict()
-                flag = 1
-            if flag == 1:
-                x = 0
-            else:
-                x  = adj[v][u].get("weight",1)
-            adj[v][u].update({"weight":x})
-            adj[v][u]["weight"] += path_flow
-            v = parent[v]
+    """Returns the value of the maximum flow from source to sink, with the 'weight' of each edge as capacity (default 1)."""
+    from easygraph.functions.flow.network import FlowNetwork
+    network, index_of_node = FlowNetwork.from_graph(G, capacity="weight")
+    max_flow, _ = network.max_flow(index_of_node[source], index_of_node[sink])
     return max_flow
-
-def bfs(G,source,sink,parent,adj):
-    nodes = G.nodes
-    visited = dict()
-    for node,_ in nodes.items():
-        visited[node] = 0
-    queue = collections.deque()
-    queue.append(source)
-    visited[source] = True
-    while queue:
-        u = queue.popleft()
-        if u not in adj:
-            continue
-        for v, attr in adj[u].items():
-            if (visited[v] == False) and (attr.get("weight",1) > 0):
-                queue.append(v)
-                visited[v] = True
-                parent[v] = u
-    return visited[sink]
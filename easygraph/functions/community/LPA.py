@@ -1,9 +1,9 @@
 import random
 import numpy as np
-from queue import Queue
 import easygraph as eg
 from collections import defaultdict
-import copy
+
+from easygraph.functions.path.bfs import _gather_rows
 
 __all__ = [
     "LPA",
@@ -12,7 +12,160 @@ __all__ = [
     "BMLPA",
 ]
 
-def LPA(G):
+# The fewest edge entries of a color class worth splitting between the workers
+# of SLPA: below it, starting them costs more than listening in this process.
+SLPA_PARALLEL_ENTRIES = 1 << 21
+
+# The label propagation engine shared by LPA, HANP and BMLPA. The graph is the
+# CSR arrays of its snapshot, and the labels an integer array over its nodes.
+# The nodes are updated one color class of the graph at a time: no two nodes
+# of a class are neighbors, so they can all take their new label at once
+# without the oscillations of fully synchronous updates (the semi-synchronous
+# updates of Cordasco and Gargano, IEEE BASNA 2010).
+
+def _csr_arrays(G, weight=None):
+    """Returns the CSR snapshot of G and its arrays indptr, indices and the edge weights (1 if *weight* is None)."""
+    from easygraph.classes import CSRGraph
+    G_csr = CSRGraph.from_graph(G, weight=weight)
+    if weight is None or G_csr.weights is None:
+        weights = np.ones(len(G_csr.indices))
+    else:
+        weights = np.asarray(G_csr.weights, dtype=float)
+    return G_csr, np.asarray(G_csr.indptr, dtype=np.int64), np.asarray(G_csr.indices, dtype=np.int64), weights
+
+def _color_classes(indptr, indices, rng):
+    """Returns the color classes of a proper coloring of the graph, as arrays of nodes.
+
+    Jones-Plassmann coloring, largest degree first: in each round, the
+    uncolored nodes of higher priority than all their uncolored neighbors take
+    the smallest color none of their colored neighbors has. The edges count in
+    both directions.
+    """
+    import scipy.sparse as sps
+    n = len(indptr) - 1
+    A = sps.csr_matrix((np.ones(len(indices)), indices, indptr), shape=(n, n))
+    A = (A + A.T).tocsr()
+    A.setdiag(0)
+    A.eliminate_zeros()
+    indptr, indices = A.indptr.astype(np.int64), A.indices.astype(np.int64)
+    degree = np.diff(indptr)
+    # Distinct priorities, by degree then at random
+    priority = np.empty(n, dtype=np.int64)
+    priority[np.lexsort((rng.random(n), degree))] = np.arange(n)
+    color = np.full(n, -1, dtype=np.int64)
+    uncolored = np.arange(n)
+    while len(uncolored) > 0:
+        rows, positions = _gather_rows(indptr, uncolored)
+        neighbors = indices[positions]
+        # The uncolored nodes with an uncolored neighbor of higher priority wait
+        waiting = rows[(color[neighbors] < 0) & (priority[neighbors] > priority[rows])]
+        ready = np.setdiff1d(uncolored, waiting)
+        # The smallest color missing among the colored neighbors of each ready node
+        rows, positions = _gather_rows(indptr, ready)
+        colored = color[indices[positions]] >= 0
+        taken = np.unique(np.stack([rows[colored], color[indices[positions]][colored]]), axis=1)
+        node, c = taken
+        # The rank of each color among the sorted colors of its node, the
+        # smallest missing color is the rank of the first color above its rank
+        first = np.r_[True, node[1:] != node[:-1]][:len(node)]
+        rank = np.arange(len(node)) - np.maximum.accumulate(np.where(first, np.arange(len(node)), 0))
+        smallest = np.zeros(n, dtype=np.int64)
+        smallest[node] = np.bincount(node, minlength=n)[node]
+        gap = np.flatnonzero(c != rank)
+        gap = gap[np.r_[True, node[gap][1:] != node[gap][:-1]][:len(gap)]]
+        smallest[node[gap]] = rank[gap]
+        color[ready] = smallest[ready]
+        uncolored = np.setdiff1d(uncolored, ready)
+    order = np.argsort(color, kind='stable')
+    return np.split(order, np.flatnonzero(np.diff(color[order])) + 1) if n else []
+
+def _label_votes(indptr, indices, nodes, labels, *weights):
+    """Returns the votes of the neighbors of *nodes* for their labels.
+
+    The votes are one entry per pair of a node and a label of its neighbors,
+    sorted by node: the position of the node in *nodes*, the label, and the
+    sum of each of *weights* (arrays over the edges) over these neighbors.
+    """
+    counts = indptr[nodes + 1] - indptr[nodes]
+    rows = np.repeat(np.arange(len(nodes)), counts)
+    _, positions = _gather_rows(indptr, nodes)
+    n_labels = labels.max() + 1
+    keys, inverse = np.unique(rows * n_labels + labels[indices[positions]], return_inverse=True)
+    inverse = inverse.ravel()
+    sums = [np.bincount(inverse, weights=w[positions], minlength=len(keys)) for w in weights]
+    rows, vote_labels = np.divmod(keys, n_labels)
+    return (rows, vote_labels, *sums)
+
+def _best_labels(rows, vote_labels, totals, current, rng, keep_current=True):
+    """Returns the label of most votes of each row, and the index of its vote.
+
+    With *keep_current*, a row keeps its current label when it is one of the
+    labels of most votes, the other ties are broken at random. The rows
+    without votes keep their label, with the vote index -1.
+    """
+    new = current.copy()
+    vote = np.full(len(current), -1, dtype=np.int64)
+    if len(rows) == 0:
+        return new, vote
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    voted = rows[starts]
+    segment = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(rows)]))
+    most = np.maximum.reduceat(totals, starts)
+    is_most = totals == most[segment]
+    key = rng.random(len(rows))
+    if keep_current:
+        key += (vote_labels == current[rows]) * 2
+    key = np.where(is_most, key, -1)
+    best = np.maximum.reduceat(key, starts)
+    chosen = np.flatnonzero(key == best[segment])
+    chosen = chosen[np.r_[True, rows[chosen][1:] != rows[chosen][:-1]]]
+    new[voted] = vote_labels[chosen]
+    vote[voted] = chosen
+    return new, vote
+
+
+def _is_stable(indptr, indices, labels, weights):
+    """Returns True if the label of every node is one of the labels of most votes of its neighbors."""
+    nodes = np.arange(len(labels))
+    rows, vote_labels, totals = _label_votes(indptr, indices, nodes, labels, weights)
+    if len(rows) == 0:
+        return True
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    most = np.maximum.reduceat(totals, starts)
+    segment = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(rows)]))
+    holds = np.zeros(len(labels), dtype=bool)
+    holds[rows[(totals == most[segment]) & (vote_labels == labels[rows])]] = True
+    return bool(holds[rows[starts]].all())
+
+
+def _partition_communities(G_csr, indptr, indices, labels):
+    """Returns the communities of *labels* as a dict {1: nodes, 2: nodes, ...}.
+
+    The nodes of a label that are not connected to each other by nodes of the
+    same label form several communities. They are numbered in the order of
+    their first node.
+    """
+    import scipy.sparse as sps
+    from scipy.sparse.csgraph import connected_components
+    n = len(labels)
+    tails = np.repeat(np.arange(n), np.diff(indptr))
+    inside = labels[tails] == labels[indices]
+    A = sps.csr_matrix((np.ones(int(inside.sum())), (tails[inside], indices[inside])), shape=(n, n))
+    _, component = connected_components(A, directed=True, connection='weak')
+    return _groups(G_csr.node_of_index, component)
+
+def _groups(node_of_index, component):
+    """Returns {1: nodes of the component 0, 2: ...}, the components numbered in the order of their first node."""
+    _, first, inverse = np.unique(component, return_index=True, return_inverse=True)
+    rank = np.empty(len(first), dtype=np.int64)
+    rank[np.argsort(first)] = np.arange(len(first))
+    component = rank[inverse.ravel()]
+    order = np.argsort(component, kind='stable')
+    bounds = np.flatnonzero(np.diff(component[order])) + 1
+    return {i + 1: [node_of_index[v] for v in block.tolist()]
+            for i, block in enumerate(np.split(order, bounds)) if len(block)}
+
+def LPA(G, seed=None, max_iter=None):
     '''Detect community by label propagation algotithm
     Return the detected communities. But the result is random.
     Each node in the network is initially assigned to its own community. At every iteration,nodes have
@@ -20,63 +173,68 @@ def LPA(G):
     available, choose a label randomly. Finally, nodes having the same labels are grouped together as 
     communities. In case two or more disconnected groups of nodes have the same label, we run a simple 
     breadth-first search to separate the disconnected communities
+
+    The labels are updated semi-synchronously: the nodes of one color class
+    of a proper coloring of the graph, no two of them neighbors, take their
+    new labels at once from the label counts of their neighbors. The
+    propagation stops when the label of every node is one of the most
+    frequent among its neighbors.
+
     Parameters
     ----------
     G : graph
       A easygraph graph
+    seed : int or None, optional (default : None)
+      The seed of the random numbers. The same seed gives the same result.
+    max_iter : int or None, optional (default : None)
+      The maximum number of rounds, None for no limit.
     Returns
     ----------
     communities : dictionary
       key: serial number of community , value: nodes in the community.
     Examples
     ----------
-    >>> LPA(G)
+    >>> LPA(G, seed=1)
     References
     ----------
     .. [1] Usha Nandini Raghavan, Réka Albert, and Soundar Kumara: 
         Near linear time algorithm to detect community structures in large-scale networks
+    .. [2] Gennaro Cordasco, Luisa Gargano:
+        Community detection via semi-synchronous label propagation algorithms
     '''
-    i = 0
-    label_dict = dict() 
-    cluster_community = dict()
-    Next_label_dict = dict()
-    nodes = list(G.nodes.keys())
-    if len(nodes) == 1:
-        return {1:[nodes[0]]}
-    for node in nodes:
-        label_dict[node] = i
-        i = i + 1
+    G_csr, indptr, indices, weights = _csr_arrays(G)
+    n = len(G_csr)
+    if n == 1:
+        return {1: [G_csr.node_of_index[0]]}
+    rng = np.random.default_rng(seed)
+    classes = _color_classes(indptr, indices, rng)
+    labels = np.arange(n)
     loop_count = 0
-    while True:
+    while max_iter is None or loop_count < max_iter:
         loop_count += 1
         print ('loop', loop_count)
-        random.shuffle(nodes)
-        for node in nodes:
-            labels = SelectLabels(G,node,label_dict)
-            if labels == []:
-                Next_label_dict[node] = label_dict[node]
-                continue
-            Next_label_dict[node] = random.choice(labels)
-            # Asynchronous updates. If you want to use synchronous updates, comment the line below
-            label_dict[node] = Next_label_dict[node]
-        label_dict = Next_label_dict
-        if estimate_stop_cond(G, label_dict) is True:
+        for k in rng.permutation(len(classes)).tolist():
+            nodes = classes[k]
+            rows, vote_labels, counts = _label_votes(indptr, indices, nodes, labels, weights)
+            labels[nodes], _ = _best_labels(rows, vote_labels, counts, labels[nodes], rng, keep_current=False)
+        if _is_stable(indptr, indices, labels, weights):
             print ('complete')
             break
-    for node in label_dict.keys():
-        label = label_dict[node]
-        # print ("label, node", label, node)
-        if label not in cluster_community.keys():
-            cluster_community[label] = [node]
-        else:
-            cluster_community[label].append(node) 
-    
-    result_community = CheckConnectivity(G, cluster_community)
-    return result_community
+    return _partition_communities(G_csr, indptr, indices, labels)
+
 
-def SLPA(G, T, r):
+def SLPA(G, T, r, seed=None, n_workers=None, backend=None):
     '''Detect Overlapping Communities by Speaker-listener Label Propagation Algorithm
     Return the detected Overlapping communities. But the result is random.
+
+    The memory of each node is the list of the labels it received, stored as
+    one column of a (T + 1) x n array. A speaker sends each label with the
+    probability of its frequency in its memory, that is the label at a
+    uniformly random position of the memory, so the labels sent to many
+    listeners are sampled at once. The listeners are updated one color class
+    of the graph at a time as in **LPA**: no two of them are neighbors, and
+    the later classes hear the labels the earlier ones received.
+
     Parameters
     ----------
     G : graph
@@ -85,6 +243,15 @@ def SLPA(G, T, r):
       The number of iterations, In general, T is set greater than 20, which produces relatively stable outputs.
     r : int
       a threshold between 0 and 1.
+    seed : int or None, optional (default : None)
+      The seed of the random numbers. The same seed gives the same result, whatever the number of workers.
+    n_workers : int or None, optional (default : None)
+      The number of workers the listeners of each color class are split between. None or 1 for serial computing.
+      The workers are started for each class again, so only the classes with at least
+      SLPA_PARALLEL_ENTRIES (2 ** 21) edge entries are split, that is graphs of tens of
+      millions of edges; the smaller classes are run in this process.
+    backend : string or None, optional (default : None)
+      One of 'serial', 'process', 'thread', see **parallel_map**.
     Returns
     -------
     communities : dictionary
@@ -93,57 +260,59 @@ def SLPA(G, T, r):
     ----------
     >>> SLPA(G,
     ...     T = 20, 
-    ...     r = 0.05
+    ...     r = 0.05,
+    ...     seed = 1
     ...     )     
     References
     ----------
     .. [1] Jierui Xie, Boleslaw K. Szymanski, Xiaoming Liu:
         SLPA: Uncovering Overlapping Communities in Social Networks via A Speaker-listener Interaction Dynamic Process
     '''
-    nodes = list(G.nodes.keys())
-    if len(nodes) == 1:
-        return {1:[nodes[0]]}
-    nodes = G.nodes
-    adj = G.adj
-    memory = {i:{i:1} for i in nodes}
-    for i in range(0,T):
-        listenerslist = list(G.nodes)
-        random.shuffle(listenerslist)
-        for listener in listenerslist:
-            speakerlist = adj[listener]
-            if len(speakerlist) == 0:
+    from easygraph.utils.parallel import parallel_map
+    G_csr, indptr, indices, _ = _csr_arrays(G)
+    n = len(G_csr)
+    if n == 1:
+        return {1: [G_csr.node_of_index[0]]}
+    rng = np.random.default_rng(seed)
+    dtype = np.int32 if n < 2 ** 31 else np.int64
+    # history[:size[v], v] is the memory of node v, which starts with its own label
+    history = np.zeros((T + 1, n), dtype=dtype)
+    history[0] = np.arange(n)
+    size = np.ones(n, dtype=np.int64)
+    has_speakers = np.diff(indptr) > 0
+    classes = [nodes[has_speakers[nodes]] for nodes in _color_classes(indptr, indices, rng)]
+    # draws[p]: the uniform number choosing the label sent along the p-th edge entry, drawn in
+    # this process so that the result does not depend on how the listeners are split
+    draws = np.empty(len(indices))
+    for i in range(0, T):
+        for k in rng.permutation(len(classes)).tolist():
+            listeners = classes[k]
+            if len(listeners) == 0:
                 continue
-            labels = defaultdict(int)
-            for speaker in speakerlist:
-                # Speaker Rule
-                total = float(sum(memory[speaker].values()))
-                keys = list(memory[speaker].keys())
-                index = np.random.multinomial(1,[round(freq / total, 2) for freq in memory[speaker].values()]).argmax()
-                chosen_label = keys[index]
-                labels[chosen_label] += 1
-            # Listener Rule
-            maxlabel = max(labels.items(), key = lambda x:x[1])[0]
-            if maxlabel in memory[listener]:
-                memory[listener][maxlabel] += 1
+            _, positions = _gather_rows(indptr, listeners)
+            draws[positions] = rng.random(len(positions))
+            shared = (indptr, indices, history, size, draws)
+            if len(positions) < SLPA_PARALLEL_ENTRIES:
+                labels = _slpa_listen(listeners, shared)
             else:
-                memory[listener][maxlabel] = 1
-    
-    for node, labels in memory.items():
-        name_list = []
-        for label_name, label_number in labels.items():
-            if round(label_number / float(T + 1), 2) < r:
-                name_list.append(label_name)
-        for name in name_list:
-            del labels[name]
+                labels = np.concatenate(parallel_map(_slpa_listen, listeners.tolist(), shared=shared,
+                                                     n_workers=n_workers, backend=backend))
+            history[size[listeners], listeners] = labels
+            size[listeners] += 1
+
+    # The labels of each node whose frequency in its memory is at least r
+    nodes = np.repeat(np.arange(n), size)
+    kept = history.T[np.arange(T + 1) < size[:, None]].astype(np.int64)
+    keys, frequency = np.unique(kept * n + nodes, return_counts=True)
+    keys = keys[np.round(frequency / float(T + 1), 2) >= r]
+    labels, members = np.divmod(keys, n)
 
     # Find nodes membership
     communities = {}
-    for node, labels in memory.items():
-        for label in labels:
-            if label in communities:
-                communities[label].add(node)
-            else:
-                communities[label] = set([node])
+    bounds = np.flatnonzero(np.diff(labels)) + 1
+    for block in np.split(np.arange(len(keys)), bounds):
+        if len(block):
+            communities[int(labels[block[0]])] = set(G_csr.node_of_index[v] for v in members[block].tolist())
 
     # Remove nested communities  
     RemoveNested(communities)   
@@ -152,7 +321,25 @@ def SLPA(G, T, r):
     result_community = CheckConnectivity(G, communities)
     return result_community
 
-def HANP(G, m, delta, threshod = 1, hier_open = 0, combine_open = 0):
+def _slpa_listen(listeners, shared):
+    # The label each listener takes this round: the most frequent among the labels its speakers send
+    indptr, indices, history, size, draws = shared
+    listeners = np.asarray(listeners, dtype=np.int64)
+    # Speaker Rule
+    rows = np.repeat(np.arange(len(listeners)), indptr[listeners + 1] - indptr[listeners])
+    _, positions = _gather_rows(indptr, listeners)
+    speakers = indices[positions]
+    sent = history[(draws[positions] * size[speakers]).astype(np.int64), speakers].astype(np.int64)
+    # Listener Rule, of the most frequent labels the one its first speaker sent
+    n = history.shape[1]
+    keys, first, inverse = np.unique(rows * n + sent, return_index=True, return_inverse=True)
+    counts = np.bincount(inverse.ravel(), minlength=len(keys))
+    rows, vote_labels = np.divmod(keys, n)
+    order = np.lexsort((first, -counts, rows))
+    chosen = order[np.r_[True, rows[order][1:] != rows[order][:-1]]]
+    return vote_labels[chosen].astype(history.dtype)
+
+def HANP(G, m, delta, threshod = 1, hier_open = 0, combine_open = 0, seed = None, max_iter = None):
     '''Detect community by Hop attenuation & node preference algotithm
 
     Return the detected communities. But the result is random.
@@ -163,7 +350,13 @@ def HANP(G, m, delta, threshod = 1, hier_open = 0, combine_open = 0):
     from the neighborhood and carry out a subtraction) and When an equilibrium is reached, treat newly combined 
     communities as a single node.
 
-    For using Floyd to get the shortest distance, the time complexity is a little high.
+    The geodesic distances are the hop counts from the origin of each label, by BFS that only go as
+    deep as the labels spread, so that the hierarchical mode does not need all the pairwise distances.
+
+    Without geodesic distance, the labels are updated semi-synchronously,
+    one color class of the graph at a time as in **LPA**. The hop score of a
+    node is the best score of its neighbors of the same label, minus delta
+    when it adopts a new label.
 
     Parameters
     ----------
@@ -183,6 +376,10 @@ def HANP(G, m, delta, threshod = 1, hier_open = 0, combine_open = 0):
       this option is valid only when hier_open = 1
       1 means When an equilibrium is reached, treat newly combined communities as a single node.
       0 means not.
+    seed : int or None, optional (default : None)
+      The seed of the random numbers, used when hier_open = 0.
+    max_iter : int or None, optional (default : None)
+      The maximum number of rounds when hier_open = 0, None for no limit.
 
     Returns
     ----------
@@ -205,6 +402,56 @@ def HANP(G, m, delta, threshod = 1, hier_open = 0, combine_open = 0):
         Towards real-time community detection in large networks
 
     '''
+    if hier_open == 1:
+        return _hierarchical_HANP(G, m, threshod, combine_open)
+    G_csr, indptr, indices, weights = _csr_arrays(G, weight='weight')
+    n = len(G_csr)
+    if n == 1:
+        return {1: [G_csr.node_of_index[0]]}
+    rng = np.random.default_rng(seed)
+    classes = _color_classes(indptr, indices, rng)
+    degrees = G.degree()
+    degree = np.array([degrees.get(node, 0) for node in G_csr.node_of_index], dtype=float)
+    with np.errstate(divide='ignore'):
+        preference = degree[indices] ** m * weights
+    ones = np.ones(len(indices))
+    n_neighbors = np.diff(indptr)
+    labels = np.arange(n)
+    # The hop score of each node, all the nodes start as origins of their labels
+    score = np.ones(n)
+    loop_count = 0
+    while max_iter is None or loop_count < max_iter:
+        loop_count += 1
+        print ('loop', loop_count)
+        changed = 0
+        for k in rng.permutation(len(classes)).tolist():
+            nodes = classes[k]
+            current = labels[nodes]
+            rows, vote_labels, counts, totals = _label_votes(indptr, indices, nodes, labels, ones,
+                                                             score[indices] * preference)
+            new, vote = _best_labels(rows, vote_labels, totals, current, rng)
+            # only update node whose number of neighbors sharing the maximal label is less than a certain percentage.
+            voted = vote >= 0
+            keep = np.zeros(len(nodes), dtype=bool)
+            keep[voted] = np.round(counts[vote[voted]] / n_neighbors[nodes[voted]], 2) > threshod
+            new[keep] = current[keep]
+            labels[nodes] = new
+            moved = new != current
+            changed += np.count_nonzero(moved)
+            # The new score is the best score of the neighbors of the same label, minus delta if the label changed
+            rows, positions = _gather_rows(indptr, nodes[voted])
+            neighbors = indices[positions]
+            best = np.zeros(n)
+            np.maximum.at(best, rows, np.where(labels[neighbors] == labels[rows], score[neighbors], 0))
+            score[nodes[voted]] = best[nodes[voted]] - delta * moved[voted]
+        if changed == 0:
+            print ('complete')
+            break
+    return _partition_communities(G_csr, indptr, indices, labels)
+
+
+def _hierarchical_HANP(G, m, threshod, combine_open):
+    # HANP with the geodesic distance to the origin of the labels as score
     nodes = list(G.nodes.keys())
     if len(nodes) == 1:
         return {1:[nodes[0]]}
@@ -213,15 +460,13 @@ def HANP(G, m, delta, threshod = 1, hier_open = 0, combine_open = 0):
     node_dict = dict()
     Next_label_dict = dict()
     cluster_community = dict()
-    nodes = list(G.nodes.keys())
     degrees = G.degree()
     records = []
     loop_count = 0
     i = 0
     old_score = 1
     ori_G = G
-    if hier_open == 1:
-        distance_dict = eg.Floyd(G)
+    distances = _HopDistances(G)
     for node in nodes:
         label_dict[node] = i
         score_dict[i] = 1
@@ -237,24 +482,18 @@ def HANP(G, m, delta, threshod = 1, hier_open = 0, combine_open = 0):
             if labels == []:
                 Next_label_dict[node] = label_dict[node]
                 continue
-            old_label = label_dict[node]
             Next_label_dict[node] = random.choice(labels)
             # Asynchronous updates. If you want to use synchronous updates, comment the line below
             label_dict[node] = Next_label_dict[node]
-            if hier_open == 1:
-                score_dict[Next_label_dict[node]] = UpdateScore_Hier(G, node, label_dict, node_dict, distance_dict)           
-                score = min(score, score_dict[Next_label_dict[node]])
-            else :
-                if old_label == Next_label_dict[node]:
-                    cdelta = 0
-                else:
-                    cdelta = delta
-                score_dict[Next_label_dict[node]] = UpdateScore(G, node, label_dict, score_dict, cdelta)
-        if hier_open == 1 and combine_open == 1:
+            score_dict[Next_label_dict[node]] = UpdateScore_Hier(G, node, label_dict, node_dict, distances)
+            score = min(score, score_dict[Next_label_dict[node]])
+        if combine_open == 1:
            if old_score - score > 1/3:
                 old_score = score
-                records, G, label_dict, score_dict, node_dict, Next_label_dict, nodes, degrees, distance_dict = CombineNodes(records, G, label_dict, score_dict, node_dict, Next_label_dict, nodes, degrees, distance_dict)
+                records, G, label_dict, score_dict, node_dict, Next_label_dict, nodes, degrees, distances = CombineNodes(records, G, label_dict, score_dict, node_dict, Next_label_dict, nodes, degrees, distances)
         label_dict = Next_label_dict
+        # Drop the searches from the origins of the labels no node has any more
+        distances.forget(node_dict[label] for label in set(label_dict.values()))
         if estimate_stop_cond_HANP(G,label_dict,score_dict,degrees,m,threshod) is True:
             print ('complete')
             break
@@ -264,13 +503,13 @@ def HANP(G, m, delta, threshod = 1, hier_open = 0, combine_open = 0):
             cluster_community[label] = [node]
         else:
             cluster_community[label].append(node) 
-    if hier_open == 1 and combine_open == 1:
+    if combine_open == 1:
         records.append(cluster_community)
         cluster_community = ShowRecord(records)
     result_community = CheckConnectivity(ori_G, cluster_community)
     return result_community
 
-def BMLPA(G, p):
+def BMLPA(G, p, max_iter = 50):
     '''Detect community by Balanced Multi-Label Propagation algotithm
 
     Return the detected communities.
@@ -281,12 +520,23 @@ def BMLPA(G, p):
 
     For some directed graphs lead to oscillations of labels, modify the stop condition.
 
+    The labels of all the nodes are a sparse matrix of belonging coefficients,
+    node by community identifier, and each round propagates them at once
+    with one sparse product by the adjacency matrix.
+
+    All the nodes of a rough core start with the same community identifier,
+    as in [1], so there is at most one community per rough core before the
+    split of discontinuous communities. Earlier versions gave each node of a
+    core its own identifier, and returned more, smaller communities.
+
     Parameters
     ----------
     G : graph
       A easygraph graph
     p : float
       Between 0 and 1, judge Whether a community identifier should be retained 
+    max_iter : int or None, optional (default : 50)
+      The maximum number of rounds, None for no limit.
 
     Returns
     ----------
@@ -295,7 +545,7 @@ def BMLPA(G, p):
 
     Examples
     ----------
-    >>> HANP(G,
+    >>> BMLPA(G,
     ...     p = 0.1, 
     ...     )    
 
@@ -305,88 +555,84 @@ def BMLPA(G, p):
         Balanced Multi-Label Propagation for Overlapping Community Detection in Social Networks
 
     '''
-    nodes = list(G.nodes.keys())
-    if len(nodes) == 1:
-        return {1:[nodes[0]]}
+    import scipy.sparse as sps
+    G_csr, indptr, indices, weights = _csr_arrays(G)
+    n = len(G_csr)
+    if n == 1:
+        return {1: [G_csr.node_of_index[0]]}
+    A = sps.csr_matrix((weights, indices, indptr), shape=(n, n))
+    # Each rough core is one community identifier of its nodes, with coefficient 1
     cores = Rough_Cores(G)
-    nodes = G.nodes
-    i = 0
-    old_label_dict = dict()
-    new_label_dict = dict()
-    for core in cores:
-        for node in core:
-            if node not in old_label_dict:
-                old_label_dict[node] = {i:1}
-            else: 
-                old_label_dict[node][i] = 1
-            i += 1
-    oldMin = dict()
+    index_of_node = G_csr.index_of_node
+    rows = [index_of_node[node] for core in cores for node in core]
+    identifiers = np.repeat(np.arange(len(cores)), [len(core) for core in cores])
+    old = sps.csr_matrix((np.ones(len(rows)), (rows, identifiers)), shape=(n, len(cores)))
+    old.data[:] = 1
+    oldMin = None
     loop_count = 0
-    old_label_dictx = dict()
-    while True:
+    while max_iter is None or loop_count < max_iter:
         loop_count += 1
         print ('loop', loop_count)
-        old_label_dictx = old_label_dict
-        for node in nodes:
-            Propagate_bbc(G, node, old_label_dict, new_label_dict, p)
-        if  loop_count > 50 and old_label_dict == old_label_dictx:
-            print ('complete')
-            break
-        Min = dict()
-        if Id(old_label_dict) == Id(new_label_dict):
-            Min = mc( count(old_label_dict), count(new_label_dict) )
-        else:
-            Min = count(new_label_dict)
-        if loop_count > 15000:
-            print ('complete')
-            break
-        if Min != oldMin:
-            old_label_dict = copy.deepcopy(new_label_dict)
-            oldMin = Min
+        new = _propagate_bbc(A, old, p)
+        # The number of nodes of each identifier, the least of both rounds if the identifiers of every node stay
+        count = np.bincount(new.indices, minlength=new.shape[1])
+        if np.array_equal(old.indptr, new.indptr) and np.array_equal(old.indices, new.indices):
+            Min = np.minimum(np.bincount(old.indices, minlength=old.shape[1]), count)
         else:
-            print ('complete')
+            Min = count
+        if oldMin is not None and np.array_equal(Min, oldMin):
             break
+        old = new
+        oldMin = Min
+    print ('complete')
     communities = dict()
-    for node in nodes:
-        for label, _ in old_label_dict[node].items():
-            if label in communities:
-                communities[label].add(node)
-            else:
-                communities[label] = set([node])
+    old = old.tocsc()
+    for identifier in range(old.shape[1]):
+        members = old.indices[old.indptr[identifier]:old.indptr[identifier + 1]]
+        if len(members) > 0:
+            communities[identifier] = set(G_csr.node_of_index[v] for v in members.tolist())
     RemoveNested(communities)
     result_community = CheckConnectivity(G, communities)
     return result_community
 
+def _propagate_bbc(A, old, p):
+    # The belonging coefficients of all the nodes propagated from their neighbors,
+    # the nodes without neighbors keep theirs
+    import scipy.sparse as sps
+    new = (A @ old).tocsr()
+    new.eliminate_zeros()
+    lonely = np.diff(new.indptr) == 0
+    if lonely.any():
+        new = (new + sps.diags(lonely.astype(float)) @ old).tocsr()
+    new.sort_indices()
+    # Remove the identifiers whose coefficient is below p times the largest one of the node
+    row_max = np.maximum.reduceat(new.data, new.indptr[:-1][np.diff(new.indptr) > 0])
+    counts = np.diff(new.indptr)
+    new.data[new.data / np.repeat(row_max, counts[counts > 0]) < p] = 0
+    new.eliminate_zeros()
+    # Normalize the coefficients of each node to sum 1
+    total = np.asarray(new.sum(axis=1)).ravel()
+    new.data /= np.repeat(total, np.diff(new.indptr))
+    return new
+
 def RemoveNested(communities):
-    nestedCommunities = set()
+    # Remove the communities contained in another one, of two equal communities the first one.
+    # The sizes of the pairwise intersections are the entries of M^T M, M the node by community incidence matrix
+    import scipy.sparse as sps
     keys = list(communities.keys())
-    for i, label0 in enumerate(keys[:-1]):
-        comm0 = communities[label0]
-        for label1 in keys[i+1:]:
-            comm1 = communities[label1]
-            if comm0.issubset(comm1):
-                nestedCommunities.add(label0)
-            elif comm0.issuperset(comm1):
-                nestedCommunities.add(label1)
-    for comm in nestedCommunities:
-        del communities[comm]
-
-def SelectLabels(G,node,label_dict):
-    adj = G.adj
-    count = {}
-    count_items = []
-    for neighbor in adj[node]:
-        neighbor_label = label_dict[neighbor]
-        count[neighbor_label] = count.get(neighbor_label, 0) + 1
-        count_items = sorted(count.items(),key = lambda x: x[1], reverse = True)
-    labels = [k for k,v in count_items if v == count_items[0][1]]
-    return labels
-
-def estimate_stop_cond(G,label_dict):
-    for node in G.nodes:
-        if SelectLabels(G,node,label_dict) != [] and (label_dict[node] not in SelectLabels(G,node,label_dict)):
-            return False
-    return True
+    if len(keys) < 2:
+        return
+    index_of_node = dict()
+    rows = [index_of_node.setdefault(node, len(index_of_node)) for label in keys for node in communities[label]]
+    sizes = np.array([len(communities[label]) for label in keys])
+    columns = np.repeat(np.arange(len(keys)), sizes)
+    M = sps.csr_matrix((np.ones(len(rows)), (rows, columns)), shape=(len(index_of_node), len(keys)))
+    common = (M.T @ M).tocoo()
+    a, b = common.row, common.col
+    nested = (a != b) & (common.data == sizes[a]) & ((sizes[a] < sizes[b]) | (a < b))
+    nestedCommunities = set(a[nested].tolist()) | set(np.flatnonzero(sizes == 0).tolist())
+    for i in nestedCommunities:
+        del communities[keys[i]]
 
 def SelectLabels_HANP(G,node,label_dict,score_dict,degrees,m,threshod):
     adj = G.adj
@@ -405,30 +651,85 @@ def SelectLabels_HANP(G,node,label_dict,score_dict,degrees,m,threshod):
         return [label_dict[node]]
     return labels
 
-def HopAttenuation_Hier(G, node, label_dict, node_dict, distance_dict):
-    distance = float("inf")
-    Max_distance = 0
+def HopAttenuation_Hier(G, node, label_dict, node_dict, distances):
     adj = G.adj
     label = label_dict[node]
     ori_node = node_dict[label]
-    for _, distancex in distance_dict[ori_node].items():
-        Max_distance = max(Max_distance, distancex)
-    for neighbor in adj[node]:
-        if label_dict[neighbor] == label:
-            distance = min(distance, distance_dict[ori_node][neighbor])
+    distance = distances.distance(ori_node, [neighbor for neighbor in adj[node] if label_dict[neighbor] == label])
+    if distance == float("inf"):
+        return distance
+    Max_distance = max(distances.eccentricity(ori_node), 1)
     return round((1 + distance) / Max_distance, 2)
 
-def UpdateScore_Hier(G, node, label_dict, node_dict, distance_dict):
-    return 1 - HopAttenuation_Hier(G, node, label_dict, node_dict,distance_dict)
+def UpdateScore_Hier(G, node, label_dict, node_dict, distances):
+    return 1 - HopAttenuation_Hier(G, node, label_dict, node_dict, distances)
 
-def UpdateScore(G, node, label_dict, score_dict, delta):
-    adj = G.adj
-    Max_score = 0
-    label = label_dict[node]
-    for neighbor in adj[node]:
-        if label_dict[neighbor] == label:
-            Max_score = max(Max_score, score_dict[label_dict[neighbor]])
-    return Max_score - delta
+class _HopDistances(object):
+    """Hop distances from the origins of the labels of hierarchical HANP.
+
+    The BFS from an origin is a ball of the nodes within some distance, which
+    grows level by level only until it reaches the nodes asked for: the labels
+    spread over a few hops around their origins. The eccentricities of the
+    undirected graphs come from the bounds of Takes and Kosters, each BFS from
+    an origin bounds the eccentricities of all the nodes of its component by
+    max(d, e - d) and e + d, and the ones already tight need no search.
+    """
+
+    def __init__(self, G):
+        from easygraph.classes import CSRGraph
+        G_csr = CSRGraph.from_graph(G, weight=None)
+        self._adj = G.adj
+        self._index_of_node = G_csr.index_of_node
+        self._indptr = np.asarray(G_csr.indptr, dtype=np.int64)
+        self._indices = np.asarray(G_csr.indices, dtype=np.int64)
+        self._directed = G.is_directed()
+        self._lower = np.zeros(len(G_csr), dtype=np.int64)
+        self._upper = np.full(len(G_csr), np.iinfo(np.int64).max)
+        # origin -> (distance of each node of the ball, the nodes of its last level)
+        self._balls = dict()
+
+    def distance(self, origin, targets):
+        """Returns the hop distance from origin to the nearest of targets, inf if none is reachable."""
+        if not targets:
+            # Nothing to look for, the ball of origin need not grow to the whole component
+            return float("inf")
+        if origin not in self._balls:
+            self._balls[origin] = ({origin: 0}, [origin])
+        dist, frontier = self._balls[origin]
+        while frontier and not any(target in dist for target in targets):
+            depth = dist[frontier[0]] + 1
+            next_frontier = []
+            for u in frontier:
+                for w in self._adj[u]:
+                    if w not in dist:
+                        dist[w] = depth
+                        next_frontier.append(w)
+            frontier = next_frontier
+            self._balls[origin] = (dist, frontier)
+        return min((dist[target] for target in targets if target in dist), default=float("inf"))
+
+    def eccentricity(self, origin):
+        """Returns the largest hop distance from origin to the nodes it reaches."""
+        from easygraph.functions.path.bfs import _bfs_levels
+        v = self._index_of_node[origin]
+        if self._lower[v] < self._upper[v]:
+            if self._directed:
+                level = _bfs_levels(self._indptr, self._indices, v)
+                self._lower[v] = self._upper[v] = level.max()
+            else:
+                level = _bfs_levels(self._indptr, self._indices, v, self._indptr, self._indices)
+                reached = np.flatnonzero(level >= 0)
+                d = level[reached]
+                e = d.max()
+                self._lower[reached] = np.maximum(self._lower[reached], np.maximum(d, e - d))
+                self._upper[reached] = np.minimum(self._upper[reached], e + d)
+        return int(self._lower[v])
+
+    def forget(self, origins):
+        """Drops the balls of all the origins but the given ones."""
+        origins = set(origins)
+        for origin in [origin for origin in self._balls if origin not in origins]:
+            del self._balls[origin]
 
 def estimate_stop_cond_HANP(G,label_dict,score_dict,degrees,m,threshod):
     for node in G.nodes:
@@ -436,7 +737,7 @@ def estimate_stop_cond_HANP(G,label_dict,score_dict,degrees,m,threshod):
             return False
     return True
 
-def CombineNodes(records, G, label_dict, score_dict, node_dict, Next_label_dict, nodes, degrees, distance_dict):
+def CombineNodes(records, G, label_dict, score_dict, node_dict, Next_label_dict, nodes, degrees, distances):
     onerecord = dict()
     for node,label in label_dict.items():
         if label in onerecord:
@@ -452,6 +753,8 @@ def CombineNodes(records, G, label_dict, score_dict, node_dict, Next_label_dict,
     cnt = 0
     for record_label in onerecord:
         nodesx.append(cnt)
+        # The communities without edges to the others are nodes of Gx too
+        Gx.add_node(cnt)
         label_dictx[cnt] = record_label
         score_dictx[record_label] = score_dict[record_label]
         node_dictx[record_label] = cnt
@@ -483,9 +786,10 @@ def CombineNodes(records, G, label_dict, score_dict, node_dict, Next_label_dict,
     Next_label_dict = label_dictx
     nodes = nodesx
     degrees = G.degree()
-    distance_dict = eg.Floyd(G)
-    return records, G, label_dict, score_dict, node_dict, Next_label_dict, nodes, degrees, distance_dict
+    distances = _HopDistances(G)
+    return records, G, label_dict, score_dict, node_dict, Next_label_dict, nodes, degrees, distances
     
+
 def ShowRecord(records):
     """
     e.g.
@@ -515,141 +819,60 @@ def ShowRecord(records):
     return first   
 
 def CheckConnectivity(G, communities):
-    result_community = dict()
-    community = [list(community) for label,community in communities.items()]     
-    communityx = []   
-    for nodes in community:
-        BFS(G, nodes, communityx)
-    i = 0
-    for com in communityx:
-        i += 1
-        result_community[i] = com
-    return result_community
-
-def BFS(G, nodes, result):
-    # check the nodes in G are connected or not. if not, desperate the nodes into different connected subgraphs.
-    if len(nodes) == 0:
-        return 
-    if len(nodes) == 1:
-        result.append(nodes)
-        return 
-    adj = G.adj
-    queue = Queue()
-    queue.put(nodes[0])
-    seen = set()
-    seen.add(nodes[0])
-    count = 0
-    while(queue.empty()==0):
-        vertex = queue.get()
-        count += 1
-        for w in adj[vertex]:
-            if w in nodes and w not in seen:
-                queue.put(w)
-                seen.add(w)
-    if count != len(nodes):
-        result.append([w for w in seen])
-        return BFS(G, [w for w in nodes if w not in seen],result) 
-    else :
-        result.append(nodes)
-        return 
+    # Split each community into its connected parts. The parts of all the communities are the
+    # components of one graph over the (community, node) pairs, linked by the edges inside the community
+    from scipy.sparse.csgraph import connected_components
+    import scipy.sparse as sps
+    from easygraph.classes import CSRGraph
+    G_csr = CSRGraph.from_graph(G, weight=None)
+    n = len(G_csr)
+    indptr, indices = np.asarray(G_csr.indptr, dtype=np.int64), np.asarray(G_csr.indices, dtype=np.int64)
+    index_of_node = G_csr.index_of_node
+    members = [node for community in communities.values() for node in community]
+    if len(members) == 0:
+        return dict()
+    label = np.repeat(np.arange(len(communities)), [len(community) for community in communities.values()])
+    node = np.fromiter((index_of_node[v] for v in members), dtype=np.int64, count=len(members))
+    key = label * n + node
+    order = np.argsort(key, kind='stable')
+    sorted_key = key[order]
+    _, positions = _gather_rows(indptr, node)
+    pairs = np.repeat(np.arange(len(node)), indptr[node + 1] - indptr[node])
+    target = label[pairs] * n + indices[positions]
+    found = np.minimum(np.searchsorted(sorted_key, target), len(key) - 1)
+    inside = sorted_key[found] == target
+    P = sps.csr_matrix((np.ones(int(inside.sum())), (pairs[inside], order[found[inside]])),
+                       shape=(len(key), len(key)))
+    _, component = connected_components(P, directed=True, connection='weak')
+    return _groups(members, component)
 
 def Rough_Cores(G):
     nodes = G.nodes
     degrees = G.degree()
     adj =G.adj
-    seen_dict = dict()
-    label_dict = dict()
+    seen = set()
     cores = []
-    i = 0
-    for node in nodes:
-        label_dict[node] = i
-        seen_dict[node] = 1
-        i += 1
     degree_list = sorted(degrees.items(),key = lambda x: x[1], reverse = True)
+    rank = {node: i for i, (node, _) in enumerate(degree_list)}
     for node,_ in degree_list:
         core = []
-        if degrees[node] >= 3 and seen_dict[node] == 1:
-            for neighbor in adj[node]:  
-                max_degree = 0
-                j = node
-                if seen_dict[neighbor] == 1:
-                    if degrees[neighbor] > max_degree:
-                        max_degree = degrees[neighbor]
-                        j = neighbor
-                    elif degrees[neighbor] == max_degree:
-                        pass
-                if j != []:
-                    core = [node] + [j]
-                    commNeiber = [i for i in adj[node] if i in adj[j]]
-                    commNeiber = [node for node,_ in degree_list if node in commNeiber]
-                    while commNeiber != []:
-                        for h in commNeiber[::-1]:
-                            core.append(h)
-                            commNeiber = [i for i in commNeiber if i in adj[h]]
+        if degrees[node] >= 3 and node not in seen:
+            # The core grows from the node and its last neighbor, if not in a core yet
+            j = node
+            for neighbor in adj[node]:
+                j = neighbor if neighbor not in seen and degrees[neighbor] > 0 else node
+            core = [node] + [j]
+            # The common neighbors, by decreasing degree
+            commNeiber = sorted((i for i in adj[node] if i in adj[j]), key = rank.__getitem__)
+            while commNeiber != []:
+                for h in commNeiber[::-1]:
+                    core.append(h)
+                    commNeiber = [i for i in commNeiber if i != h and i in adj[h]]
         if len(core) >= 3:
-            for i in core:
-                seen_dict[i] = 0
+            seen.update(core)
             cores.append(core)
-    core_node = []
-    for core in cores:
-        core_node += core
+    core_node = set(seen)
     for node in nodes:
         if node not in core_node:
             cores.append([node])
     return cores
-
-def Normalizer(l):
-    Sum = 0
-    for identifier, coefficient in l.items():
-        Sum += coefficient
-    for identifier, coefficient in l.items():
-        l[identifier] = round(coefficient / Sum, 2)
-
-def Propagate_bbc(G, x, source, dest, p):    
-    adj = G.adj
-    dest[x] = dict()
-    max_b = 0
-    for y in adj[x]:
-        for identifier, coefficient in source[y].items():
-            b = coefficient
-            if identifier in dest[x]:
-                dest[x][identifier] += b 
-            else:
-                dest[x][identifier] = b
-            max_b = max(dest[x][identifier], max_b)
-    if max_b == 0:
-        dest[x] = source[x]
-        return
-    for identifier in list(dest[x].keys()):
-        if dest[x][identifier] / max_b < p:
-            del dest[x][identifier]
-    Normalizer(dest[x])
-
-def Id(l):
-    ids = dict()
-    for x in l:
-        ids[x] = Id1(l[x])
-    return ids 
-
-def Id1(x):
-    ids = []
-    for identifier, _ in x.items():
-        if identifier not in ids:
-            ids.append(identifier)
-    return ids 
-
-def count(l):
-    counts = dict()
-    for x in l:
-        for identifier, _ in l[x].items():
-            if identifier in counts:
-                counts[identifier] += 1
-            else:
-                counts[identifier] = 1
-    return counts
-
-def mc(cs1, cs2):
-    cs = dict()
-    for identifier, _ in cs1.items():
-        cs[identifier] = min(cs1[identifier], cs2[identifier])
-    return cs    
\ No newline at end of file
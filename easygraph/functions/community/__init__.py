@@ -1,3 +1,4 @@
 from .modularity_max_detection import *
 from .modularity import *
-from .LPA import *
\ No newline at end of file
+from .louvain import *
+from .LPA import *
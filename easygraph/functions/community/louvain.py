@@ -0,0 +1,389 @@
+"""
+Multi-level modularity optimization: Louvain [1]_ and Leiden [2]_.
+
+Both alternate two phases on integer-indexed arrays. The local moving phase
+moves single nodes to the neighbor community of largest modularity gain, the
+aggregation phase collapses the communities into the nodes of the next level,
+``W' = S^T W S`` for the membership matrix S. Leiden refines each community
+into well-connected subcommunities before aggregating, and starts the next
+level from the unrefined communities.
+
+The graph is the symmetric sparse matrix W of its edge weights, with the
+self-loops counted twice on the diagonal, so that the row sums are the
+degrees. The edges of a directed graph count in both directions.
+
+References
+----------
+.. [1] Blondel V D, Guillaume J L, Lambiotte R, et al. Fast unfolding of
+   communities in large networks[J]. Journal of Statistical Mechanics, 2008.
+.. [2] Traag V A, Waltman L, van Eck N J. From Louvain to Leiden: guaranteeing
+   well-connected communities[J]. Scientific Reports, 2019, 9: 5233.
+"""
+from collections import deque
+
+import numpy as np
+
+from easygraph.functions.community.modularity import _label_modularity
+
+__all__ = [
+    "louvain_communities",
+    "leiden_communities",
+]
+
+# The parallel local moving stops when fewer than this fraction of the nodes can still move,
+# or when the modularity gains less than PARALLEL_MIN_GAIN two rounds in a row
+PARALLEL_MIN_MOVES = 1e-4
+PARALLEL_MIN_GAIN = 1e-4
+
+
+def louvain_communities(G, weight='weight', resolution=1, threshold=1e-7, seed=None, parallel=False):
+    """Communities detection via Louvain method.
+
+    Find communities in graph by multi-level modularity optimization [1]_.
+    Each level moves nodes one at a time to the neighbor community of
+    largest modularity gain, then merges the communities into single nodes.
+    The levels stop when the modularity gains less than *threshold*.
+
+    Parameters
+    ----------
+    G : easygraph.Graph or easygraph.DiGraph
+        The edges of a directed graph are regarded as undirected.
+
+    weight : string or None, optional (default : 'weight')
+        The key for edge weight. If None, all the weights will be 1.
+
+    resolution : float, optional (default : 1)
+        The resolution $\\gamma$ of the modularity. Below 1 favors larger
+        communities, above 1 smaller ones.
+
+    threshold : float, optional (default : 1e-7)
+        The least modularity gain of a level to go on with the next one.
+
+    seed : int or None, optional (default : None)
+        The seed of the random order of the nodes.
+
+    parallel : bool, optional (default : False)
+        If True, the local moving phase moves all the nodes at once in
+        vectorized rounds, a random half of the improving moves per round,
+        instead of one node at a time. Much faster on large graphs, for a
+        slightly lower modularity.
+
+    Returns
+    ----------
+    communities : list of frozenset
+        The communities, largest first.
+
+    Examples
+    --------
+    >>> louvain_communities(G, resolution=1, seed=1)
+
+    References
+    ----------
+    .. [1] Blondel V D, Guillaume J L, Lambiotte R, et al. Fast unfolding of
+       communities in large networks[J]. Journal of Statistical Mechanics, 2008.
+
+    """
+    return _multilevel_communities(G, weight, resolution, threshold, seed, parallel, refine=False)
+
+
+def leiden_communities(G, weight='weight', resolution=1, threshold=1e-7, seed=None, parallel=False,
+                       randomness=0.01):
+    """Communities detection via Leiden method.
+
+    Find communities in graph by the Leiden algorithm [1]_, Louvain with a
+    refinement phase: before aggregation, each community is split into
+    subcommunities that nodes join only if they are well connected to them,
+    so that no community ends up disconnected.
+
+    Parameters
+    ----------
+    G : easygraph.Graph or easygraph.DiGraph
+        The edges of a directed graph are regarded as undirected.
+
+    weight : string or None, optional (default : 'weight')
+        The key for edge weight. If None, all the weights will be 1.
+
+    resolution : float, optional (default : 1)
+        The resolution $\\gamma$ of the modularity.
+
+    threshold : float, optional (default : 1e-7)
+        The least modularity gain of a level to go on with the next one.
+
+    seed : int or None, optional (default : None)
+        The seed of the random numbers.
+
+    parallel : bool, optional (default : False)
+        See `louvain_communities`.
+
+    randomness : float, optional (default : 0.01)
+        The temperature $\\theta$ of the refinement. A node joins a
+        subcommunity with probability proportional to exp(gain / randomness).
+
+    Returns
+    ----------
+    communities : list of frozenset
+        The communities, largest first.
+
+    Examples
+    --------
+    >>> leiden_communities(G, resolution=1, seed=1)
+
+    References
+    ----------
+    .. [1] Traag V A, Waltman L, van Eck N J. From Louvain to Leiden: guaranteeing
+       well-connected communities[J]. Scientific Reports, 2019, 9: 5233.
+
+    """
+    if randomness <= 0:
+        raise ValueError("randomness should be positive, got {}.".format(randomness))
+    return _multilevel_communities(G, weight, resolution, threshold, seed, parallel, refine=True,
+                                   randomness=randomness)
+
+
+def _multilevel_communities(G, weight, resolution, threshold, seed, parallel, refine, randomness=0.01):
+    from easygraph.classes import CSRGraph
+    G_csr = CSRGraph.from_graph(G, weight=weight)
+    n = len(G_csr)
+    if n == 0:
+        return []
+    W = _symmetric_weights(G_csr, weight)
+    rng = np.random.default_rng(seed)
+    # membership[i]: the node of the current level the i-th node belongs to
+    membership = np.arange(n)
+    partition = membership
+    labels = np.arange(n)
+    Q = _label_modularity(W, labels, resolution)
+    while W.sum() > 0:
+        initial = labels
+        if parallel:
+            labels = _move_nodes_parallel(W, labels, resolution, rng)
+        else:
+            labels = _move_nodes(W, labels, resolution, rng)
+        labels = _compact(labels)
+        new_Q = _label_modularity(W, labels, resolution)
+        if new_Q < Q:
+            break
+        partition = labels[membership]
+        if new_Q - Q <= threshold or np.array_equal(labels, _compact(initial)):
+            break
+        Q = new_Q
+        if refine:
+            aggregates = _compact(_refine(W, labels, resolution, randomness, rng))
+            # The next level starts from the communities of the refined aggregates
+            labels_of_aggregates = np.empty(aggregates.max() + 1, dtype=np.int64)
+            labels_of_aggregates[aggregates] = labels
+            labels = labels_of_aggregates
+        else:
+            aggregates = labels
+            labels = np.arange(aggregates.max() + 1)
+        membership = aggregates[membership]
+        W = _aggregate(W, aggregates)
+    return _communities_of_labels(G_csr.node_of_index, partition)
+
+
+def _symmetric_weights(G_csr, weight):
+    """Returns the symmetric weight matrix of G, the self-loops counted twice on the diagonal."""
+    import scipy.sparse as sps
+    from easygraph.utils.convert_to_matrix import to_scipy_sparse
+    A = to_scipy_sparse(G_csr, weight=weight)
+    if G_csr.is_directed():
+        W = A + A.T
+    else:
+        W = A + sps.diags(A.diagonal())
+    return sps.csr_matrix(W)
+
+
+def _aggregate(W, labels):
+    """Returns the weight matrix of the communities *labels*, one node each."""
+    import scipy.sparse as sps
+    c = labels.max() + 1
+    W = W.tocoo()
+    return sps.csr_matrix((W.data, (labels[W.row], labels[W.col])), shape=(c, c))
+
+
+def _compact(labels):
+    """Relabels the communities 0, 1, ..., in order of first appearance."""
+    _, first, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    rank = np.empty(len(first), dtype=np.int64)
+    rank[np.argsort(first)] = np.arange(len(first))
+    return rank[inverse.ravel()]
+
+
+def _communities_of_labels(node_of_index, labels):
+    order = np.argsort(labels, kind='stable')
+    bounds = np.flatnonzero(np.diff(labels[order])) + 1
+    communities = [frozenset(node_of_index[i] for i in block.tolist())
+                   for block in np.split(order, bounds)]
+    return sorted(communities, key=len, reverse=True)
+
+
+def _move_nodes(W, labels, resolution, rng):
+    """The local moving phase, one node at a time.
+
+    Every node is visited in random order, and visited again when one of its
+    neighbors leaves for another community (the fast local moving of [2]_),
+    until no move improves the modularity. Moving v into the community c
+    gains, up to the factor 1/m,
+
+    .. math::
+
+        k_{v,c} - \\gamma \\frac{k_v K_c}{2m}
+
+    for the weight $k_{v,c}$ of the edges between v and c and the sum of
+    degrees $K_c$ of c without v.
+    """
+    n = W.shape[0]
+    indptr, indices, data = W.indptr.tolist(), W.indices.tolist(), W.data.tolist()
+    k = np.asarray(W.sum(axis=1)).ravel()
+    scale = resolution / k.sum()
+    K = np.bincount(labels, weights=k, minlength=n).tolist()
+    size = np.bincount(labels, minlength=n).tolist()
+    k = k.tolist()
+    labels = labels.tolist()
+    empty = [c for c in range(n) if size[c] == 0]
+    queue = deque(rng.permutation(n).tolist())
+    queued = [True] * n
+    while queue:
+        v = queue.popleft()
+        queued[v] = False
+        current = labels[v]
+        links = {}
+        for p in range(indptr[v], indptr[v + 1]):
+            u = indices[p]
+            if u != v:
+                c = labels[u]
+                links[c] = links.get(c, 0) + data[p]
+        k_v = k[v]
+        K[current] -= k_v
+        size[current] -= 1
+        best = current
+        best_gain = links.get(current, 0) - scale * k_v * K[current]
+        for c, k_vc in links.items():
+            gain = k_vc - scale * k_v * K[c]
+            if gain > best_gain:
+                best, best_gain = c, gain
+        if best_gain < 0 and size[current] > 0:
+            # Alone in an empty community
+            best = empty.pop()
+        if size[current] == 0 and best != current:
+            empty.append(current)
+        K[best] += k_v
+        size[best] += 1
+        if best != current:
+            labels[v] = best
+            for p in range(indptr[v], indptr[v + 1]):
+                u = indices[p]
+                if not queued[u] and labels[u] != best:
+                    queued[u] = True
+                    queue.append(u)
+    return np.array(labels, dtype=np.int64)
+
+
+def _move_nodes_parallel(W, labels, resolution, rng):
+    """The local moving phase, all the nodes at once.
+
+    Each round computes the weights of all the nodes to all their neighbor
+    communities as one sparse product, ``W S`` for the membership matrix S,
+    and the best move of each node by segmented reductions over its row. A
+    random half of the nodes with an improving move make it, alternately the
+    moves to smaller and to larger labels, so that no two nodes swap their
+    communities. Simultaneous moves may lower the modularity, so the best
+    partition of the rounds is kept, and the rounds stop when two in a row do
+    not improve it by PARALLEL_MIN_GAIN.
+    """
+    import scipy.sparse as sps
+    n = W.shape[0]
+    W = W.tocsr()
+    k = np.asarray(W.sum(axis=1)).ravel()
+    W_off = (W - sps.diags(W.diagonal())).tocsr()
+    W_off.eliminate_zeros()
+    scale = resolution / k.sum()
+    nodes = np.arange(n)
+    has_neighbors = np.diff(W_off.indptr) > 0
+    movers = nodes[has_neighbors]
+    best_Q, best_labels = _label_modularity(W, labels, resolution), labels
+    upward = False
+    stalled = 0
+    while stalled < 2:
+        upward = not upward
+        K = np.bincount(labels, weights=k, minlength=n)
+        links = (W_off @ sps.csr_matrix((np.ones(n), (nodes, labels)), shape=(n, n))).tocsr()
+        v = np.repeat(nodes, np.diff(links.indptr))
+        c, k_vc = links.indices, links.data
+        own = c == labels[v]
+        gain = k_vc - scale * k[v] * (K[c] - own * k[v])
+        # The gain to stay, 0 to the weight of the edges to the own community
+        stay = -scale * k * (K[labels] - k)
+        stay[v[own]] += k_vc[own]
+        # The best community of each node, on ties the smaller label
+        starts = links.indptr[:-1][has_neighbors]
+        best_gain = np.maximum.reduceat(gain, starts)
+        targets = np.minimum.reduceat(np.where(gain >= np.repeat(best_gain, np.diff(links.indptr)[has_neighbors]),
+                                               c, n), starts)
+        improving = best_gain > stay[movers] + 1e-12 * np.abs(stay[movers])
+        if improving.sum() < max(1, PARALLEL_MIN_MOVES * n):
+            break
+        chosen = improving & ((targets > labels[movers]) == upward) & (rng.random(len(movers)) < 0.5)
+        labels = labels.copy()
+        labels[movers[chosen]] = targets[chosen]
+        Q = _label_modularity(W, labels, resolution)
+        stalled = stalled + 1 if Q < best_Q + PARALLEL_MIN_GAIN else 0
+        if Q > best_Q:
+            best_Q, best_labels = Q, labels
+    return best_labels
+
+
+def _refine(W, labels, resolution, randomness, rng):
+    """The refinement phase of Leiden, Algorithm A.2 of [2]_.
+
+    Each community is split into subcommunities, from singletons. In random
+    order, a singleton node well connected to its community joins a well
+    connected subcommunity of it, at random with probability proportional to
+    exp(gain / randomness) among the moves of non-negative gain.
+    """
+    n = W.shape[0]
+    indptr, indices, data = W.indptr.tolist(), W.indices.tolist(), W.data.tolist()
+    k = np.asarray(W.sum(axis=1)).ravel()
+    scale = resolution / k.sum()
+    K_community = np.bincount(labels, weights=k).tolist()
+    k = k.tolist()
+    labels = labels.tolist()
+    refined = list(range(n))
+    # For each subcommunity: the sum of degrees, the weight of the edges to the rest of its community, the size
+    K = list(k)
+    external = [0.0] * n
+    for v in range(n):
+        for p in range(indptr[v], indptr[v + 1]):
+            u = indices[p]
+            if u != v and labels[u] == labels[v]:
+                external[v] += data[p]
+    size = [1] * n
+    for v in rng.permutation(n).tolist():
+        r_v = refined[v]
+        K_C = K_community[labels[v]]
+        if size[r_v] > 1 or external[r_v] < scale * k[v] * (K_C - k[v]):
+            continue
+        links = {}
+        for p in range(indptr[v], indptr[v + 1]):
+            u = indices[p]
+            if u != v and labels[u] == labels[v]:
+                r = refined[u]
+                links[r] = links.get(r, 0) + data[p]
+        candidates, gains = [], []
+        for r, k_vr in links.items():
+            if external[r] >= scale * K[r] * (K_C - K[r]):
+                gain = k_vr - scale * k[v] * K[r]
+                if gain >= 0:
+                    candidates.append(r)
+                    gains.append(gain)
+        if not candidates:
+            continue
+        gains = np.array(gains)
+        probabilities = np.exp((gains - gains.max()) / randomness)
+        r = candidates[rng.choice(len(candidates), p=probabilities / probabilities.sum())]
+        refined[v] = r
+        external[r] += external[r_v] - 2 * links[r]
+        K[r] += k[v]
+        size[r] += 1
+        size[r_v] = 0
+    return np.array(refined, dtype=np.int64)
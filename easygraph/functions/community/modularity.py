@@ -1,9 +1,13 @@
-from itertools import product
+import numpy as np
 
 __all__ = [
-    "modularity"
+    "modularity",
+    "modularity_many",
 ]
 
+# The edges per chunk times the partitions scored at once, bounds the label comparisons in memory
+EDGE_CHUNK = 1 << 22
+
 def modularity(G, communities, weight='weight'):
     """
     Returns the modularity of the given partition of the graph.
@@ -18,12 +22,17 @@ def modularity(G, communities, weight='weight'):
     `G`, $k_i$ is the degree of $i$ and $\delta(c_i, c_j)$
     is 1 if $i$ and $j$ are in the same community and 0 otherwise.
 
+    It is computed in O(m) as the sum over the communities of the weight of
+    their inner edges minus the product of their sums of degrees, see
+    **modularity_many**.
+
     Parameters
     ----------
     G : easygraph.Graph or easygraph.DiGraph
 
     communities : list or iterable of set of nodes
         These node sets must represent a partition of G's nodes.
+        The nodes in no set count in no community.
 
     weight : string, optinal (default : 'weight')
         The key for edge weight.
@@ -39,31 +48,121 @@ def modularity(G, communities, weight='weight'):
        Oxford University Press, 2011.
 
     """
-    # TODO: multigraph not included.
+    return modularity_many(G, [communities], weight=weight)[0]
+
+
+def modularity_many(G, partitions, weight='weight'):
+    """
+    Returns the modularity of each of the given partitions of the graph.
+
+    Each partition is an array of the community label of every node. Then
+
+    .. math::
+
+        Q = \sum_c \left( \frac{e_c}{2m} - \frac{K_c^{in} K_c^{out}}{(2m)^2} \right)
+
+    with $e_c$ the weight of the edges inside $c$, counted from both ends
+    in undirected graphs, and $K_c$ its sum of degrees ($m$ instead of
+    $2m$ in directed graphs). The labels of all the partitions are compared
+    at both ends of a chunk of edges at once, so the edges are read once
+    however many partitions are scored.
+
+    Parameters
+    ----------
+    G : easygraph.Graph or easygraph.DiGraph
+
+    partitions : list of list or iterable of set of nodes
+        The partitions, each one as the communities of **modularity**, or
+        a dict whose values are the communities as returned by **LPA**.
+
+    weight : string, optinal (default : 'weight')
+        The key for edge weight.
+
+    Returns
+    ----------
+    Q : list of float
+        The modularity of each partition.
+
+    Examples
+    --------
+    Pick the best of several runs of a randomized algorithm
 
-    if not isinstance(communities, list):
-        communities = list(communities)
+    >>> partitions = [LPA(G, seed=seed) for seed in range(20)]
+    >>> scores = modularity_many(G, partitions)
 
-    directed = G.is_directed()
-    m = G.size(weight=weight)
-    if directed:
-        out_degree = dict(G.out_degree(weight=weight))
-        in_degree = dict(G.in_degree(weight=weight))
-        norm = 1 / m
+    """
+    from easygraph.classes import CSRGraph
+    G_csr = CSRGraph.from_graph(G, weight=weight)
+    n = len(G_csr)
+    labels = np.stack([_partition_labels(G_csr.index_of_node, communities, n) for communities in partitions]) \
+        if len(partitions) > 0 else np.empty((0, n), dtype=np.int64)
+    tails = np.asarray(G_csr.tails(), dtype=np.int64)
+    heads = np.asarray(G_csr.indices, dtype=np.int64)
+    if G_csr.weights is None:
+        w = np.ones(len(heads))
     else:
-        out_degree = dict(G.degree(weight=weight))
-        in_degree = out_degree
-        norm = 1 / (2 * m)
-
-    def val(u, v):
-        try:
-            w = G[u][v].get(weight, 1)
-        except KeyError:
-            w = 0
+        w = np.asarray(G_csr.weights, dtype=float)
+    if not G.is_directed():
         # Double count self-loops if the graph is undirected.
-        if u == v and not directed:
-            w *= 2
-        return w - in_degree[u] * out_degree[v] * norm
+        w = np.where(tails == heads, 2 * w, w)
+    total = w.sum()
+    if total == 0:
+        return [0.0] * len(labels)
+
+    # The weight of the edges inside the communities of each partition
+    internal = np.zeros(len(labels))
+    step = max(1, EDGE_CHUNK // max(len(labels), 1))
+    for start in range(0, len(tails), step):
+        tail_labels = labels[:, tails[start:start + step]]
+        inside = (tail_labels == labels[:, heads[start:start + step]]) & (tail_labels >= 0)
+        internal += inside @ w[start:start + step]
+
+    # The sums of degrees of the communities of all the partitions, one bincount over (partition, label)
+    P = len(labels)
+    n_labels = labels.max() + 1 if labels.size else 0
+    covered = labels >= 0
+    keys = (np.arange(P)[:, None] * n_labels + labels)[covered]
+    out_degree = np.bincount(tails, weights=w, minlength=n)
+    in_degree = np.bincount(heads, weights=w, minlength=n)
+    K_out = np.bincount(keys, weights=np.broadcast_to(out_degree, labels.shape)[covered], minlength=P * n_labels)
+    K_in = np.bincount(keys, weights=np.broadcast_to(in_degree, labels.shape)[covered], minlength=P * n_labels)
+    expected = (K_out * K_in).reshape(P, n_labels).sum(axis=1)
+    return (internal / total - expected / total ** 2).tolist()
+
 
-    Q = sum(val(u, v) for c in communities for u, v in product(c, repeat=2))
-    return Q * norm
+def _partition_labels(index_of_node, communities, n):
+    """Returns the community label of each node index, -1 for the nodes in no community."""
+    if isinstance(communities, dict):
+        communities = communities.values()
+    communities = [list(community) for community in communities]
+    labels = np.full(n, -1, dtype=np.int64)
+    members = np.fromiter((index_of_node[node] for community in communities for node in community),
+                          dtype=np.int64)
+    if len(np.unique(members)) != len(members):
+        raise ValueError("The communities should be disjoint.")
+    labels[members] = np.repeat(np.arange(len(communities)), [len(community) for community in communities])
+    return labels
+
+
+def _label_modularity(W, labels, resolution=1):
+    """Returns the modularity of the partition of the nodes of W into communities *labels*.
+
+    W is the symmetric sparse matrix of the edge weights, with the self-loops
+    counted twice on the diagonal, so that its row sums are the degrees. Then
+
+    .. math::
+
+        Q = \\sum_c \\left( \\frac{e_c}{2m} - \\gamma \\left( \\frac{K_c}{2m} \\right)^2 \\right)
+
+    with $e_c$ the weight of the edges inside $c$, counted from both ends,
+    and $K_c$ its sum of degrees, in O(m).
+    """
+    W = W.tocsr()
+    two_m = W.sum()
+    if two_m == 0:
+        return 0.0
+    labels = np.asarray(labels)
+    rows = np.repeat(labels, np.diff(W.indptr))
+    internal = W.data[rows == labels[W.indices]].sum()
+    K = np.bincount(labels, weights=np.asarray(W.sum(axis=1)).ravel())
+    return float(internal / two_m - resolution * np.dot(K, K) / two_m ** 2)
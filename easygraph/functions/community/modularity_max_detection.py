@@ -1,13 +1,15 @@
-import easygraph as eg
-from easygraph.functions.community.modularity import modularity
-from easygraph.utils.mapped_queue import MappedQueue
+import numpy as np
+
+from easygraph.utils.mapped_queue import IndexedHeap
 
 __all__ = [
-    "greedy_modularity_communities"
+    "greedy_modularity_communities",
+    "greedy_modularity_dendrogram",
+    "cut_dendrogram",
 ]
 
 
-def greedy_modularity_communities(G, weight='weight'):
+def greedy_modularity_communities(G, weight='weight', resolution=1):
     """Communities detection via greedy modularity method.
 
     Find communities in graph using Clauset-Newman-Moore greedy modularity
@@ -20,14 +22,23 @@ def greedy_modularity_communities(G, weight='weight'):
     Parameters
     ----------
     G : easygraph.Graph or easygraph.DiGraph
-    
+        The edges of a directed graph are regarded as undirected.
+
     weight : string (default : 'weight')
-        The key for edge weight. For undirected graph, it will regard each edge 
-        weight as 1. 
+        The key for edge weight. If None, all the weights will be 1.
+
+    resolution : float, optional (default : 1)
+        The resolution $\\gamma$ of the modularity. Below 1 favors larger
+        communities, above 1 smaller ones.
 
     Returns
     ----------
-    Yields sets of nodes, one for each community.
+    communities : list of frozenset
+        The communities, largest first.
+
+    See Also
+    --------
+    greedy_modularity_dendrogram : all the merges, to cut at any level.
 
     References
     ----------
@@ -37,172 +48,188 @@ def greedy_modularity_communities(G, weight='weight'):
        "Finding community structure in very large networks."
        Physical Review E 70(6), 2004.
     """
+    nodes, W = _cnm_weights(G, weight)
+    labels = np.arange(len(nodes))
+    for i, j, dq in _cnm_merges(W, resolution):
+        # Stop when change is non-positive
+        if dq <= 0:
+            break
+        labels[i] = j
+    return _communities_of_parents(nodes, labels)
 
-    # Count nodes and edges
 
-    N = len(G.nodes)
-    m = sum([d.get(weight, 1) for u, v, d in G.edges])
-    if N == 0 or m == 0:
-        print("Please input the graph which has at least one edge!")
-        exit()
-    q0 = 1.0 / (2.0*m)
+def greedy_modularity_dendrogram(G, weight='weight', resolution=1):
+    """Returns the merges of Clauset-Newman-Moore greedy modularity maximization.
 
-    # Map node labels to contiguous integers
-    label_for_node = dict((i, v) for i, v in enumerate(G.nodes))
-    node_for_label = dict((label_for_node[i], i) for i in range(N))
-    
+    Unlike **greedy_modularity_communities**, the merges go on after the
+    modularity stops increasing, until no two communities are connected, so
+    that the dendrogram can be cut at any level by **cut_dendrogram**.
 
-    # Calculate degrees
-    k_for_label = G.degree(weight=weight)
-    k = [k_for_label[label_for_node[i]] for i in range(N)]
+    Parameters
+    ----------
+    G : easygraph.Graph or easygraph.DiGraph
+        The edges of a directed graph are regarded as undirected.
 
-    # Initialize community and merge lists
-    communities = dict((i, frozenset([i])) for i in range(N))
-    merges = []
+    weight : string (default : 'weight')
+        The key for edge weight. If None, all the weights will be 1.
 
-    # Initial modularity
-    partition = [[label_for_node[x] for x in c] for c in communities.values()]
-    q_cnm = modularity(G, partition)
+    resolution : float, optional (default : 1)
+        The resolution $\\gamma$ of the modularity.
 
-    # Initialize data structures
-    # CNM Eq 8-9 (Eq 8 was missing a factor of 2 (from A_ij + A_ji)
-    # a[i]: fraction of edges within community i
-    # dq_dict[i][j]: dQ for merging community i, j
-    # dq_heap[i][n] : (-dq, i, j) for communitiy i nth largest dQ
-    # H[n]: (-dq, i, j) for community with nth largest max_j(dQ_ij)
-    a = [k[i]*q0 for i in range(N)]
-    dq_dict = dict(
-        (i, dict(
-            (j, 2*q0 - 2*k[i]*k[j]*q0*q0)
-            for j in [
-                node_for_label[u]
-                for u in G.neighbors(label_for_node[i])]
-            if j != i))
-        for i in range(N))
-    dq_heap = [
-        MappedQueue([
-            (-dq, i, j)
-            for j, dq in dq_dict[i].items()])
-        for i in range(N)]
-    H = MappedQueue([
-        dq_heap[i].h[0]
-        for i in range(N)
-        if len(dq_heap[i]) > 0])
-
-    # Merge communities until we can't improve modularity
-    while len(H) > 1:
-        # Find best merge
-        # Remove from heap of row maxes
-        # Ties will be broken by choosing the pair with lowest min community id
-        try:
-            dq, i, j = H.pop()
-        except IndexError:
-            break
-        dq = -dq
-        # Remove best merge from row i heap
-        dq_heap[i].pop()
-        # Push new row max onto H
-        if len(dq_heap[i]) > 0:
-            H.push(dq_heap[i].h[0])
-        # If this element was also at the root of row j, we need to remove the
-        # duplicate entry from H
-        if dq_heap[j].h[0] == (-dq, j, i):
-            H.remove((-dq, j, i))
-            # Remove best merge from row j heap
-            dq_heap[j].remove((-dq, j, i))
-            # Push new row max onto H
-            if len(dq_heap[j]) > 0:
-                H.push(dq_heap[j].h[0])
-        else:
-            # Duplicate wasn't in H, just remove from row j heap
-            dq_heap[j].remove((-dq, j, i))
-        # Stop when change is non-positive
-        if dq <= 0:
-            break
+    Returns
+    ----------
+    dendrogram : list of tuple
+        The merges ``(u, v, dq)`` in order: the community of node u joins the
+        community of node v, and the modularity changes by dq.
+
+    Examples
+    --------
+    >>> dendrogram = greedy_modularity_dendrogram(G)
+    >>> cut_dendrogram(G, dendrogram, n_communities=10)
 
-        # Perform merge
-        communities[j] = frozenset(communities[i] | communities[j])
-        del communities[i]
-        merges.append((i, j, dq))
-        # New modularity
-        q_cnm += dq
-        # Get list of communities connected to merged communities
-        i_set = set(dq_dict[i].keys())
-        j_set = set(dq_dict[j].keys())
-        all_set = (i_set | j_set) - set([i, j])
-        both_set = i_set & j_set
-        # Merge i into j and update dQ
-        for k in all_set:
-            # Calculate new dq value
-            if k in both_set:
-                dq_jk = dq_dict[j][k] + dq_dict[i][k]
-            elif k in j_set:
-                dq_jk = dq_dict[j][k] - 2.0*a[i]*a[k]
-            else:
-                # k in i_set
-                dq_jk = dq_dict[i][k] - 2.0*a[j]*a[k]
-            # Update rows j and k
-            for row, col in [(j, k), (k, j)]:
-                # Save old value for finding heap index
-                if k in j_set:
-                    d_old = (-dq_dict[row][col], row, col)
-                else:
-                    d_old = None
-                # Update dict for j,k only (i is removed below)
-                dq_dict[row][col] = dq_jk
-                # Save old max of per-row heap
-                if len(dq_heap[row]) > 0:
-                    d_oldmax = dq_heap[row].h[0]
-                else:
-                    d_oldmax = None
-                # Add/update heaps
-                d = (-dq_jk, row, col)
-                if d_old is None:
-                    # We're creating a new nonzero element, add to heap
-                    dq_heap[row].push(d)
-                else:
-                    # Update existing element in per-row heap
-                    dq_heap[row].update(d_old, d)
-                # Update heap of row maxes if necessary
-                if d_oldmax is None:
-                    # No entries previously in this row, push new max
-                    H.push(d)
-                else:
-                    # We've updated an entry in this row, has the max changed?
-                    if dq_heap[row].h[0] != d_oldmax:
-                        H.update(d_oldmax, dq_heap[row].h[0])
-
-        # Remove row/col i from matrix
-        i_neighbors = dq_dict[i].keys()
-        for k in i_neighbors:
-            # Remove from dict
-            dq_old = dq_dict[k][i]
-            del dq_dict[k][i]
-            # Remove from heaps if we haven't already
-            if k != j:
-                # Remove both row and column
-                for row, col in [(k, i), (i, k)]:
-                    # Check if replaced dq is row max
-                    d_old = (-dq_old, row, col)
-                    if dq_heap[row].h[0] == d_old:
-                        # Update per-row heap and heap of row maxes
-                        dq_heap[row].remove(d_old)
-                        H.remove(d_old)
-                        # Update row max
-                        if len(dq_heap[row]) > 0:
-                            H.push(dq_heap[row].h[0])
-                    else:
-                        # Only update per-row heap
-                        dq_heap[row].remove(d_old)
-
-        del dq_dict[i]
-        # Mark row i as deleted, but keep placeholder
-        dq_heap[i] = MappedQueue()
-        # Merge i into j and update a
+    """
+    nodes, W = _cnm_weights(G, weight)
+    return [(nodes[i], nodes[j], dq) for i, j, dq in _cnm_merges(W, resolution)]
+
+
+def cut_dendrogram(G, dendrogram, n_communities=None):
+    """Returns the communities of a level of a dendrogram of **greedy_modularity_dendrogram**.
+
+    Parameters
+    ----------
+    G : easygraph.Graph or easygraph.DiGraph
+        The graph of the dendrogram.
+
+    dendrogram : list of tuple
+        The merges ``(u, v, dq)``.
+
+    n_communities : int or None, optional (default : None)
+        The number of communities of the level, or the fewest the dendrogram
+        reaches. If None, the level of largest modularity.
+
+    Returns
+    ----------
+    communities : list of frozenset
+        The communities, largest first.
+
+    """
+    nodes = list(G.nodes)
+    if n_communities is None:
+        gains = np.cumsum([dq for _, _, dq in dendrogram])
+        n_merges = int(np.argmax(np.r_[0, gains]))
+    else:
+        n_merges = min(max(len(nodes) - n_communities, 0), len(dendrogram))
+    index_of_node = {node: i for i, node in enumerate(nodes)}
+    labels = np.arange(len(nodes))
+    for u, v, _ in dendrogram[:n_merges]:
+        labels[index_of_node[u]] = index_of_node[v]
+    return _communities_of_parents(nodes, labels)
+
+
+def _cnm_weights(G, weight):
+    """Returns the nodes of G and its symmetric weight matrix, the self-loops counted twice on the diagonal."""
+    from easygraph.classes import CSRGraph
+    from easygraph.functions.community.louvain import _symmetric_weights
+    G_csr = CSRGraph.from_graph(G, weight=weight)
+    W = _symmetric_weights(G_csr, weight)
+    if len(G_csr) == 0 or W.sum() == 0:
+        raise ValueError("Please input the graph which has at least one edge!")
+    return G_csr.node_of_index, W
+
+
+def _cnm_merges(W, resolution):
+    """Yields the merges ``(i, j, dq)`` of CNM on the weight matrix W, community i into community j.
+
+    Community i keeps its neighbor communities as a sorted array nbrs[i] and
+    the dQ of merging with them in dqs[i]. Merging i into j merges both sorted
+    rows at once, and updates the two entries of each neighbor row. The heap
+    H holds each row by its largest dQ, ties broken by the lowest (i, j).
+    """
+    n = W.shape[0]
+    q0 = 1.0 / W.sum()
+    # CNM Eq 8-9 (Eq 8 was missing a factor of 2 (from A_ij + A_ji)
+    # a[i]: fraction of edge ends within community i
+    a = np.asarray(W.sum(axis=1)).ravel() * q0
+    W = W.tocsr()
+    W.setdiag(0)
+    W.eliminate_zeros()
+    W.sort_indices()
+    nbrs = [W.indices[W.indptr[i]:W.indptr[i + 1]].astype(np.int64) for i in range(n)]
+    dqs = [2 * q0 * W.data[W.indptr[i]:W.indptr[i + 1]] - 2 * resolution * a[i] * a[nbrs[i]]
+           for i in range(n)]
+    H = IndexedHeap(n)
+    best = [-1] * n
+
+    def update_row(row):
+        # Push the new row max onto H
+        if len(nbrs[row]) == 0:
+            if row in H:
+                H.remove(row)
+            return
+        k = int(dqs[row].argmax())
+        best[row] = int(nbrs[row][k])
+        H.push(row, -float(dqs[row][k]))
+
+    for i in range(n):
+        update_row(i)
+
+    # Merge communities until no two of them are connected
+    while len(H) > 0:
+        i, dq = H.pop()
+        j, dq = best[i], -dq
+        yield i, j, dq
+
+        # Merge i into j: the union of the rows, with the dQ of CNM Eq 10
+        ni, nj = nbrs[i], nbrs[j]
+        keys, inverse = np.unique(np.concatenate([ni, nj]), return_inverse=True)
+        inverse = inverse.ravel()
+        in_i = np.zeros(len(keys), dtype=bool)
+        in_j = np.zeros(len(keys), dtype=bool)
+        in_i[inverse[:len(ni)]] = True
+        in_j[inverse[len(ni):]] = True
+        dq_i = -2.0 * resolution * a[i] * a[keys]
+        dq_j = -2.0 * resolution * a[j] * a[keys]
+        dq_i[inverse[:len(ni)]] = dqs[i]
+        dq_j[inverse[len(ni):]] = dqs[j]
+        others = (keys != i) & (keys != j)
+        keys, in_i, in_j = keys[others], in_i[others], in_j[others]
+        dq_jk = (dq_i + dq_j)[others]
+        nbrs[j], dqs[j] = keys, dq_jk
+        nbrs[i], dqs[i] = np.empty(0, dtype=np.int64), np.empty(0)
         a[j] += a[i]
         a[i] = 0
-
-    communities = [
-        frozenset([label_for_node[i] for i in c])
-        for c in communities.values()]
+        update_row(j)
+
+        # Replace i and j by j in the rows of the neighbors
+        for k, ki, kj, value in zip(keys.tolist(), in_i.tolist(), in_j.tolist(), dq_jk.tolist()):
+            row, row_dq = nbrs[k], dqs[k]
+            if kj:
+                row_dq[row.searchsorted(j)] = value
+            if ki:
+                pos = row.searchsorted(i)
+                row, row_dq = np.delete(row, pos), np.delete(row_dq, pos)
+            if not kj:
+                pos = row.searchsorted(j)
+                row, row_dq = np.insert(row, pos, j), np.insert(row_dq, pos, value)
+            nbrs[k], dqs[k] = row, row_dq
+            # The row max only needs a new scan if it was the entry of i or j
+            if best[k] == i or best[k] == j:
+                update_row(k)
+            elif -value < H.priority[k] or (-value == H.priority[k] and j < best[k]):
+                best[k] = j
+                H.update(k, -value)
+
+
+def _communities_of_parents(nodes, labels):
+    """Returns the communities, largest first, of the merges ``labels[i] = j`` of community i into j."""
+    # Follow the merges up to the community each node ends in
+    while True:
+        parents = labels[labels]
+        if np.array_equal(parents, labels):
+            break
+        labels = parents
+    order = np.argsort(labels, kind='stable')
+    bounds = np.flatnonzero(np.diff(labels[order])) + 1
+    communities = [frozenset(nodes[i] for i in block.tolist())
+                   for block in np.split(order, bounds) if len(block)]
     return sorted(communities, key=len, reverse=True)
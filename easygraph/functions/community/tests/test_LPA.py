@@ -0,0 +1,31 @@
+import sys
+
+import easygraph as eg
+from easygraph.datasets import get_graph_karateclub
+
+
+def _assert_covers_graph(G, communities):
+    members = set()
+    for community in communities.values():
+        assert community
+        assert set(community) <= set(G.nodes)
+        members |= set(community)
+    assert members == set(G.nodes)
+
+
+def test_SLPA_same_seed_same_result():
+    G = get_graph_karateclub()
+    for seed in range(3):
+        communities = eg.SLPA(G, 20, 0.05, seed=seed)
+        _assert_covers_graph(G, communities)
+        assert eg.SLPA(G, 20, 0.05, seed=seed) == communities
+
+
+def test_SLPA_seed_does_not_depend_on_workers(monkeypatch):
+    # Split every color class between the workers, however small
+    # The module, not the LPA function it is shadowed by in the package
+    monkeypatch.setattr(sys.modules["easygraph.functions.community.LPA"], "SLPA_PARALLEL_ENTRIES", 0)
+    G = get_graph_karateclub()
+    serial = eg.SLPA(G, 5, 0.05, seed=5)
+    assert eg.SLPA(G, 5, 0.05, seed=5, n_workers=3, backend='thread') == serial
+    assert eg.SLPA(G, 5, 0.05, seed=5, n_workers=2, backend='process') == serial
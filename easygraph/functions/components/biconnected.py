@@ -188,6 +188,56 @@ def _biconnected_dfs_record_edges(G, need_components=True):
                 yield start
 
 
+def _articulation_point_splits(G):
+    """Yields each articulation point, the size of its connected component, and
+    the sizes of the parts its removal splits that component into.
+
+    One iterative depth-first search, which also counts the nodes of each DFS
+    subtree: the subtree of a child cut off from a node is one part, and the
+    rest of the component is another.
+    """
+    visited = set()
+    for start in G:
+        if start in visited:
+            continue
+        discovery = {start: 0}
+        low = {start: 0}
+        size = {start: 1}
+        # The sizes of the child subtrees cut off from each node
+        cut_off = {}
+        visited.add(start)
+        stack = [(start, start, iter(G[start]))]
+        while stack:
+            grandparent, parent, children = stack[-1]
+            try:
+                child = next(children)
+                if grandparent == child:
+                    continue
+                if child in visited:
+                    if discovery[child] <= discovery[parent]:  # back edge
+                        low[parent] = min(low[parent], discovery[child])
+                else:
+                    low[child] = discovery[child] = len(discovery)
+                    size[child] = 1
+                    visited.add(child)
+                    stack.append((parent, child, iter(G[child])))
+            except StopIteration:
+                stack.pop()
+                if stack:
+                    size[grandparent] += size[parent]
+                    # Every subtree of the root is cut off from the others
+                    if len(stack) == 1 or low[parent] >= discovery[grandparent]:
+                        cut_off.setdefault(grandparent, []).append(size[parent])
+                    low[grandparent] = min(low[parent], low[grandparent])
+        n_component = size[start]
+        for node, parts in cut_off.items():
+            rest = n_component - 1 - sum(parts)
+            if rest > 0:
+                parts.append(rest)
+            if len(parts) > 1:
+                yield node, n_component, parts
+
+
 def _biconnected_dfs_record_nodes(G, need_components=True):
     # record nodes of each biconnected component in traversal
     # Not used.
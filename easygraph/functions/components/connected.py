@@ -1,4 +1,7 @@
 import easygraph
+import numpy as np
+from easygraph.classes import CSRGraph
+from easygraph.functions.path.bfs import _bfs_frontiers, _bfs_levels
 from easygraph.utils.decorators import only_implemented_for_UnDirected_graph
 from threading import Thread
 
@@ -30,6 +33,10 @@ def is_connected(G):
 
     """
     assert len(G) != 0, "No node in the graph."
+    if isinstance(G, CSRGraph):
+        in_indptr, in_indices, _ = G.in_csr()
+        level = _bfs_levels(G.indptr, G.indices, 0, in_indptr=in_indptr, in_indices=in_indices)
+        return bool((level >= 0).all())
     arbitrary_node = next(iter(G))  # Pick an arbitrary node to run BFS
     return len(G) == sum(1 for node in _plain_bfs(G, arbitrary_node))
 
@@ -51,6 +58,8 @@ def number_connected_components(G):
     >>> number_connected_components(G)
 
     """
+    if isinstance(G, CSRGraph):
+        return _csr_connected_component_labels(G)[0]
     return sum(1 for component in _generator_connected_components(G))
 
 
@@ -73,7 +82,10 @@ def connected_components(G):
 
     """
     # Return all components ordered by number of nodes included
-    all_components = sorted(list(_generator_connected_components(G)), key=len)
+    if isinstance(G, CSRGraph):
+        all_components = sorted(_csr_connected_components(G), key=len)
+    else:
+        all_components = sorted(list(_generator_connected_components(G)), key=len)
     return all_components
 
 
@@ -86,6 +98,21 @@ def _generator_connected_components(G):
             yield component
             seen.update(component)
 
+def _csr_connected_component_labels(G):
+    from scipy.sparse.csgraph import connected_components as csgraph_components
+    return csgraph_components(G._as_csgraph(), directed=False)
+
+
+def _csr_connected_components(G):
+    if len(G) == 0:
+        return []
+    number_of_components, labels = _csr_connected_component_labels(G)
+    order = np.argsort(labels, kind='stable')
+    bounds = np.cumsum(np.bincount(labels, minlength=number_of_components))[:-1]
+    nodes = G.node_of_index
+    return [set(nodes[i] for i in component) for component in np.split(order, bounds)]
+
+
 @only_implemented_for_UnDirected_graph
 def connected_component_of_node(G, node):
     """Returns the connected component that *node* belongs to.
@@ -116,6 +143,9 @@ def _plain_bfs(G, source):
     """
     A fast BFS node generator
     """
+    if isinstance(G, CSRGraph):
+        yield from _csr_plain_bfs(G, source)
+        return
     G_adj = G.adj
     seen = set()
     nextlevel = {source}
@@ -127,3 +157,13 @@ def _plain_bfs(G, source):
                 yield v
                 seen.add(v)
                 nextlevel.update(G_adj[v])
+
+
+def _csr_plain_bfs(G, source):
+    nodes = G.node_of_index
+    in_indptr, in_indices, _ = G.in_csr()
+    level = np.full(len(G), -1, dtype=np.int64)
+    for depth, frontier in _bfs_frontiers(G.indptr, G.indices, G.index_of_node[source], level,
+                                          in_indptr=in_indptr, in_indices=in_indices):
+        for i in frontier.tolist():
+            yield nodes[i]
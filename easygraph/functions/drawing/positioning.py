@@ -245,16 +245,17 @@ def kamada_kawai_layout(
         return {}
 
     if dist is None:
-        dist = dict(eg.Floyd(G))
-    dist_mtx = 1e6 * np.ones((nNodes, nNodes))
-    for row, nr in enumerate(G):
-        if nr not in dist:
-            continue
-        rdist = dist[nr]
-        for col, nc in enumerate(G):
-            if nc not in rdist:
+        dist_mtx = eg.shortest_path_length_matrix(G, dtype=np.float64)
+    else:
+        dist_mtx = 1e6 * np.ones((nNodes, nNodes))
+        for row, nr in enumerate(G):
+            if nr not in dist:
                 continue
-            dist_mtx[row][col] = rdist[nc]
+            rdist = dist[nr]
+            for col, nc in enumerate(G):
+                if nc not in rdist:
+                    continue
+                dist_mtx[row][col] = rdist[nc]
 
     if pos is None:
         if dim >= 3:
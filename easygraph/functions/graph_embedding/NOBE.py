@@ -1,7 +1,9 @@
 import numpy as np
 import easygraph as eg
 import scipy as sp
+import scipy.sparse
 from scipy.sparse.linalg import eigs
+from easygraph.functions.path.bfs import _gather_rows
 
 __all__ = [
     "NOBE",
@@ -112,57 +114,38 @@ def graph_to_d_atleast2(G):
     return G
 
 def Transition(LG):
-    N=len(LG)
-    M=LG.size()
     LLG=eg.DiGraph()
     for i in LG.edges:
         (u,v,t)=i
         LLG.add_edge(u,v)
         LLG.add_edge(v,u)
     degree=LLG.degree()
-    P=np.zeros([2*M,2*M])
-    pair=np.zeros([2*M,2])
-    k=0
-    l=0
-    for i in LLG.edges:
-        l=0
-        for j in LLG.edges:
-            (u,v,t)=i
-            (x,y,z)=j
-            if v==x and u!=y:
-                P[k][l]=1/(degree[v]-1)
-            l+=1
-        k+=1
-    a=0
-    for i in LLG.edges:
-        (u,v,t)=i
-        pair[a]=[u,v]
-        a+=1
+    # The directed edges are the entries of the CSR arrays, in the order of LLG.edges
+    LLG_csr = LLG.freeze(weight=None)
+    indptr, indices = LLG_csr.indptr, LLG_csr.indices
+    tails = LLG_csr.tails()
+    pair = np.stack([np.asarray(LLG_csr.node_of_index)[tails],
+                     np.asarray(LLG_csr.node_of_index)[indices]], axis=1).astype(float)
+    # Edge k=(u,v) leads to the edges l=(v,y) with y!=u
+    _, cols = _gather_rows(indptr, indices)
+    rows = np.repeat(np.arange(len(indices)), np.diff(indptr)[indices])
+    non_backtracking = indices[cols] != tails[rows]
+    rows, cols = rows[non_backtracking], cols[non_backtracking]
+    head_degree = np.fromiter((degree[node] for node in LLG_csr.node_of_index), dtype=float,
+                              count=len(LLG_csr))[indices]
+    P = sp.sparse.csr_matrix((1 / (head_degree[rows] - 1), (rows, cols)),
+                             shape=(len(indices), len(indices)))
     return P,pair
 
 def eigs_nodes(P,K,N):
-    M=np.size(P,0)
-    L=np.zeros([M,M])
-    I=np.identity(M)
-    P_T=P.T
-    L=I-(P+P_T)/2
+    M=P.shape[0]
+    I=sp.sparse.identity(M, format='csr')
+    L=I-(P+P.T)/2
     U,D = eigs(L,K+1,which='LR')
-    D=D[:,:-1]
-    V=np.zeros([M,K],dtype = complex)
-    a=0
-    for i in D:
-        V[a]=i
-        a+=1
+    V=D[:,:-1]
     return V
 
 def embedding(V,pair,K,N):
     Y=np.zeros([N,K],dtype = complex)
-    idx=0
-    for i in pair:
-        [v,u]=i
-        u=int(u)
-        for j in range(0, len(V[idx])):
-            Y[u,j]+=V[idx,j] 
-        idx+=1
+    np.add.at(Y, pair[:, 1].astype(int), V)
     return Y
- 
\ No newline at end of file
@@ -1,5 +1,7 @@
 import easygraph as eg
 from easygraph.utils.alias import create_alias_table, alias_sample
+from easygraph.utils.convert_to_matrix import to_scipy_sparse
+from easygraph.utils.index_of_node import get_relation_of_index_and_node
 
 import time
 
@@ -7,17 +9,6 @@ import numpy as np
 import scipy.sparse as sp
 
 
-def get_relation_of_index_and_node(graph):
-    node2idx = {}
-    idx2node = []
-    node_size = 0
-    for node in graph.nodes:
-        node2idx[node] = node_size
-        idx2node.append(node)
-        node_size += 1
-    return idx2node, node2idx
-
-
 def l_2nd(beta):
     from tensorflow.python.keras import backend as K
 
@@ -209,23 +200,11 @@ class SDNE(object):
         return self._embeddings
 
     def _create_A_L(self, graph, node2idx):
-        node_size = graph.number_of_nodes()
-        A_data = []
-        A_row_index = []
-        A_col_index = []
-
-        for edge in graph.edges:
-            v1, v2 = edge[0], edge[1]
-            edge_weight = graph[v1][v2].get('weight', 1)
-
-            A_data.append(edge_weight)
-            A_row_index.append(node2idx[v1])
-            A_col_index.append(node2idx[v2])
-
-        A = sp.csr_matrix((A_data, (A_row_index, A_col_index)),
-                          shape=(node_size, node_size))
-        A_ = sp.csr_matrix((A_data + A_data, (A_row_index + A_col_index, A_col_index + A_row_index)),
-                           shape=(node_size, node_size))
+        A = to_scipy_sparse(graph, weight='weight', nodelist=self.idx2node)
+        if not graph.is_directed():
+            # Each edge once, as listed in graph.edges from the node met first
+            A = sp.triu(A, format='csr')
+        A_ = A + A.T
 
         D = sp.diags(A_.sum(axis=1).flatten().tolist()[0])
         L = D - A_
@@ -1,10 +1,25 @@
-def  laplacian(G):
+import numpy as np
+
+__all__ = [
+    "laplacian",
+]
+
+def laplacian(G, n_workers=None, backend=None, chunk_size=None):
     """Returns the laplacian centrality of each node in the weighted graph
 
     Parameters
     ---------- 
     G : graph
         weighted graph
+
+    n_workers : int or None, optional (default : None)
+        Number of workers sharing the nodes. None for serial computing, -1 for one worker per CPU.
+
+    backend : string or None, optional (default : None)
+        One of 'serial', 'process', 'thread', see `easygraph.utils.parallel_map`.
+
+    chunk_size : int or None, optional (default : None)
+        Number of nodes per task handed to a worker.
     
     Returns
     -------
@@ -24,187 +39,44 @@ def  laplacian(G):
     Information Sciences, Volume 194, Pages 240-253, 2012.
 
     """
-<<<<<<< HEAD
-<<<<<<< HEAD
-    adj=G.adj
-    X={}
-    W={}
-    CL={}
-    Xi={}
-    for i in G:
-        X[i]=0
-        W[i]=0
-        CL[i]=0
-        Xi[i]=0
-=======
-    adj = G.adj
-    from collections import defaultdict
-    X=defaultdict(int)
-    W = defaultdict(int)
-    CL = {}
-    
-    print("-------pool-----------")
-    from multiprocessing import Pool
-    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
-    from functools import partial
-    import random
+    # Removing node i takes i's row out of the energy, and lowers X[j] by
+    # w(j, i) for each in-neighbor j, so the drop is computed edge by edge:
+    # ELG - ELGi = X[i]^2 + 2W[i] + sum_j (X[j]^2 - (X[j] - w(j, i))^2)
+    from easygraph.utils.parallel import parallel_sum
     nodes = list(G.nodes)
-    random.shuffle(nodes)
-    def split(nodes, n):
-        ret = []
-        length = len(nodes)  # 总长
-        step = int(length / n) + 1  # 每份的长度
-        for i in range(0, length, step):
-            ret.append(nodes[i:i + step])
-        return ret
-    nodes = split(nodes, 4)
-
-    local_function = partial(initialize_parallel, G=G, adj=adj)
-    with Pool(4) as p:
-        ret = p.map(local_function, nodes)
-    res = [x[0] for i in ret for x in i]
-    X = dict(res)
-    res = [x[1] for i in ret for x in i]
-    W = dict(res)
-    ELG=sum(X[i]*X[i] for i in G)+sum(W[i] for i in G)
-
-    local_function = partial(laplacian_parallel, G=G, X=X, W=W, adj=adj, ELG=ELG)
-    with Pool(4) as p:
-        ret = p.map(local_function, nodes)
-    res = [x for i in ret for x in i]
-    CL = dict(res)
-    """
-    print("-------no-parallel-----------")
->>>>>>> 17dcc1e... parallel_partial
-    for i in G:
-        for j in G:
-            if i in G and j in G[i]:
-                X[i]+=adj[i][j].get('weight', 1)
-                W[i]+=adj[i][j].get('weight', 1)*adj[i][j].get('weight', 1)
-    ELG=sum(X[i]*X[i] for i in G)+sum(W[i] for i in G)
-    for i in G:
-        import copy
-        Xi=copy.deepcopy(X)
-        for j in G:
-            if j in adj.keys() and i in adj[j].keys():
-                Xi[j]-=adj[j][i].get('weight', 1)
-        Xi[i]=0
-        ELGi=sum(Xi[i]*Xi[i] for i in G)+sum(W[i] for i in G)-2*W[i]
-        if ELG:
-            CL[i]=(float)(ELG-ELGi)/ELG
-<<<<<<< HEAD
-    return CL
-=======
+    index = {node: i for i, node in enumerate(nodes)}
     adj = G.adj
-    from collections import defaultdict
-    X=defaultdict(int)
-    W = defaultdict(int)
+    X = np.zeros(len(nodes))
+    W = np.zeros(len(nodes))
+    for i, node in enumerate(nodes):
+        for nbr in adj[node]:
+            w = adj[node][nbr].get('weight', 1)
+            X[i] += w
+            W[i] += w * w
+    ELG = float((X * X).sum() + W.sum())
     CL = {}
-
-    if len(G) >= 1000:
-        # use the parallel version for large graph 
-        from multiprocessing import Pool
-        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
-        from functools import partial
-        import random
-        nodes = list(G.nodes)
-        random.shuffle(nodes)
-
-        def split(nodes, n):
-            ret = []
-            length = len(nodes)  # 总长
-            step = int(length / n) + 1  # 每份的长度
-            for i in range(0, length, step):
-                ret.append(nodes[i:i + step])
-            return ret
-        nodes = split(nodes, 4)
-
-        local_function = partial(initialize_parallel, G=G, adj=adj)
-        with Pool(4) as p:
-            ret = p.map(local_function, nodes)
-        res = [x[0] for i in ret for x in i]
-        X = dict(res)
-        res = [x[1] for i in ret for x in i]
-        W = dict(res)
-        ELG=sum(X[i]*X[i] for i in G)+sum(W[i] for i in G)
-
-        local_function = partial(laplacian_parallel, G=G, X=X, W=W, adj=adj, ELG=ELG)
-        with Pool(4) as p:
-            ret = p.map(local_function, nodes)
-        res = [x for i in ret for x in i]
-        CL = dict(res)
-    
-    else:
-        # use np-parallel version for small graph
-        for i in G:
-            for j in G:
-                if i in G and j in G[i]:
-                    X[i]+=adj[i][j].get('weight', 1)
-                    W[i]+=adj[i][j].get('weight', 1)*adj[i][j].get('weight', 1)
-        ELG=sum(X[i]*X[i] for i in G)+sum(W[i] for i in G)
-        for i in G:
-            import copy
-            Xi=copy.deepcopy(X)
-            for j in G:
-                if j in adj.keys() and i in adj[j].keys():
-                    Xi[j]-=adj[j][i].get('weight', 1)
-            Xi[i]=0
-            ELGi=sum(Xi[i]*Xi[i] for i in G)+sum(W[i] for i in G)-2*W[i]
-            if ELG:
-                CL[i]=(float)(ELG-ELGi)/ELG
+    if not ELG:
+        return CL
+    drop = X * X + 2 * W
+    gain = parallel_sum(_laplacian_parallel, nodes, shared=(G, index, X),
+                        n_workers=n_workers, backend=backend, chunk_size=chunk_size)
+    drop += gain
+    CL = dict(zip(nodes, (drop / ELG).tolist()))
     return CL
 
-def initialize_parallel(nodes, G, adj):
-=======
-    """
-    return CL
-
-
-def initialize_parallel(nodes, G, adj):
-    import time, os
-    print('Run initial %s (%s)...' % (len(nodes), os.getpid()))
-    start = time.time()
->>>>>>> 17dcc1e... parallel_partial
-    ret = []
-    for i in nodes:
-        X = 0
-        W = 0
-        for j in G:
-            if j in G[i]:
-                X+=adj[i][j].get('weight', 1)
-                W+=adj[i][j].get('weight', 1)*adj[i][j].get('weight', 1)
-        ret.append([[i, X], [i, W]])
-<<<<<<< HEAD
-    return ret
 
-def laplacian_parallel(nodes, G, X, W, adj, ELG):
-=======
-    end = time.time()
-    print('Task %s finish %0.2f seconds.' % (len(nodes), (end - start)))
-    return ret
+def _laplacian_parallel(nodes, shared):
+    G, index, X = shared
+    adj = G.adj
+    gain = np.zeros(len(X))
+    for j in nodes:
+        Xj = X[index[j]]
+        for i in adj[j]:
+            if i != j:
+                w = adj[j][i].get('weight', 1)
+                gain[index[i]] += 2 * Xj * w - w * w
+    return gain
 
-def laplacian_parallel(nodes, G, X, W, adj, ELG):
-    import time, os
-    print('Run task %s (%s)...' % (len(nodes), os.getpid()))
-    start = time.time()
->>>>>>> 17dcc1e... parallel_partial
-    ret = []
-    for i in nodes:
-        import copy
-        Xi=copy.deepcopy(X)
-        for j in G:
-            if j in adj.keys() and i in adj[j].keys():
-                Xi[j]-=adj[j][i].get('weight', 1)
-        Xi[i]=0
-        ELGi=sum(Xi[i]*Xi[i] for i in G)+sum(W[i] for i in G)-2*W[i]
-        if ELG:
-            ret.append([i, (float)(ELG-ELGi)/ELG])
-<<<<<<< HEAD
-=======
-    end = time.time()
-    print('Task %s finish %0.2f seconds.' % (len(nodes), (end - start)))
->>>>>>> 17dcc1e... parallel_partial
-    return ret
 
 def sort(data):
     return dict(sorted(data.items(), key = lambda x: x[0], reverse = True))
@@ -214,9 +86,4 @@ def output(data, path):
     data = sort(data)
     json_str = json.dumps(data, ensure_ascii=False, indent=4)
     with open(path, 'w', encoding='utf-8') as json_file:
-<<<<<<< HEAD
-        json_file.write(json_str)
->>>>>>> 880991f... parallel_almost
-=======
         json_file.write(json_str)
->>>>>>> 17dcc1e... parallel_partial
@@ -1,4 +1,6 @@
-import easygraph as eg
+import numpy as np
+
+from easygraph.classes import CSRGraph
 
 
 __all__ = [
@@ -6,10 +8,14 @@ __all__ = [
 ]
 
 
-def pagerank(G, alpha = 0.85):
+def pagerank(G, alpha=0.85, personalization=None, max_iter=100, tol=1.0e-6, nstart=None,
+             weight=None, dangling=None, method='power'):
     """
     Returns the PageRank value of each node in G.
 
+    The ranks are iterated on the sparse transition matrix of G, with O(m) memory
+    and time per iteration.
+
     Parameters
     ----------
     G : graph
@@ -18,35 +24,114 @@ def pagerank(G, alpha = 0.85):
     alpha : float
         The damping factor. Default is 0.85
 
-    """
-    import numpy as np
-    if len(G) == 0:
-        return {}
-    M = google_matrix(G, alpha=alpha)
+    personalization : dict, optional (default : None)
+        The teleport distribution, keyed by node. Nodes not in the dict get 0.
+        If None, uniform.
+
+    max_iter : int, optional (default : 100)
+        Maximum number of iterations.
 
-    # use numpy LAPACK solver
-    eigenvalues, eigenvectors = np.linalg.eig(M.T)
-    ind = np.argmax(eigenvalues)
-    # eigenvector of largest eigenvalue is at ind, normalized
-    largest = np.array(eigenvectors[:, ind]).flatten().real
-    norm = float(largest.sum())
-    return dict(zip(G, map(float, largest / norm)))
+    tol : float, optional (default : 1.0e-6)
+        The iteration stops once the L1 change of the ranks is below `N * tol`.
 
+    nstart : dict, optional (default : None)
+        Starting ranks, keyed by node, e.g. the result of a previous run on a
+        slightly different graph. If None, uniform.
 
+    weight : string or None, optional (default : None)
+        The key for edge weight. If None, all the weights will be 1.
+        For a `CSRGraph`, any non-None value uses the weights of the snapshot.
 
-def google_matrix(G, alpha):
-    import numpy as np
-    M = eg.utils.to_numpy_matrix(G)
+    dangling : dict, optional (default : None)
+        The distribution of the out-links of the nodes without out-edges,
+        keyed by node. If None, the teleport distribution.
+
+    method : string, optional (default : 'power')
+        'power' for the power iteration, 'gauss-seidel' for Gauss-Seidel sweeps,
+        which usually take fewer iterations.
+
+    Returns
+    -------
+    pagerank : dict
+        The PageRank value of each node.
+
+    Examples
+    --------
+    >>> pr = pagerank(G, weight='weight')
+    >>> pr = pagerank(G_next_day, nstart=pr)  # warm start
+
+    """
     N = len(G)
     if N == 0:
-        return M
+        return {}
+    nodes = list(G)
+    P, is_dangling = _transition_matrix(G, weight)
+    p = _node_vector(personalization, nodes, 'personalization')
+    if dangling is None:
+        dangling_weights = p
+    else:
+        dangling_weights = _node_vector(dangling, nodes, 'dangling')
+    x = _node_vector(nstart, nodes, 'nstart')
+
+    if method == 'power':
+        x = _power_iteration(P, is_dangling, p, dangling_weights, x, alpha, max_iter, tol)
+    elif method == 'gauss-seidel':
+        x = _gauss_seidel(P, is_dangling, p, dangling_weights, x, alpha, max_iter, tol)
+    else:
+        raise ValueError("method should be 'power' or 'gauss-seidel', got {}.".format(method))
+    return dict(zip(nodes, x.tolist()))
+
+
+def _transition_matrix(G, weight):
+    """Returns the transposed row-stochastic transition matrix and the dangling nodes mask."""
+    import scipy.sparse as sps
+    G = CSRGraph.from_graph(G, weight=weight)
+    n = len(G)
+    weights = G.weights if weight is not None else np.ones(len(G.indices))
+    out_weight = np.bincount(G.tails(), weights=weights, minlength=n)
+    is_dangling = out_weight == 0
+    scale = np.divide(1.0, out_weight, out=np.zeros(n), where=~is_dangling)
+    P = sps.csr_matrix((weights * scale[G.tails()], G.indices, G.indptr), shape=(n, n))
+    return P.T.tocsr(), is_dangling
+
 
-    # Get dangling nodes(nodes with no out link)
-    dangling_nodes = np.where(M.sum(axis=1) == 0)[0]
-    dangling_weights = np.repeat(1.0 / N, N)
-    for node in dangling_nodes:
-        M[node] = dangling_weights
+def _node_vector(values, nodes, name):
+    if values is None:
+        return np.full(len(nodes), 1.0 / len(nodes))
+    x = np.fromiter((values.get(node, 0) for node in nodes), dtype=float, count=len(nodes))
+    total = x.sum()
+    if total <= 0:
+        raise ValueError("The values of {} should have a positive sum.".format(name))
+    return x / total
 
-    M /= M.sum(axis=1)
 
-    return alpha * M + (1 - alpha) * np.repeat(1.0 / N, N)
+def _power_iteration(PT, is_dangling, p, dangling_weights, x, alpha, max_iter, tol):
+    N = len(x)
+    for _ in range(max_iter):
+        xlast = x
+        x = alpha * (PT @ xlast + xlast[is_dangling].sum() * dangling_weights) + (1 - alpha) * p
+        if np.abs(x - xlast).sum() < N * tol:
+            return x
+    raise RuntimeError("pagerank: power iteration failed to converge in {} iterations.".format(max_iter))
+
+
+def _gauss_seidel(PT, is_dangling, p, dangling_weights, x, alpha, max_iter, tol):
+    """Gauss-Seidel sweeps on (I - alpha P^T) x = alpha D x + (1 - alpha) p.
+
+    The dangling term D x is taken from the previous sweep, the links from
+    the nodes before each node from the current one.
+    """
+    import scipy.sparse as sps
+    from scipy.sparse.linalg import spsolve_triangular
+    N = len(x)
+    M = (sps.identity(N, format='csr') - alpha * PT).tocsr()
+    lower = sps.tril(M, format='csr')
+    upper = sps.triu(M, k=1, format='csr')
+    for _ in range(max_iter):
+        xlast = x
+        b = alpha * xlast[is_dangling].sum() * dangling_weights + (1 - alpha) * p
+        x = spsolve_triangular(lower, b - upper @ xlast, lower=True)
+        x /= x.sum()
+        if np.abs(x - xlast).sum() < N * tol:
+            return x
+    raise RuntimeError("pagerank: Gauss-Seidel failed to converge in {} iterations.".format(max_iter))
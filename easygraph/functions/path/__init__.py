@@ -1 +1,3 @@
-from .path import *
\ No newline at end of file
+from .path import *
+from .apsp import *
+from .removal import *
@@ -0,0 +1,209 @@
+"""
+All-pairs shortest path lengths as dense NumPy matrices.
+
+Sparse graphs are solved row by row with one BFS / Dijkstra search per source
+node (in the compiled routines of `scipy.sparse.csgraph`), dense graphs with a
+blocked min-plus Floyd-Warshall [1]_ on the whole matrix. The rows can also be
+streamed batch by batch, for callers that only need an aggregate of them.
+
+References
+----------
+.. [1] Venkataraman G, Sahni S, Mukhopadhyaya S. A blocked all-pairs shortest-paths
+   algorithm[J]. Journal of Experimental Algorithmics, 2003, 8: 2.2.
+"""
+import numpy as np
+
+from easygraph.classes import CSRGraph
+
+__all__ = [
+    "shortest_path_length_matrix",
+    "shortest_path_length_rows",
+]
+
+# Above these fractions of the n^2 possible edges, Floyd-Warshall is used by method='auto',
+# for weighted and unweighted graphs. Searching from every node is O(nm) and
+# Floyd-Warshall O(n^3), the crossovers are measured ones.
+DENSE_THRESHOLD_WEIGHTED = 0.15
+DENSE_THRESHOLD_UNWEIGHTED = 0.3
+
+
+def shortest_path_length_matrix(G, weight='weight', method='auto', dtype=None, memmap=None,
+                                batch_size=256):
+    """Returns the matrix of shortest path lengths between all pairs of nodes.
+
+    Parameters
+    ----------
+    G : easygraph.Graph, easygraph.DiGraph or easygraph.CSRGraph
+
+    weight : string or None, optional (default : 'weight')
+        The key for edge weight. Edges without this attribute get weight 1.
+        If None, all the weights will be 1. For a `CSRGraph`, any non-None value
+        uses the weights of the snapshot.
+
+    method : string, optional (default : 'auto')
+        'search' for one BFS / Dijkstra search per source, 'floyd' for the blocked
+        Floyd-Warshall. 'auto' picks 'floyd' for dense graphs or negative weights,
+        'search' otherwise.
+
+    dtype : numpy dtype or None, optional (default : None)
+        The dtype of the matrix. If None, `int32` when *weight* is None and
+        `float64` otherwise. Pass `float32` to halve the memory of a large
+        weighted matrix.
+
+    memmap : string or None, optional (default : None)
+        If not None, the path of a `.npy` file the matrix is written to, and a
+        memory-mapped array of it is returned. Use it when the matrix does not fit in memory.
+
+    batch_size : int, optional (default : 256)
+        The number of sources searched at a time by the 'search' method.
+
+    Returns
+    -------
+    D : numpy.ndarray or numpy.memmap
+        ``D[i, j]`` is the length of the shortest path from the i-th to the j-th
+        node of `list(G)`. Unreachable pairs are `inf` for float dtypes and -1
+        for integer dtypes.
+
+    Examples
+    --------
+    >>> D = shortest_path_length_matrix(G, weight=None)
+    >>> D = shortest_path_length_matrix(G, memmap='apsp.npy', dtype=np.float32)
+
+    """
+    G = CSRGraph.from_graph(G, weight=weight)
+    weighted = weight is not None
+    dtype = _resolve_dtype(dtype, weighted)
+    n = len(G)
+    if method == 'auto':
+        negative = weighted and (G.weights < 0).any()
+        threshold = DENSE_THRESHOLD_WEIGHTED if weighted else DENSE_THRESHOLD_UNWEIGHTED
+        dense = n > 0 and len(G.indices) > threshold * n * n
+        method = 'floyd' if dense or negative else 'search'
+    if method not in ('search', 'floyd'):
+        raise ValueError("method should be one of 'auto', 'search', 'floyd', got {}.".format(method))
+
+    if memmap is not None:
+        D = np.lib.format.open_memmap(memmap, mode='w+', dtype=dtype, shape=(n, n))
+    else:
+        D = np.empty((n, n), dtype=dtype)
+    if method == 'floyd':
+        work_dtype = np.float64 if np.dtype(dtype) == np.float64 else np.float32
+        lengths = _dense_lengths(G, weighted, work_dtype)
+        _floyd_warshall_blocked(lengths)
+        D[:] = _cast_lengths(lengths, dtype)
+    else:
+        for start, rows in _search_rows(G, weighted, range(n), batch_size):
+            D[start:start + len(rows)] = _cast_lengths(rows, dtype)
+    if memmap is not None:
+        D.flush()
+    return D
+
+
+def shortest_path_length_rows(G, weight='weight', sources=None, dtype=None, batch_size=256):
+    """Yields the shortest path lengths from the sources, a batch of rows at a time.
+
+    Only one batch of rows is in memory at a time, e.g. to sum all the lengths
+    of a graph whose full matrix does not fit in memory.
+
+    Parameters
+    ----------
+    G : easygraph.Graph, easygraph.DiGraph or easygraph.CSRGraph
+
+    weight : string or None, optional (default : 'weight')
+        The key for edge weight, see `shortest_path_length_matrix`.
+
+    sources : list of nodes or None, optional (default : None)
+        The source nodes. If None, all nodes of `G`.
+
+    dtype : numpy dtype or None, optional (default : None)
+        The dtype of the rows, see `shortest_path_length_matrix`.
+
+    batch_size : int, optional (default : 256)
+        The number of rows per batch.
+
+    Yields
+    ------
+    (sources, rows) : (list, numpy.ndarray)
+        A batch of source nodes and their rows, ``rows[i, j]`` is the length
+        from ``sources[i]`` to the j-th node of `list(G)`.
+
+    Examples
+    --------
+    >>> total = 0
+    >>> for sources, rows in shortest_path_length_rows(G, weight=None):
+    ...     total += rows[rows > 0].sum()
+
+    """
+    G = CSRGraph.from_graph(G, weight=weight)
+    weighted = weight is not None
+    dtype = _resolve_dtype(dtype, weighted)
+    if sources is None:
+        sources = G.node_of_index
+    sources = list(sources)
+    indices = [G.index_of_node[node] for node in sources]
+    for start, rows in _search_rows(G, weighted, indices, batch_size):
+        yield sources[start:start + len(rows)], _cast_lengths(rows, dtype)
+
+
+def _resolve_dtype(dtype, weighted):
+    if dtype is None:
+        return np.float64 if weighted else np.int32
+    return dtype
+
+
+def _cast_lengths(lengths, dtype):
+    if np.issubdtype(dtype, np.integer):
+        return np.where(np.isinf(lengths), -1, lengths).astype(dtype)
+    return lengths.astype(dtype, copy=False)
+
+
+def _search_rows(G, weighted, indices, batch_size):
+    from scipy.sparse.csgraph import dijkstra
+    if weighted and (G.weights < 0).any():
+        raise ValueError('Contradictory paths found:',
+                         'negative weights?')
+    csgraph = G._as_csgraph()
+    indices = list(indices)
+    for start in range(0, len(indices), batch_size):
+        batch = indices[start:start + batch_size]
+        yield start, dijkstra(csgraph, directed=True, unweighted=not weighted, indices=batch)
+
+
+def _dense_lengths(G, weighted, dtype):
+    n = len(G)
+    lengths = np.full((n, n), np.inf, dtype=dtype)
+    weights = G.weights if weighted else 1
+    # Keep the lightest of parallel entries, then the empty paths
+    np.minimum.at(lengths, (G.tails(), G.indices), weights)
+    np.fill_diagonal(lengths, 0)
+    return lengths
+
+
+def _floyd_warshall_blocked(D, block_size=64, chunk_rows=32):
+    """Runs Floyd-Warshall in place on the square matrix *D*, one block of k at a time.
+
+    For each block K of intermediate nodes: the diagonal block is closed first,
+    then the row and column panels through it, and at last the whole matrix is
+    updated with the min-plus product of the two panels. The product goes over
+    chunks of rows small enough to stay in cache for all the k of the block.
+    """
+    n = len(D)
+    buffer = np.empty((chunk_rows, n), dtype=D.dtype)
+    for begin in range(0, n, block_size):
+        K = slice(begin, min(begin + block_size, n))
+        diagonal = D[K, K]
+        for k in range(diagonal.shape[0]):
+            np.minimum(diagonal, diagonal[:, k, None] + diagonal[None, k, :], out=diagonal)
+        row_panel, column_panel = D[K, :], D[:, K]
+        for k in range(diagonal.shape[0]):
+            np.minimum(row_panel, diagonal[:, k, None] + row_panel[None, k, :], out=row_panel)
+            np.minimum(column_panel, column_panel[:, k, None] + diagonal[None, k, :], out=column_panel)
+        row_panel, column_panel = row_panel.copy(), column_panel.copy()
+        for row in range(0, n, chunk_rows):
+            C = D[row:row + chunk_rows]
+            A = column_panel[row:row + chunk_rows]
+            tmp = buffer[:len(C)]
+            for k in range(row_panel.shape[0]):
+                np.add(A[:, k, None], row_panel[k], out=tmp)
+                np.minimum(C, tmp, out=C)
+    return D
@@ -0,0 +1,135 @@
+"""
+Level-synchronous BFS engine over integer-indexed CSR adjacency arrays.
+
+Each level is expanded for the whole frontier at once with NumPy: the neighbors
+of all frontier nodes are gathered, the visited ones are masked out and the new
+level is scattered into the `level` array. On low-diameter graphs the engine
+switches to bottom-up steps [1]_ when the frontier gets large, i.e. the unvisited
+nodes look for a parent in the frontier instead of the frontier pushing to all
+of its neighbors.
+
+References
+----------
+.. [1] Beamer S, Asanović K, Patterson D. Direction-optimizing breadth-first search[C]
+   //SC'12: Proceedings of the International Conference on High Performance Computing,
+   Networking, Storage and Analysis. IEEE, 2012: 1-10.
+"""
+import numpy as np
+
+__all__ = []
+
+# Thresholds of the direction switch, the values suggested in [1]
+ALPHA = 14
+BETA = 24
+
+
+def _bfs_levels(indptr, indices, sources, in_indptr=None, in_indices=None, blocked=None,
+                target=None, max_level=None, direction_optimizing=True):
+    """Returns the BFS level of each node, -1 for the nodes not reached.
+
+    Parameters
+    ----------
+    indptr, indices : numpy.ndarray
+        CSR arrays of the (out-)adjacency.
+
+    sources : int or array of int
+        Index of the source node(s), all of them get level 0.
+
+    in_indptr, in_indices : numpy.ndarray, optional (default : None)
+        CSR arrays of the reversed adjacency, needed by bottom-up steps.
+        For undirected graph they are *indptr* and *indices* themselves.
+        If None, only top-down steps are made.
+
+    blocked : numpy.ndarray of bool, optional (default : None)
+        Nodes regarded as removed from the graph.
+
+    target : int, optional (default : None)
+        Stop after the level containing the node of this index.
+
+    max_level : int, optional (default : None)
+        Do not expand the frontier past this level.
+
+    direction_optimizing : boolean, optional (default : True)
+        Whether to switch between top-down and bottom-up steps.
+
+    """
+    level = np.full(len(indptr) - 1, -1, dtype=np.int64)
+    for depth, frontier in _bfs_frontiers(indptr, indices, sources, level, in_indptr, in_indices,
+                                          blocked, max_level, direction_optimizing):
+        if target is not None and level[target] >= 0:
+            break
+    return level
+
+
+def _bfs_frontiers(indptr, indices, sources, level, in_indptr=None, in_indices=None, blocked=None,
+                   max_level=None, direction_optimizing=True):
+    """Yields `(depth, frontier)` level by level, filling *level* in place.
+
+    *level* must be initialized with -1 for unvisited nodes. The frontier of
+    each level is an array of node indices, sorted in increasing order.
+    """
+    n = len(indptr) - 1
+    degree = np.diff(indptr)
+    frontier = np.unique(np.atleast_1d(np.asarray(sources, dtype=np.int64)))
+    if blocked is not None:
+        frontier = frontier[~blocked[frontier]]
+    level[frontier] = 0
+    bottom_up_available = direction_optimizing and in_indptr is not None
+    # m_unvisited: number of edge entries of the unvisited nodes, kept up to date for the switch
+    if bottom_up_available:
+        unvisited = level < 0 if blocked is None else (level < 0) & ~blocked
+        m_unvisited = int(degree[unvisited].sum())
+    bottom_up = False
+    depth = 0
+    while len(frontier) > 0:
+        yield depth, frontier
+        if max_level is not None and depth >= max_level:
+            break
+        if bottom_up_available:
+            m_frontier = int(degree[frontier].sum())
+            if not bottom_up and m_frontier > m_unvisited / ALPHA:
+                bottom_up = True
+            elif bottom_up and len(frontier) < n / BETA:
+                bottom_up = False
+        if bottom_up:
+            frontier = _bottom_up_step(in_indptr, in_indices, frontier, level, blocked)
+        else:
+            frontier = _top_down_step(indptr, indices, frontier, level, blocked)
+        depth += 1
+        level[frontier] = depth
+        if bottom_up_available:
+            m_unvisited -= int(degree[frontier].sum())
+
+
+def _top_down_step(indptr, indices, frontier, level, blocked):
+    _, positions = _gather_rows(indptr, frontier)
+    neighbors = indices[positions]
+    unvisited = level[neighbors] < 0
+    if blocked is not None:
+        unvisited &= ~blocked[neighbors]
+    return np.unique(neighbors[unvisited])
+
+
+def _bottom_up_step(in_indptr, in_indices, frontier, level, blocked):
+    unvisited = level < 0
+    if blocked is not None:
+        unvisited &= ~blocked
+    candidates = np.flatnonzero(unvisited)
+    in_frontier = np.zeros(len(level), dtype=bool)
+    in_frontier[frontier] = True
+    rows, positions = _gather_rows(in_indptr, candidates)
+    return np.unique(rows[in_frontier[in_indices[positions]]])
+
+
+def _gather_rows(indptr, rows):
+    """Returns the row of each entry and the positions of all entries of *rows* in a CSR array.
+
+    The positions index into `indices` / `weights`, e.g. the neighbors of all the
+    *rows* are ``indices[positions]``.
+    """
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    ends = np.cumsum(counts)
+    positions = np.arange(ends[-1] if len(ends) else 0, dtype=np.int64)
+    positions += np.repeat(starts - ends + counts, counts)
+    return np.repeat(rows, counts), positions
@@ -1,3 +1,8 @@
+import numpy as np
+
+from easygraph.classes import CSRGraph
+from easygraph.functions.path.apsp import shortest_path_length_matrix
+from easygraph.functions.path.bfs import _bfs_levels
 from easygraph.utils.decorators import only_implemented_for_UnDirected_graph
 
 __all__=[
@@ -45,7 +50,12 @@ def Floyd(G):
     Returns
     -------
     result_dict : dict
-        the length of paths from all nodes to remaining nodes
+        the length of paths from all nodes to remaining nodes, integers when
+        all of them are whole numbers, inf for the unreachable nodes
+
+    See Also
+    --------
+    shortest_path_length_matrix : the same lengths as a NumPy matrix.
 
     Examples
     --------
@@ -54,25 +64,16 @@ def Floyd(G):
     >>> Floyd(G)
 
     """
-    adj=G.adj.copy()
-    result_dict={}
-    for i in G:
-        result_dict[i]={}
-    for i in G:
-        temp_key = adj[i].keys()
-        for j in G:
-            if j in temp_key:
-                result_dict[i][j]=adj[i][j].get("weight",1)
-            else:
-                result_dict[i][j]=float("inf") 
-            if i==j:
-                result_dict[i][i]=0
-    for k in G:
-        for i in G: 
-            for j in G:
-                temp = result_dict[i][k] + result_dict[k][j]  
-                if result_dict[i][j] > temp:  
-                    result_dict[i][j] = temp  
+    D = shortest_path_length_matrix(G, weight="weight", dtype=np.float64)
+    reached = np.isfinite(D)
+    if (D[reached] == np.floor(D[reached])).all():
+        # Integer lengths, as the sums of the integer weights of a Graph
+        D = np.where(reached, D, 0).astype(np.int64).astype(object)
+        D[~reached] = float("inf")
+    result_dict = {}
+    nodes = list(G)
+    for i, row in zip(nodes, D.tolist()):
+        result_dict[i] = dict(zip(nodes, row))
     return result_dict
 
 @only_implemented_for_UnDirected_graph
@@ -170,6 +171,13 @@ def Kruskal(G):
     return result_dict
 
 def single_source_bfs(G, source, target=None):
+    """Returns the number of hops from source to the nodes it reaches.
+
+    With *target*, the search stops at it: only the nodes strictly closer
+    than the target, and the target, are returned.
+    """
+    if isinstance(G, CSRGraph):
+        return _csr_single_source_bfs(G, source, target=target)
     nextlevel = {source: 0}
     return dict(_single_source_bfs(G.adj, nextlevel, target=target))
 
@@ -181,13 +189,14 @@ def _single_source_bfs(adj, firstlevel, target=None):
     while nextlevel:
         thislevel = nextlevel
         nextlevel = {}
+        if target in thislevel and target not in seen:
+            yield (target, level)
+            break
         for v in thislevel:
             if v not in seen:
                 seen[v] = level
                 nextlevel.update(adj[v])
                 yield (v, level)
-                if v == target:
-                    break
         level += 1
     del seen
 
@@ -195,9 +204,16 @@ def single_source_dijkstra(G, source, weight="weight", target=None):
     return multi_source_dijkstra(G, {source}, weight, target=target)
 
 def multi_source_dijkstra(G, sources, weight="weight", target=None):
+    """Returns the length of the shortest paths from the nearest of sources to the nodes they reach.
+
+    With *target*, the search stops at it: only the nodes strictly closer
+    than the target, and the target, are returned.
+    """
     return _dijkstra_multisource(G, sources, weight, target=target)
 
 def _dijkstra_multisource(G, sources, weight="weight", target=None):
+    if isinstance(G, CSRGraph):
+        return _csr_multi_source_dijkstra(G, sources, target=target)
     from heapq import heappush, heappop
     push = heappush
     pop = heappop
@@ -216,6 +232,8 @@ def _dijkstra_multisource(G, sources, weight="weight", target=None):
             continue
         dist[v] = d
         if v == target:
+            # Drop the nodes settled before the target at the same distance
+            dist = {u: du for u, du in dist.items() if du < d or u == v}
             break
         for u in adj[v]:
             cost = adj[v][u].get(weight, 1)
@@ -230,3 +248,44 @@ def _dijkstra_multisource(G, sources, weight="weight", target=None):
             else:
                 continue
     return dist
+
+def _csr_single_source_bfs(G, source, target=None):
+    in_indptr, in_indices, _ = G.in_csr()
+    level = _bfs_levels(G.indptr, G.indices, G.index_of_node[source],
+                        in_indptr=in_indptr, in_indices=in_indices,
+                        target=G.index_of_node.get(target, None))
+    reached = level >= 0
+    if target is not None and target in G and reached[G.index_of_node[target]]:
+        reached = _closer_than_target(level, reached, G.index_of_node[target])
+    return _csr_lengths_to_dict(G, level, reached)
+
+def _csr_multi_source_dijkstra(G, sources, target=None):
+    """Shortest path lengths from *sources* computed on the arrays of a CSRGraph.
+
+    The edge weights are the ones the snapshot was taken with.
+    """
+    from scipy.sparse.csgraph import dijkstra
+    if (G.weights < 0).any():
+        raise ValueError('Contradictory paths found:',
+                         'negative weights?')
+    dist = dijkstra(G._as_csgraph(), directed=True, min_only=True,
+                    indices=[G.index_of_node[source] for source in sources])
+    reached = np.isfinite(dist)
+    if target is not None and target in G and reached[G.index_of_node[target]]:
+        reached = _closer_than_target(dist, reached, G.index_of_node[target])
+    if (G.weights == np.floor(G.weights)).all():
+        # Integer lengths, as the sums of the integer weights of a Graph
+        dist = np.where(reached, dist, 0).astype(np.int64)
+    return _csr_lengths_to_dict(G, dist, reached)
+
+def _closer_than_target(lengths, reached, target):
+    # The nodes strictly closer than the target, and the target
+    closer = reached & (lengths < lengths[target])
+    closer[target] = True
+    return closer
+
+def _csr_lengths_to_dict(G, lengths, reached):
+    reached = np.flatnonzero(reached)
+    reached = reached[np.argsort(lengths[reached], kind='stable')]
+    nodes = G.node_of_index
+    return dict(zip((nodes[i] for i in reached), lengths[reached].tolist()))
@@ -0,0 +1,192 @@
+"""
+Sums of the shortest path lengths of a graph after removing some of its nodes.
+
+Removing a set R of nodes only changes the distances from a source s if some
+node outside R loses all its shortest paths from s, i.e. in the shortest-path
+DAG of s all the parents of that node are in R. For every other source, the
+distances of the remaining pairs are the ones of the whole graph, and only the
+pairs with an end in R drop out. So one search per source on the whole graph
+gives the sums of all the removals, and a source is searched again only for
+the removals that cut its DAG.
+"""
+import numpy as np
+
+from easygraph.classes import CSRGraph
+from easygraph.functions.path.bfs import _bfs_levels
+
+__all__ = [
+    "shortest_path_sums_after_removal",
+]
+
+
+def shortest_path_sums_after_removal(G, removals, weight=None, n_workers=None, backend=None,
+                                     chunk_size=None):
+    """Returns the sum of the shortest path lengths of G, and of G without each removal.
+
+    The sums are over the ordered pairs of distinct nodes, the unreachable pairs
+    are counted apart. Each source is searched once on *G*, and again only for
+    the removals that change its distances.
+
+    Parameters
+    ----------
+    G : easygraph.Graph, easygraph.DiGraph or easygraph.CSRGraph
+
+    removals : list of lists of nodes
+        Each item is a group of nodes removed together. Scoring many single
+        nodes, e.g. ``[[v] for v in G]``, is vectorized over the nodes.
+
+    weight : string or None, optional (default : None)
+        The key for edge weight. Edges without this attribute get weight 1.
+        If None, all the weights will be 1. For a `CSRGraph`, any non-None value
+        uses the weights of the snapshot.
+
+    n_workers : int or None, optional (default : None)
+        Number of workers sharing the sources. None for serial computing, -1 for one worker per CPU.
+
+    backend : string or None, optional (default : None)
+        One of 'serial', 'process', 'thread', see `easygraph.utils.parallel_map`.
+
+    chunk_size : int or None, optional (default : None)
+        Number of sources per task handed to a worker.
+
+    Returns
+    -------
+    base : (number, int)
+        The sum of the lengths of the shortest paths between all the reachable
+        pairs of *G*, and the number of unreachable pairs.
+
+    sums : list of (number, int)
+        The same for *G* without the nodes of each removal, in order. The nodes
+        not in *G* are ignored.
+
+    Examples
+    --------
+    Score each node by the total distance of the graph without it
+
+    >>> base, sums = shortest_path_sums_after_removal(G, [[v] for v in G])
+    >>> zeta = len(G) ** 3
+    >>> scores = [total + unreachable * zeta for total, unreachable in sums]
+
+    """
+    from easygraph.utils.parallel import parallel_sum
+    G = CSRGraph.from_graph(G, weight=weight)
+    weighted = weight is not None
+    n = len(G)
+    removals = [sorted(set(G.index_of_node[node] for node in removal if node in G))
+                for removal in removals]
+    if removals and all(len(removal) == 1 for removal in removals):
+        # Duplicates are scored once
+        candidates = np.unique([removal[0] for removal in removals])
+        shared = (G, weighted, candidates, None)
+        slot = np.searchsorted(candidates, [removal[0] for removal in removals])
+    else:
+        shared = (G, weighted, None, removals)
+        slot = np.arange(len(removals))
+
+    if n == 0:
+        totals = np.zeros((2, 1 + len(slot)))
+    else:
+        totals = parallel_sum(_removal_sums_parallel, list(range(n)), shared=shared,
+                              n_workers=n_workers, backend=backend, chunk_size=chunk_size)
+    lengths, unreachable = totals[0], totals[1]
+    if not weighted:
+        lengths = np.rint(lengths).astype(np.int64)
+    lengths, unreachable = lengths.tolist(), np.rint(unreachable).astype(np.int64).tolist()
+    base = (lengths[0], unreachable[0])
+    sums = [(lengths[1 + i], unreachable[1 + i]) for i in slot.tolist()]
+    return base, sums
+
+
+def _removal_sums_parallel(sources, shared, batch_size=64):
+    """Returns the sums of the chunk of sources, the ones of *G* in column 0 and the
+    ones of each removal in the next columns, lengths in row 0 and unreachable pairs in row 1.
+    """
+    from scipy.sparse.csgraph import dijkstra
+    G, weighted, candidates, removals = shared
+    n = len(G)
+    tails, heads = G.tails(), G.indices
+    edge_weights = G.weights if weighted else 1
+    if candidates is not None:
+        columns = len(candidates)
+        slot = np.full(n, -1, dtype=np.int64)
+        slot[candidates] = np.arange(columns)
+    else:
+        columns = len(removals)
+        masks = np.zeros((columns, n), dtype=bool)
+        for r, removal in enumerate(removals):
+            masks[r, removal] = True
+    totals = np.zeros((2, 1 + columns))
+    csgraph = G._as_csgraph()
+
+    for begin in range(0, len(sources), batch_size):
+        batch = sources[begin:begin + batch_size]
+        rows = dijkstra(csgraph, directed=True, unweighted=not weighted, indices=batch)
+        for s, dist in zip(batch, rows):
+            reached = np.isfinite(dist)
+            length = float(dist[reached].sum())
+            unreachable = n - int(np.count_nonzero(reached))
+            totals[0, 0] += length
+            totals[1, 0] += unreachable
+            # Edges of the shortest-path DAG of s, and the number of parents of each node
+            on_dag = reached[tails] & _is_tight(dist[tails] + edge_weights, dist[heads], weighted)
+            parents = np.bincount(heads[on_dag], minlength=n)
+
+            if candidates is not None:
+                lengths = length - np.where(reached[candidates], dist[candidates], 0)
+                lost = unreachable - 1 + reached[candidates]
+                # The nodes that are the only parent of some node
+                sole = np.zeros(len(tails), dtype=bool)
+                sole[on_dag] = parents[heads[on_dag]] == 1
+                cut = np.unique(tails[sole])
+                for x in cut[(slot[cut] >= 0) & (cut != s)].tolist():
+                    blocked = np.zeros(n, dtype=bool)
+                    blocked[x] = True
+                    lengths[slot[x]], lost[slot[x]] = _sums_without(G, s, blocked, weighted)
+                if slot[s] >= 0:
+                    lengths[slot[s]] = lost[slot[s]] = 0
+                totals[0, 1:] += lengths
+                totals[1, 1:] += lost
+                continue
+
+            for r in range(columns):
+                mask = masks[r]
+                if mask[s]:
+                    continue
+                # Cut if a node out of the removal has all its parents in it
+                into = on_dag & mask[tails] & ~mask[heads]
+                children = heads[into]
+                cut = (parents[children] == np.bincount(children, minlength=n)[children]).any()
+                if cut:
+                    lengths, lost = _sums_without(G, s, mask, weighted)
+                else:
+                    kept = reached & ~mask
+                    lengths = float(dist[kept].sum())
+                    lost = n - int(mask.sum()) - int(np.count_nonzero(kept))
+                totals[0, 1 + r] += lengths
+                totals[1, 1 + r] += lost
+    return totals
+
+
+def _is_tight(through, dist, weighted):
+    if weighted:
+        return np.isclose(through, dist, rtol=1e-12, atol=0)
+    return through == dist
+
+
+def _sums_without(G, s, blocked, weighted):
+    """Returns the sum of the lengths and the number of unreachable nodes from *s*, without the blocked nodes."""
+    n = len(G) - int(blocked.sum())
+    if not weighted:
+        in_indptr, in_indices, _ = G.in_csr()
+        level = _bfs_levels(G.indptr, G.indices, s, in_indptr=in_indptr, in_indices=in_indices,
+                            blocked=blocked)
+        reached = level >= 0
+        return float(level[reached].sum()), n - int(np.count_nonzero(reached))
+    import scipy.sparse as sps
+    from scipy.sparse.csgraph import dijkstra
+    kept = ~blocked[G.tails()] & ~blocked[G.indices]
+    csgraph = sps.csr_matrix((G.weights[kept], (G.tails()[kept], G.indices[kept])),
+                             shape=(len(G), len(G)))
+    dist = dijkstra(csgraph, directed=True, indices=s)
+    reached = np.isfinite(dist)
+    return float(dist[reached].sum()), n - int(np.count_nonzero(reached))
@@ -4,7 +4,8 @@ import random
 import math
 from easygraph.utils.decorators import only_implemented_for_UnDirected_graph
 from easygraph.functions.components.connected import connected_components
-from easygraph.functions.components.biconnected import generator_articulation_points
+from easygraph.functions.components.biconnected import _articulation_point_splits
+from easygraph.functions.path.removal import shortest_path_sums_after_removal
 
 
 __all__ = [
@@ -14,7 +15,7 @@ __all__ = [
 
 
 @only_implemented_for_UnDirected_graph
-def common_greedy(G, k, c=1.0, weight='weight'):
+def common_greedy(G, k, c=1.0, weight='weight', n_workers=None, backend=None, chunk_size=None):
     """Common greedy method for structural hole spanners detection.
 
     Returns top k nodes as structural hole spanners,
@@ -37,6 +38,16 @@ def common_greedy(G, k, c=1.0, weight='weight'):
     weight : String or None, optinal (defautl : 'weight')
         Key for edge weight. None if not concerning about edge weight.
 
+    n_workers : int or None, optional (default : None)
+        Number of workers sharing the shortest path searches of each round.
+        None for serial computing, -1 for one worker per CPU.
+
+    backend : string or None, optional (default : None)
+        One of 'serial', 'process', 'thread', see `easygraph.utils.parallel_map`.
+
+    chunk_size : int or None, optional (default : None)
+        Number of sources per task handed to a worker.
+
     Returns
     -------
     common_greedy : list
@@ -61,34 +72,36 @@ def common_greedy(G, k, c=1.0, weight='weight'):
     
     """
     v_sns = []
-    G_i = G.copy()
+    # Views hide the chosen and the tested nodes instead of copying the graph
+    G_i = G.without_nodes([])
     N = len(G)
     for i in range(k):
         sorted_nodes = sort_nodes_by_degree(G_i, weight)
-        C_max = 0
-
-        for j in range(N-i):
-            G_i_j = G_i.copy()
-            G_i_j.remove_node(sorted_nodes[j])
-            upper_bound = procedure1(G_i_j, c)
-            if upper_bound < C_max:
-                pass
-            else:
-                sum_all_shortest_paths = procedure2(G_i_j, c)
-                if sum_all_shortest_paths >= C_max:
-                    v_i = sorted_nodes[j]
-                    C_max = sum_all_shortest_paths
-                else:
-                    pass
-            del G_i_j
+        v_i = _node_of_max_procedure2(G_i, sorted_nodes[:N-i], c, n_workers, backend, chunk_size)
 
         v_sns.append(v_i)
-        G_i.remove_node(v_i)
+        G_i = G_i.without_nodes([v_i])
 
-    del G_i
     return v_sns
 
 
+def _node_of_max_procedure2(G, candidates, c=1.0, n_workers=None, backend=None, chunk_size=None):
+    """Returns the candidate maximizing `procedure2` of G without it, the last one on ties.
+
+    All the candidates are scored by one pass of shortest path searches, see
+    `shortest_path_sums_after_removal`, instead of one all pairs search each.
+    """
+    _, sums = shortest_path_sums_after_removal(G, [[v] for v in candidates], n_workers=n_workers,
+                                               backend=backend, chunk_size=chunk_size)
+    zeta = c * math.pow(len(G) - 1, 3)
+    v_max, C_max = None, 0
+    for v, (sum_all_shortest_paths, unreachable_pairs) in zip(candidates, sums):
+        C = sum_all_shortest_paths + unreachable_pairs * zeta
+        if C >= C_max:
+            v_max, C_max = v, C
+    return v_max
+
+
 def sort_nodes_by_degree(G, weight='weight'):
     sorted_nodes = []
     for node, degree in sorted(G.degree(weight=weight).items(), key=lambda x: x[1], reverse=True):
@@ -136,42 +149,40 @@ def procedure1(G, c=1.0):
 
 def _get_spanning_tree_of_component(G):
     spanning_tree = eg.Graph()
-    seen = set()
-
-    def _plain_dfs(u):
-        for v, edge_data in G.adj[u].items():
-            if v not in seen:
-                seen.add(v)
-                spanning_tree.add_edge(u, v)
-                _plain_dfs(v)
-
     random_node = list(G.nodes)[0]
-    seen.add(random_node)
     spanning_tree.add_node(random_node)
-
-    _plain_dfs(random_node)
+    for u, v in _plain_dfs_edges(G, random_node):
+        spanning_tree.add_edge(u, v)
 
     return spanning_tree
 
 
 def _get_num_subtree_nodes(G, root):
-    num_subtree_nodes = dict()
-    seen = set()
+    num_subtree_nodes = {root: 1}
+    tree_edges = list(_plain_dfs_edges(G, root))
+    for u, v in tree_edges:
+        num_subtree_nodes[v] = 1
+    # Children are discovered after their parent, so they are summed up first
+    for u, v in reversed(tree_edges):
+        num_subtree_nodes[u] += num_subtree_nodes[v]
 
-    def _plain_dfs(u):
-        num_nodes = 1
-        for v, edge_data in G.adj[u].items():
-            if v not in seen:
-                seen.add(v)
-                num_nodes += _plain_dfs(v)
-
-        num_subtree_nodes[u] = num_nodes
-        return num_nodes
+    return num_subtree_nodes
 
-    seen.add(root)
-    _plain_dfs(root)
 
-    return num_subtree_nodes
+def _plain_dfs_edges(G, source):
+    # Iterative, so that deep components do not hit the recursion limit
+    seen = {source}
+    stack = [(source, iter(G.adj[source]))]
+    while stack:
+        u, nbrs = stack[-1]
+        for v in nbrs:
+            if v not in seen:
+                seen.add(v)
+                yield u, v
+                stack.append((v, iter(G.adj[v])))
+                break
+        else:
+            stack.pop()
 
 
 def procedure2(G, c=1.0):
@@ -186,51 +197,16 @@ def procedure2(G, c=1.0):
         To define zeta: zeta = c * (n*n*n)
         Default is 1.
     """
-    components = connected_components(G)
-    C = 0
+    # The unreachable pairs are the N_c * (N_G - N_c) pairs between each
+    # component and the rest of the graph
+    (C_l, unreachable_pairs), _ = shortest_path_sums_after_removal(G, [])
     N_G = len(G)
     zeta = c * math.pow(N_G, 3)
-    for component in components:
-        component_subgraph = G.nodes_subgraph(from_nodes=list(component))
-        C_l = _get_sum_all_shortest_paths_of_component(component_subgraph)
-        N_c = len(component)
-        C += (C_l + N_c * (N_G - N_c) * zeta)
-
-        del component_subgraph
-
-    return C
-
-
-def _get_sum_all_shortest_paths_of_component(G):
-    # TODO: Using randomized algorithm in http://de.arxiv.org/pdf/1503.08528
-    #       instead of bfs method.
-    def _plain_bfs(G, source):
-        seen = set([source])
-        nextlevel = {source}
-        level = 1
-        sum_paths_of_G = 0
-
-        while nextlevel:
-            thislevel = nextlevel
-            nextlevel = set()
-            for u in thislevel:
-                for v in G.adj[u]:
-                    if v not in seen:
-                        seen.add(v)
-                        nextlevel.add(v)
-                        sum_paths_of_G += level
-            level += 1
-        return sum_paths_of_G
-
-    sum_paths = 0
-    for node in G.nodes:
-        sum_paths += _plain_bfs(G, node)
-
-    return sum_paths
+    return C_l + unreachable_pairs * zeta
 
 
 @only_implemented_for_UnDirected_graph
-def AP_Greedy(G, k, c=1.0, weight='weight'):
+def AP_Greedy(G, k, c=1.0, weight='weight', n_workers=None, backend=None, chunk_size=None):
     """AP greedy method for structural hole spanners detection.
 
     Returns top k nodes as structural hole spanners,
@@ -253,6 +229,16 @@ def AP_Greedy(G, k, c=1.0, weight='weight'):
     weight : String or None, optional (default : 'weight')
         Key for edge weight. None if not concerning about edge weight.
 
+    n_workers : int or None, optional (default : None)
+        Number of workers sharing the shortest path searches of each round.
+        None for serial computing, -1 for one worker per CPU.
+
+    backend : string or None, optional (default : None)
+        One of 'serial', 'process', 'thread', see `easygraph.utils.parallel_map`.
+
+    chunk_size : int or None, optional (default : None)
+        Number of sources per task handed to a worker.
+
     Returns
     -------
     AP_greedy : list
@@ -272,12 +258,15 @@ def AP_Greedy(G, k, c=1.0, weight='weight'):
     .. [1] https://dl.acm.org/profile/81484650642
     """
     v_sns = []
-    G_i = G.copy()
+    # Views hide the chosen and the tested nodes instead of copying the graph
+    G_i = G.without_nodes([])
     N = len(G)
     for i in range(k):
         v_ap, lower_bound = _get_lower_bound_of_ap_nodes(G_i, c)
         upper_bound = _get_upper_bound_of_non_ap_nodes(G_i, v_ap, c)
-        lower_bound = sorted(lower_bound.items(),
+        # Ties are broken by node order, not by the DFS order of the articulation points
+        order = {node: position for position, node in enumerate(G_i)}
+        lower_bound = sorted(sorted(lower_bound.items(), key=lambda x: order[x[0]]),
                              key=lambda x: x[1], reverse=True)
 
         # print(upper_bound)
@@ -286,27 +275,11 @@ def AP_Greedy(G, k, c=1.0, weight='weight'):
             v_i = lower_bound[0][0]
         else:  # If acticulation points not chosen, use common_greedy instead.
             sorted_nodes = sort_nodes_by_degree(G_i, weight)
-            C_max = 0
-
-            for j in range(N-i):
-                G_i_j = G_i.copy()
-                G_i_j.remove_node(sorted_nodes[j])
-                upper_bound = procedure1(G_i_j, c)
-                if upper_bound < C_max:
-                    pass
-                else:
-                    sum_all_shortest_paths = procedure2(G_i_j, c)
-                    if sum_all_shortest_paths >= C_max:
-                        v_i = sorted_nodes[j]
-                        C_max = sum_all_shortest_paths
-                    else:
-                        pass
-                del G_i_j
+            v_i = _node_of_max_procedure2(G_i, sorted_nodes[:N-i], c, n_workers, backend, chunk_size)
 
         v_sns.append(v_i)
-        G_i.remove_node(v_i)
+        G_i = G_i.without_nodes([v_i])
 
-    del G_i
     return v_sns
 
 
@@ -332,29 +305,19 @@ def _get_lower_bound_of_ap_nodes(G, c=1.0):
     N_G = len(G)
     zeta = c * math.pow(N_G, 3)
     components = connected_components(G)
-    for component in components:
-        component_subgraph = G.nodes_subgraph(from_nodes=list(component))
-        articulation_points = list(
-            generator_articulation_points(component_subgraph))
-        N_component = len(component_subgraph)
-        for articulation in articulation_points:
-            component_subgraph_after_remove = component_subgraph.copy()
-            component_subgraph_after_remove.remove_node(articulation)
-
-            lower_bound_value = 0
-            lower_bound_value += sum([(len(temp) * (N_G - len(temp)))
-                                      for temp in components])
-            lower_bound_value += sum([(len(temp) * (N_component - 1 - len(temp)))
-                                      for temp in connected_components(component_subgraph_after_remove)])
-            lower_bound_value += (2*N_component - 2*N_G)
-            lower_bound_value *= zeta
-
-            v_ap.append(articulation)
-            lower_bound[articulation] = lower_bound_value
-
-            del component_subgraph_after_remove
-
-        del component_subgraph
+    pairs_between_components = sum([(len(temp) * (N_G - len(temp)))
+                                    for temp in components])
+    # The parts each articulation point splits its component into, from one DFS
+    for articulation, N_component, parts in _articulation_point_splits(G):
+        lower_bound_value = 0
+        lower_bound_value += pairs_between_components
+        lower_bound_value += sum([(part * (N_component - 1 - part))
+                                  for part in parts])
+        lower_bound_value += (2*N_component - 2*N_G)
+        lower_bound_value *= zeta
+
+        v_ap.append(articulation)
+        lower_bound[articulation] = lower_bound_value
 
     return v_ap, lower_bound
 
@@ -7,9 +7,9 @@ import json
 import os
 import scipy.sparse as sps
 import scipy.linalg as spl
+from easygraph.utils.convert_to_matrix import to_scipy_sparse
 from sklearn import metrics
 from scipy.cluster.vq import kmeans, vq, kmeans2
-from collections import Counter
 eps = 2.220446049250313e-16
 
 
@@ -61,90 +61,87 @@ def avg_entropy(predicted_labels, actual_labels):
     return avg_value
 
 
-def load_adj_matrix(G):
+def label_by_neighbors(AdjMat, labels):
     '''
-    Transfer the graph into sparse matrix.
-    Parameters
-    ----------
-    G : graph
-        An undirected graph.
+    classifify SHS using majority voting.
 
-    Returns
-    -------
-    A : A sparse matrix A
-    '''
-    listE = []
-    for edge in G.edges:
-        listE.append(edge[0]-1)
-        listE.append(edge[1]-1)
-    adj_tuples = np.array(listE).reshape(-1, 2)
-    n = len(np.unique(adj_tuples))
-    vals = np.array([1] * len(G.edges))
-    max_id = max(max(adj_tuples[:, 0]), max(adj_tuples[:, 1])) + 1
-    A = sps.csr_matrix(
-        (vals, (adj_tuples[:, 0], adj_tuples[:, 1])), shape=(max_id, max_id))
-    A = A + A.T
-    return sps.csr_matrix(A)
-
-
-def majority_voting(votes):
-    '''
-    majority voting.
+    Each unlabeled node (label 0) takes the most common label among its
+    labeled neighbors, the smallest label on ties, until all the nodes are
+    labeled. The nodes without labeled neighbors in reach take the most
+    common label of all.
 
     Parameters
     ----------
-    votes : a Ndarray of votes
+    AdjMat : adjacency matrix
+    labels : a Ndarray of labeled communities of the nodes.
 
     Returns
     -------
-    the most common label.
+    labels : a Ndarray of labeled communities of the nodes.
     '''
-    C = Counter(votes)
-    pairs = C.most_common(2)
-    if len(pairs) == 0:
-        return 0
-    if pairs[0][0] > 0:
-        return pairs[0][0]
-    elif len(pairs) > 1:
-        return pairs[1][0]
-    else:
-        return 0
+    assert (AdjMat.shape[0] == len(labels)), "dimensions are not equal"
+    AdjMat = sps.csr_matrix(AdjMat > 0, dtype=np.int64)
+    int_labels = np.asarray(labels, dtype=np.int64)
+    c = int_labels.max(initial=0)
+    while True:
+        idxs = np.flatnonzero(int_labels == 0)
+        if len(idxs) == 0:
+            break
+        # votes[i, l - 1]: the neighbors of the i-th unlabeled node labeled l
+        labeled = np.flatnonzero(int_labels > 0)
+        one_hot = sps.csr_matrix((np.ones(len(labeled), dtype=np.int64),
+                                  (labeled, int_labels[labeled] - 1)), shape=(len(labels), max(c, 1)))
+        votes = (AdjMat[idxs] @ one_hot).toarray()
+        next_labels = np.where(votes.max(axis=1) > 0, votes.argmax(axis=1) + 1, 0)
+        no_neighbors = np.diff(AdjMat.indptr)[idxs] == 0
+        if not next_labels.any():
+            # No unlabeled node has a labeled neighbor left
+            no_neighbors[:] = True
+        if no_neighbors.any():
+            counts = np.bincount(int_labels[labeled], minlength=c + 1)[1:]
+            next_labels[no_neighbors] = counts.argmax() + 1 if counts.any() else 0
+        if not next_labels.any():
+            break
+        int_labels[idxs] = next_labels
+    labels[:] = int_labels
+    return labels
 
 
-def label_by_neighbors(AdjMat, labels):
+def _smallest_eigenvectors(L, q, F, c, eigen_solver):
     '''
-    classifify SHS using majority voting.
+    The eigenvectors of the c smallest eigenvalues of R = L^T * diag(q) * L.
 
     Parameters
     ----------
-    AdjMat : adjacency matrix
-    labels : a Ndarray of labeled communities of the nodes.
+    L : sparse Laplacian matrix.
+    q : the diagonal of Q.
+    F : the eigenvectors of the previous iteration, the starting guess.
+    c : the number of eigenvectors.
+    eigen_solver : 'dense', 'eigsh' or 'lobpcg'.
 
     Returns
     -------
-    labels : a Ndarray of labeled communities of the nodes.
+    F : a Ndarray of the c eigenvectors.
     '''
-    assert (AdjMat.shape[0] == len(labels)), "dimensions are not equal"
-    unlabeled_idx = (labels == 0)
-    num_unlabeled = sum(unlabeled_idx)
-    count = 0
-    while num_unlabeled > 0:
-        idxs = np.array(np.nonzero(unlabeled_idx)[0])
-        next_labels = np.zeros(len(labels))
-        for idx in idxs:
-            neighbors = np.nonzero(AdjMat[idx, :] > 0)[1]
-            if len(neighbors) == 0:
-                next_labels[idx] = majority_voting(labels)
-            else:
-                neighbor_labels = labels[neighbors]
-                next_labels[idx] = majority_voting(neighbor_labels)
-        labels[idxs] = next_labels[idxs]
-        unlabeled_idx = (labels == 0)
-        num_unlabeled = sum(unlabeled_idx)
-    return labels
+    import warnings
+    import scipy.sparse.linalg as spsl
+    R = L.T.dot(sps.diags(q)).dot(L)
+    if eigen_solver == 'dense':
+        W, V = np.linalg.eigh(R.toarray())
+        Wsort = np.argsort(W)  # sort from smallest to largest
+        return V[:, Wsort[0:c]]  # select the smallest eigenvectors
+    if eigen_solver == 'eigsh':
+        # Shift-invert mode around -1, R being positive semi-definite
+        W, V = spsl.eigsh(R.tocsc(), k=c, sigma=-1, which='LM', v0=F.sum(axis=1))
+    else:
+        # The previous eigenvectors are close, a few LOBPCG iterations refine them
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)
+            W, V = spsl.lobpcg(R, F, largest=False, maxiter=100)
+    return V[:, np.argsort(W)]
 
 
-def get_structural_holes_HAM(G, k, c, ground_truth_labels):
+def get_structural_holes_HAM(G, k, c, ground_truth_labels, max_iter=50, eigen_solver=None):
     '''Structural hole spanners detection via HAM method.
 
     Using HAM [1]_ to jointly detect SHS and communities.
@@ -163,6 +160,16 @@ def get_structural_holes_HAM(G, k, c, ground_truth_labels):
     ground_truth_labels : list of lists
         The label of each node's community.
 
+    max_iter : int, optional (default : 50)
+        The number of iterations of Algorithm 1 in [1]_.
+
+    eigen_solver : string or None, optional (default : None)
+        How the smallest eigenvectors are computed at each iteration. 'dense'
+        for a full dense decomposition, O(n^3). 'lobpcg' or 'eigsh' for the
+        sparse solvers of `scipy.sparse.linalg`, which only apply the sparse
+        matrices and, for 'lobpcg', start from the eigenvectors of the previous
+        iteration. If None, 'dense' up to 2000 nodes and 'lobpcg' beyond.
+
     Returns
     -------
     top_k_nodes : list
@@ -190,18 +197,18 @@ def get_structural_holes_HAM(G, k, c, ground_truth_labels):
 
     '''
 
-    G_index, _, node_of_index = G.to_index_node_graph(
-        begin_index=1)
-
-    A_mat = load_adj_matrix(G_index)
-    A = A_mat  # adjacency matrix
+    node_of_index = list(G.nodes)
+    A = to_scipy_sparse(G, weight=None)  # adjacency matrix
     n = A.shape[0]  # the number of nodes
 
     epsilon = 1e-4  # smoothing value: epsilon
-    max_iter = 50  # maximum iteration value
     seeeed = 5433
     np.random.seed(seeeed)
     topk = k
+    if eigen_solver is None:
+        eigen_solver = 'dense' if n <= 2000 or n <= 5 * c else 'lobpcg'
+    if eigen_solver not in ('dense', 'eigsh', 'lobpcg'):
+        raise ValueError("eigen_solver should be 'dense', 'eigsh' or 'lobpcg', got {}.".format(eigen_solver))
 
     # Inv of degree matrix D^-1
     invD = sps.diags((np.array(A.sum(axis=0))[0, :]+eps) ** (-1.0), 0)
@@ -212,21 +219,12 @@ def get_structural_holes_HAM(G, k, c, ground_truth_labels):
 
     # Algorithm 1
     for step in range(max_iter):
-        Q = sps.identity(n).tocsr()
         P = L.dot(F)
-        for i in range(n):
-            Q[i, i] = 0.5 / (spl.norm(P[i, :]) + epsilon)
-
-        R = L.T.dot(Q).dot(L)
-
-        W, V = np.linalg.eigh(R.todense())
-        Wsort = np.argsort(W)  # sort from smallest to largest
-        F = V[:, Wsort[0:c]]  # select the smallest eigenvectors
+        q = 0.5 / (np.linalg.norm(P, axis=1) + epsilon)  # the diagonal of Q
+        F = _smallest_eigenvectors(L, q, F, c, eigen_solver)
 
     # find SH spanner
-    SH = np.zeros((n,))
-    for i in range(n):
-        SH[i] = np.linalg.norm(F[i, :])
+    SH = np.linalg.norm(F, axis=1)
     SHrank = np.argsort(SH)  # index of SH
 
     # METRICS BEGIN
@@ -267,17 +265,17 @@ def get_structural_holes_HAM(G, k, c, ground_truth_labels):
 
     SH_score = dict()
     for index, rank in enumerate(SHrank):
-        SH_score[node_of_index[index+1]] = int(rank)
+        SH_score[node_of_index[index]] = int(rank)
 
     cmnt_labels = dict()
     for index, label in enumerate(HAM_predLabels):
-        cmnt_labels[node_of_index[index+1]] = int(label)
+        cmnt_labels[node_of_index[index]] = int(label)
 
     # top-k SHS
     top_k_ind = np.argpartition(SHrank, -k)[-k:]
     top_k_ind = top_k_ind[np.argsort(SHrank[top_k_ind])[::-1][:k]]
     top_k_nodes = []
     for ind in top_k_ind:
-        top_k_nodes.append(node_of_index[ind+1])
+        top_k_nodes.append(node_of_index[ind])
 
     return top_k_nodes, SH_score, cmnt_labels
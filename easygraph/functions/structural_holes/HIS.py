@@ -1,12 +1,14 @@
 from itertools import combinations
 import math
 
+import numpy as np
+
 __all__ = [
     "get_structural_holes_HIS"
 ]
 
 
-def get_structural_holes_HIS(G, C: [frozenset], epsilon=1e-4, weight='weight'):
+def get_structural_holes_HIS(G, C: [frozenset], epsilon=1e-4, weight='weight', max_subset_size=None):
     """Structural hole spanners detection via HIS method.
 
     Both **HIS** and **MaxD** are methods in [1]_. 
@@ -28,6 +30,11 @@ def get_structural_holes_HIS(G, C: [frozenset], epsilon=1e-4, weight='weight'):
     weight : string, optional (default : 'weight')
         The key for edge weight.
 
+    max_subset_size : int or None, optional (default : None)
+        The largest community subsets in `S`. There are 2^|C| subsets in all,
+        a small size, e.g. 2 or 3, keeps many communities tractable. If None,
+        all the subsets of at least 2 communities.
+
     Returns
     -------
     S : list of tuple
@@ -58,90 +65,91 @@ def get_structural_holes_HIS(G, C: [frozenset], epsilon=1e-4, weight='weight'):
     .. [1] https://www.aminer.cn/structural-hole
 
     """
+    from easygraph.classes import CSRGraph
+    if max_subset_size is None:
+        max_subset_size = len(C)
+    if len(C) < 2 or max_subset_size < 2:
+        raise ValueError("HIS needs at least 2 communities, and max_subset_size should be at least 2.")
     # S: list[subset_index]
     S = []
-    for community_subset_size in range(2, len(C) + 1):
+    for community_subset_size in range(2, min(len(C), max_subset_size) + 1):
         S.extend(list(combinations(range(len(C)), community_subset_size)))
-    # I: dict[node][cmnt_index]
-    # H: dict[node][subset_index]
+    G_csr = CSRGraph.from_graph(G, weight=None)
+    # I: array[node_index, cmnt_index]
+    # H: array[node_index, subset_index]
     I, H = initialize(G, C, S, weight=weight)
 
-    alphas = [0.3 for i in range(len(C))]  # list[cmnt_index]
-    betas = [(0.5 - math.pow(0.5, len(subset)))
-             for subset in S]  # list[subset_index]
+    alphas = np.full(len(C), 0.3)  # array[cmnt_index]
+    betas = np.array([(0.5 - math.pow(0.5, len(subset)))
+                      for subset in S])  # array[subset_index]
 
     while True:
-        P = update_P(G, C, alphas, betas, S, I, H)  # dict[node][cmnt_index]
-        I_new, H_new = update_I_H(G, C, S, P, I)
-        if is_convergence(G, C, I, I_new, epsilon):
+        P = update_P(C, alphas, betas, S, I, H)  # array[node_index, cmnt_index]
+        I_new, H_new = update_I_H(G_csr, S, P, I)
+        if is_convergence(I, I_new, epsilon):
             break
         else:
             I, H = I_new, H_new
+    nodes = G_csr.node_of_index
+    I = {node: dict(enumerate(row)) for node, row in zip(nodes, I.tolist())}
+    H = {node: dict(enumerate(row)) for node, row in zip(nodes, H.tolist())}
     return S, I, H
 
 
 def initialize(G, C: [frozenset], S: [tuple], weight='weight'):
-    I, H = dict(), dict()
-    for node in G.nodes:
-        I[node] = dict()
-        H[node] = dict()
-
-    for node in G.nodes:
-        for index, community in enumerate(C):
-            if node in community:
-                # TODO: add PageRank or HITS to initialize I
-                I[node][index] = G.degree(weight=weight)[node]
-            else:
-                I[node][index] = 0
-
-    for node in G.nodes:
-        for index, subset in enumerate(S):
-            H[node][index] = min([I[node][i] for i in subset])
-
+    nodes = list(G.nodes)
+    index_of_node = {node: i for i, node in enumerate(nodes)}
+    degree = G.degree(weight=weight)
+    I = np.zeros((len(nodes), len(C)))
+    for index, community in enumerate(C):
+        members = [index_of_node[node] for node in community if node in index_of_node]
+        # TODO: add PageRank or HITS to initialize I
+        I[members, index] = [degree[nodes[i]] for i in members]
+    H = _subset_min(I, S)
     return I, H
 
 
-def update_P(G, C, alphas, betas, S, I, H):
-    P = dict()
-    for node in G.nodes:
-        P[node] = dict()
-
-    for node in G.nodes:
-        for cmnt_index in range(len(C)):
-            subsets_including_current_cmnt = []
-            for subset_index in range(len(S)):
-                if cmnt_index in S[subset_index]:
-                    subsets_including_current_cmnt.append(
-                        alphas[cmnt_index] * I[node][cmnt_index] +
-                        betas[subset_index] * H[node][subset_index]
-                    )
-            P[node][cmnt_index] = max(subsets_including_current_cmnt)
-    return P
-
-
-def update_I_H(G, C, S, P, I):
-    I_new, H_new = dict(), dict()
-    for node in G.nodes:
-        I_new[node] = dict()
-        H_new[node] = dict()
-
-    for node in G.nodes:
-        for cmnt_index in range(len(C)):
-            P_max = max([
-                P[neighbour][cmnt_index]
-                for neighbour in G.adj[node]
-            ])
-            I_new[node][cmnt_index] = P_max if (
-                P_max > I[node][cmnt_index]) else I[node][cmnt_index]
-        for subset_index, subset in enumerate(S):
-            H_new[node][subset_index] = min([I_new[node][i] for i in subset])
+def _subset_min(I, S):
+    """Returns the least value of I over the communities of each subset."""
+    H = np.empty((len(I), len(S)))
+    begin = 0
+    # The subsets of one size at a time, as an array of their communities
+    while begin < len(S):
+        end = begin
+        while end < len(S) and len(S[end]) == len(S[begin]):
+            end += 1
+        subsets = np.array(S[begin:end], dtype=np.int64)
+        block = I[:, subsets[:, 0]]
+        for j in range(1, subsets.shape[1]):
+            np.minimum(block, I[:, subsets[:, j]], out=block)
+        H[:, begin:end] = block
+        begin = end
+    return H
+
+
+def update_P(C, alphas, betas, S, I, H):
+    # For each community, the subsets including it
+    pairs = sorted((cmnt_index, subset_index) for subset_index, subset in enumerate(S)
+                   for cmnt_index in subset)
+    cmnts = np.array([cmnt_index for cmnt_index, _ in pairs], dtype=np.int64)
+    subsets = np.array([subset_index for _, subset_index in pairs], dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, cmnts[1:] != cmnts[:-1]])
+    weighted_H = np.ascontiguousarray((H * betas).T)
+    best = np.maximum.reduceat(weighted_H[subsets], starts, axis=0)
+    return alphas * I + best.T
+
+
+def update_I_H(G_csr, S, P, I):
+    indptr, indices = G_csr.indptr, G_csr.indices
+    I_new = I.copy()
+    # The greatest P among the neighbors of each node having some
+    has_neighbors = np.flatnonzero(np.diff(indptr) > 0)
+    if len(has_neighbors):
+        P_max = np.maximum.reduceat(P[indices], indptr[has_neighbors], axis=0)
+        I_new[has_neighbors] = np.maximum(P_max, I[has_neighbors])
+    H_new = _subset_min(I_new, S)
     return I_new, H_new
 
 
-def is_convergence(G, C, I, I_new, epsilon):
-    deltas = []
-    for node in G.nodes:
-        for cmnt_index in range(len(C)):
-            deltas.append(
-                abs(I[node][cmnt_index] - I_new[node][cmnt_index]))
-    return max(deltas) < epsilon
+def is_convergence(I, I_new, epsilon):
+    return np.abs(I - I_new).max(initial=0) < epsilon
@@ -1,4 +1,10 @@
-import easygraph as eg 
+import heapq
+
+import numpy as np
+
+from easygraph.classes import CSRGraph
+from easygraph.functions.components.biconnected import _articulation_point_splits
+from easygraph.functions.path.bfs import _gather_rows
 
 __all__ = [
     "ICC",
@@ -6,71 +12,151 @@ __all__ = [
     "AP_BICC"
 ]
 
-def inverse_closeness_centrality(G,v):
-    c_v=sum(eg.Dijkstra(G,v).values())/(len(G)-1)
-    return c_v
-
-def bounded_inverse_closeness_centrality(G,v,l):
-    queue=[]
-    queue.append(v)
-    seen=set()
-    seen.add(v)
-    shortest_path=eg.Floyd(G)
-    result=0
-    while (len(queue)>0):
-        vertex=queue.pop(0)
-        if shortest_path[v][vertex]==l+1:
+
+def _adjacency(G_csr):
+    """Returns the 0/1 adjacency matrix of the snapshot, without self-loops."""
+    import scipy.sparse as sps
+    n = len(G_csr)
+    tails, heads = G_csr.tails(), G_csr.indices
+    kept = tails != heads
+    return sps.csr_matrix((np.ones(int(kept.sum())), (tails[kept], heads[kept])), shape=(n, n))
+
+
+def _level_bounds(A, depth):
+    """Returns upper bounds of the number of nodes at distance 1, ..., depth from each node.
+
+    A node at distance r from v is at distance r-1 from a neighbor of v, so the
+    bounds of a level are the sums of the bounds of the previous level over the
+    neighbors. The first level is exact. The bounds are capped by the size of
+    the (weakly) connected component minus one, which is returned too.
+    """
+    from scipy.sparse.csgraph import connected_components
+    _, component = connected_components(A, directed=True, connection='weak')
+    others = np.bincount(component)[component] - 1
+    levels = [np.diff(A.indptr)]
+    for r in range(1, depth):
+        levels.append(np.minimum(A.dot(levels[-1]).astype(np.int64), others))
+    return levels, others
+
+
+def _icc_lower_bounds(A, directed, depth=3):
+    """Lower bounds of the sum of the distances from each node to the nodes it reaches.
+
+    All the nodes of the component are reached, and as many as possible at the
+    smallest distances. For directed graph, only the neighbors are sure to be reached.
+    """
+    levels, others = _level_bounds(A, depth)
+    bound = levels[0].copy()
+    if directed:
+        return bound
+    left = others - levels[0]
+    for r in range(2, depth + 1):
+        count = np.minimum(levels[r - 1], left)
+        bound += r * count
+        left -= count
+    return bound + (depth + 1) * left
+
+
+def _bicc_upper_bounds(A, l):
+    """Upper bounds of the sum of the distances from each node to the nodes within distance l+1.
+
+    As many nodes as possible at the largest distances.
+    """
+    levels, others = _level_bounds(A, l + 1)
+    bound = levels[0].copy()
+    left = others - levels[0]
+    for r in range(l + 1, 1, -1):
+        count = np.minimum(levels[r - 1], left)
+        bound += r * count
+        left -= count
+    return bound
+
+
+def _distance_sums(A, sources, batch_size=64):
+    """Returns the sum of the distances from each source to the nodes it reaches."""
+    from scipy.sparse.csgraph import dijkstra
+    sums = []
+    for begin in range(0, len(sources), batch_size):
+        dist = dijkstra(A, directed=True, unweighted=True, indices=sources[begin:begin + batch_size])
+        dist[~np.isfinite(dist)] = 0
+        sums.extend(np.rint(dist.sum(axis=1)).astype(np.int64).tolist())
+    return sums
+
+
+def _bounded_distance_sum(indptr, indices, source, l, level):
+    """Returns the sum of the distances from *source* to the nodes within distance l+1.
+
+    A BFS stopped at depth l+1. *level* is a scratch array of -1, only the
+    entries of the visited nodes are set and restored, so that a search costs
+    the size of the ball, not of the graph.
+    """
+    frontier = np.array([source], dtype=np.int64)
+    level[source] = 0
+    visited = [frontier]
+    total = 0
+    for depth in range(1, l + 2):
+        _, positions = _gather_rows(indptr, frontier)
+        nodes = indices[positions]
+        nodes = np.unique(nodes[level[nodes] < 0])
+        if len(nodes) == 0:
+            break
+        level[nodes] = depth
+        total += depth * len(nodes)
+        visited.append(nodes)
+        frontier = nodes
+    for nodes in visited:
+        level[nodes] = -1
+    return total
+
+
+def _smallest_icc(A, candidates, k, lower_bounds=None, batch_size=64):
+    """Returns the k candidates of least inverse closeness centrality, ties to the smaller index.
+
+    With *lower_bounds*, the candidates are searched in increasing bound order,
+    and the search stops as soon as no bound can beat the k-th best.
+    """
+    candidates = np.asarray(candidates, dtype=np.int64)
+    if lower_bounds is not None:
+        candidates = candidates[np.lexsort((candidates, lower_bounds[candidates]))]
+    # Max-heap of the k best (sum, index) so far
+    best = []
+    for begin in range(0, len(candidates), batch_size):
+        batch = candidates[begin:begin + batch_size]
+        if lower_bounds is not None and len(best) == k:
+            v = int(batch[0])
+            if (int(lower_bounds[v]), v) >= (-best[0][0], -best[0][1]):
+                break
+        for v, total in zip(batch.tolist(), _distance_sums(A, batch, batch_size)):
+            key = (-total, -v)
+            if len(best) < k:
+                heapq.heappush(best, key)
+            elif key > best[0]:
+                heapq.heapreplace(best, key)
+    return [-v for _, v in sorted(best, reverse=True)]
+
+
+def _largest_bicc(G_csr, A, candidates, K, l):
+    """Returns the K candidates of largest bounded inverse closeness centrality, ties to the smaller index.
+
+    Lazy greedy: the candidates are searched in decreasing upper bound order,
+    until no bound can beat the K-th best.
+    """
+    candidates = np.asarray(candidates, dtype=np.int64)
+    upper_bounds = _bicc_upper_bounds(A, l)
+    candidates = candidates[np.lexsort((candidates, -upper_bounds[candidates]))]
+    level = np.full(len(G_csr), -1, dtype=np.int64)
+    # Min-heap of the K best (sum, -index) so far
+    best = []
+    for v in candidates.tolist():
+        if len(best) == K and (int(upper_bounds[v]), -v) <= best[0]:
             break
-        nodes=G.neighbors(node=vertex)
-        for w in nodes:
-            if w not in seen:
-                queue.append(w)
-                seen.add(w)
-                result+=shortest_path[v][w]
-    return result/(len(G)-1)      
-
-def Modified_DFS(G,u,V):
-    V[u]['color']='black'
-    V[u]['time']+=1
-    V[u]['discovered']=V[u]['time']
-    V[u]['lowest']=V[u]['time']
-    n=len(G)
-    cc0=n
-    V[u]['descendant']=0
-    root=u
-    for edge in G.edges:
-        u, v = edge[:2]
-        if V[u]['color']=='white':
-            V[u]['color']='grey'
-            V[v]['parent']=u
-            V[u]['child']+=1
-            V=Modified_DFS(G,v,V)
-            V[u]['descendant']=V[u]['descendant']+V[v]['descendant']
-            V[u]['lowest']=min(V[u]['lowest'],V[v]['lowest'])
-            if V[v]['lowest']>=V[u]['discovered'] or root==u and V[u]['child']>1:
-                V[u]['c']+=V[v]['descendant']*(n-V[v]['descendant']-1)
-                cc0-=V[v]['descendant']
-        elif v!=V[u]['parent']:
-            V[u]['lowest']=min(V[u]['lowest'],V[v]['discovered'])
-    V[u]['c']+=cc0*(n-cc0-1)
-    return V
-
-def approximate_inverse_closeness_centrality(G):
-    V={}
-    for i in G.nodes:
-        V[i]={}
-        V[i]['child']=0
-        V[i]['color']='white'
-        V[i]['c']=0
-        V[i]['time']=0
-        V[i]['parent']=None
-        V[i]['discovered']=0
-        V[i]['lowest']=0
-        V[i]['descendant']=0 
-    for u in G.nodes:
-        if V[u]['color']=='white':
-            V=Modified_DFS(G,u,V)
-    return V
+        key = (_bounded_distance_sum(A.indptr, A.indices, v, l, level), -v)
+        if len(best) < K:
+            heapq.heappush(best, key)
+        elif key > best[0]:
+            heapq.heapreplace(best, key)
+    return [-v for _, v in sorted(best, reverse=True)]
+
 
 def ICC(G,k):
     """an efficient algorithm for structural hole spanners detection.
@@ -78,6 +164,11 @@ def ICC(G,k):
     Returns top k nodes as structural hole spanners,
     Algorithm 1 of [1]_
 
+    The inverse closeness centrality of a node is the sum of the distances to
+    the nodes it reaches. The nodes are searched in increasing order of a lower
+    bound of it, and the search stops as soon as no bound can beat the k-th
+    least value found.
+
     Parameters
     ----------
     G : easygraph.Graph
@@ -89,8 +180,9 @@ def ICC(G,k):
     Returns
     -------
     V : list
-        The list of top-k structural hole spanners.
-    
+        The list of top-k structural hole spanners, of least inverse closeness
+        centrality first.
+
     Examples
     --------
     Returns the top k nodes as structural hole spanners, using **ICC**.
@@ -100,27 +192,14 @@ def ICC(G,k):
     References
     ----------
     .. [1] https://dl.acm.org/doi/10.1145/2806416.2806431
-    
+
     """
-    Q=[]
-    V=[]
-    for v in G.nodes:
-        i_c=inverse_closeness_centrality(G,v)
-        if len(Q)<k:
-            Q.append([v,i_c])
-            continue
-        MAX=0
-        t=v
-        for i in Q:  
-            if MAX<i[1]:
-                MAX=i[1]
-                t=i[0]
-        if i_c<MAX:
-            Q.remove([t,MAX])
-            Q.append([v,i_c])
-    for i in Q:
-        V.append(i[0])
-    return V
+    G_csr = CSRGraph.from_graph(G, weight=None)
+    A = _adjacency(G_csr)
+    lower_bounds = _icc_lower_bounds(A, G_csr.is_directed())
+    V = _smallest_icc(A, np.arange(len(G_csr)), k, lower_bounds)
+    return [G_csr.node_of_index[v] for v in V]
+
 
 def BICC(G,k,K,l):
     """an efficient algorithm for structural hole spanners detection.
@@ -128,6 +207,12 @@ def BICC(G,k,K,l):
     Returns top k nodes as structural hole spanners,
     Algorithm 2 of [1]_
 
+    The K candidates of largest bounded inverse closeness centrality, the sum
+    of the distances to the nodes within distance l+1, are found by BFS of
+    depth l+1, only from the nodes whose upper bound of it can beat the K-th
+    largest value found. The top-k are the candidates of least inverse
+    closeness centrality.
+
     Parameters
     ----------
     G : easygraph.Graph
@@ -139,14 +224,15 @@ def BICC(G,k,K,l):
     K : int
         the number of candidates K for the top-k hole spanners
 
-    l : int 
+    l : int
         level-l neighbors of nodes
 
     Returns
     -------
     V : list
-        The list of top-k structural hole spanners.
-    
+        The list of top-k structural hole spanners, of least inverse closeness
+        centrality first.
+
     Examples
     --------
     Returns the top k nodes as structural hole spanners, using **BICC**.
@@ -156,43 +242,14 @@ def BICC(G,k,K,l):
     References
     ----------
     .. [1] https://dl.acm.org/doi/10.1145/2806416.2806431
-    
+
     """
-    H=[]
-    V=[]
-    for v in G.nodes:
-        b_i_c=bounded_inverse_closeness_centrality(G,v,l)
-        if len(H)<K:
-            H.append([v,b_i_c])
-            continue
-        MIN=10000000
-        t=v
-        for i in H:
-            if MIN>i[1]:
-                MIN=i[1]
-                t=i[0]
-        if b_i_c>MIN:
-            H.remove([t,MIN])
-            H.append([v,b_i_c])
-    for i in H:
-        v=i[0]
-        i_c=inverse_closeness_centrality(G,v)
-        if len(V)<k:
-            V.append([v,i_c])
-            continue
-        MAX=0
-        t=v
-        for i in V:
-            if MAX<i[1]:
-                MAX=i[1]
-                t=i[0]
-        if i_c<MAX:
-            V.remove([t,MAX])
-            V.append([v,i_c])
-    VS=[]
-    for i in V:
-        VS.append(i[0])
-    return VS
+    G_csr = CSRGraph.from_graph(G, weight=None)
+    A = _adjacency(G_csr)
+    H = _largest_bicc(G_csr, A, np.arange(len(G_csr)), K, l)
+    V = _smallest_icc(A, H, k)
+    return [G_csr.node_of_index[v] for v in V]
+
 
 def AP_BICC(G,k,K,l):
     """an efficient algorithm for structural hole spanners detection.
@@ -200,6 +257,11 @@ def AP_BICC(G,k,K,l):
     Returns top k nodes as structural hole spanners,
     Algorithm 3 of [1]_
 
+    The articulation points come first, by decreasing number of node pairs
+    their removal disconnects, all found in one iterative DFS. If there are
+    fewer than k of them, the others are picked by **BICC** among the rest of
+    the nodes.
+
     Parameters
     ----------
     G : easygraph.Graph
@@ -211,14 +273,14 @@ def AP_BICC(G,k,K,l):
     K : int
         the number of candidates K for the top-k hole spanners
 
-    l : int 
+    l : int
         level-l neighbors of nodes
 
     Returns
     -------
     V : list
         The list of top-k structural hole spanners.
-    
+
     Examples
     --------
     Returns the top k nodes as structural hole spanners, using **AP_BICC**.
@@ -228,43 +290,19 @@ def AP_BICC(G,k,K,l):
     References
     ----------
     .. [1] https://dl.acm.org/doi/10.1145/2806416.2806431
-    
+
     """
-    V=[]
-    T=[]
-    A={}
-    A=approximate_inverse_closeness_centrality(G)
-    for v in A:
-        if len(T)<k:
-            T.append([v,A[v]['c']])
-            continue
-        MIN=10000000
-        t=v
-        for i in T:
-            if MIN>i[1]:
-                MIN=i[1]
-                t=i[0]
-        if A[v]['c']>MIN:
-            T.remove([t,MIN])
-            T.append([v,A[v]['c']])
-    if len(T)<k:
-        U={}
-        for i in G.nodes:
-            if i not in A:
-                U.append(i)
-        kk=k-len(T)
-        Q=[]
-        for v in U:
-            b_i_c=bounded_inverse_closeness_centrality(G,v,l)
-            Q.append([v,b_i_c])       
-    while len(T)!=k:
-        MAX=0
-        t=None
-        for i in Q:
-            if MAX<i[1]:
-                MAX=i[1]
-                t=i[0]
-        T.append([t,A[t]['c']])
-    for i in T:
-        V.append(i[0])
-    return V
\ No newline at end of file
+    G_csr = CSRGraph.from_graph(G, weight=None)
+    index_of_node = G_csr.index_of_node
+    # The ordered pairs of the component no longer connected without each articulation point
+    T = []
+    for v, N_component, parts in _articulation_point_splits(G_csr):
+        T.append((-sum(part * (N_component - 1 - part) for part in parts), index_of_node[v]))
+    T = [v for _, v in sorted(T)[:k]]
+    if len(T) < k:
+        A = _adjacency(G_csr)
+        rest = np.ones(len(G_csr), dtype=bool)
+        rest[T] = False
+        H = _largest_bicc(G_csr, A, np.flatnonzero(rest), K, l)
+        T.extend(_smallest_icc(A, H, k - len(T)))
+    return [G_csr.node_of_index[v] for v in T]
@@ -1,3 +1,6 @@
+import numpy as np
+
+from easygraph.functions.flow.network import FlowNetwork
 
 __all__ = [
     "get_structural_holes_MaxD"
@@ -24,6 +27,7 @@ def get_community_kernel(G, C: [frozenset], weight='weight'):
     for i, cc in enumerate(C):
         for each_node in cc:
             area[each_node-1] += 1 << i    # node_id from 1 to n.
+    degree = G.degree(weight=weight)
     kernels = []
     cnt = 0
     for i in range(len(C)):
@@ -33,7 +37,7 @@ def get_community_kernel(G, C: [frozenset], weight='weight'):
         p = []
         for i in range(len(G)):
             if (area[i] & mask) == mask:
-                q.append((G.degree(weight=weight)[i+1], i+1))
+                q.append((degree[i+1], i+1))
         q.sort()
         q.reverse()
         for i in range(max(int(len(q)/100),
@@ -49,12 +53,13 @@ def get_community_kernel(G, C: [frozenset], weight='weight'):
     return kernels
 
 
-def get_structural_holes_MaxD(G, k, C: [frozenset]):
+def get_structural_holes_MaxD(G, k, C: [frozenset], method='dinic', n_workers=None, backend=None,
+                              chunk_size=None):
     """Structural hole spanners detection via MaxD method.
 
-    Both **HIS** and **MaxD** are methods in [1]_. 
-    The authors developed these two methods to find the structural holes spanners, 
-    based on theory of information diffusion. 
+    Both **HIS** and **MaxD** are methods in [1]_.
+    The authors developed these two methods to find the structural holes spanners,
+    based on theory of information diffusion.
 
     Parameters
     ----------
@@ -65,11 +70,29 @@ def get_structural_holes_MaxD(G, k, C: [frozenset]):
     C : list of frozenset
         Each frozenset denotes a community of nodes.
 
+    method : string, optional (default : 'dinic')
+        The maximum flow algorithm, 'dinic' or 'push_relabel', see `easygraph.FlowNetwork.max_flow`.
+
+    n_workers : int or None, optional (default : None)
+        Number of workers evaluating the candidates of a step. None for serial computing, -1 for one worker per CPU.
+
+    backend : string or None, optional (default : None)
+        One of 'serial', 'process', 'thread', see `easygraph.utils.parallel_map`.
+
+    chunk_size : int or None, optional (default : None)
+        Number of candidates per task handed to a worker.
+
     Returns
     -------
     get_structural_holes_MaxD : list
         Top-`k` structural hole spanners
 
+    Notes
+    -----
+    The flow network is built once. Each maximum flow starts from the flow of
+    the previous query with more nodes removed, so only the paths opened by
+    putting back a node are searched.
+
     Examples
     --------
 
@@ -84,8 +107,6 @@ def get_structural_holes_MaxD(G, k, C: [frozenset]):
     .. [1] https://www.aminer.cn/structural-hole
 
     """
-    _init_data()
-    
     G_index, index_of_node, node_of_index = G.to_index_node_graph(
         begin_index=1)
     C_index = []
@@ -96,47 +117,30 @@ def get_structural_holes_MaxD(G, k, C: [frozenset]):
         C_index.append(frozenset(cmnt_index))
 
     kernels = get_community_kernel(G_index, C_index)
-    c = len(kernels)
-    save = []
-    for i in range(len(G_index)):
-        save.append(False)
-
-    build_network(kernels, c, G_index)
+    network, source, sink = build_network(kernels, len(kernels), G_index)
 
     n = len(G_index)
-    sflow = []
-    save = []
-    for i in range(n):
-        save.append(True)
-    q = []
+    layers = (network.n - 2) // n
+    degree = G_index.degree(weight="weight")
+    degree = np.array([degree[i+1] for i in range(n)])
+    save = np.ones(n, dtype=bool)
+    # The flow with all the candidates of the previous step removed, a valid
+    # start for the next step, which only removes one of them
+    prev_flow = None
     ans_list = []
     for step in range(k):
-        q.clear()
-        sflow.clear()
-        for i in range(n):
-            sflow.append(0)
-        max_flow(n, kernels, save)
-        for i in range(n*(c-1)):
-            k_ = head[i]
-            while k_ >= 0:
-                if flow[k_] > 0:
-                    sflow[i % n] += flow[k_]
-                k_ = nex[k_]
-        for i in range(n):
-            if save[i] == False:
-                q.append((-1, i))
-            else:
-                q.append((sflow[i]+G_index.degree(weight="weight")[i+1], i))
-        q.sort()
-        q.reverse()
-        candidates = []
-        for i in range(n):
-            if save[q[i][1]] == True and len(candidates) < k:
-                candidates.append(q[i][1])
-        ret = pick_candidates(n, candidates, kernels, save)
+        blocked = _blocked_of(save, layers)
+        _, flow = network.max_flow(source, sink, blocked=blocked, flow=prev_flow, method=method)
+        sflow = network.out_flow(flow)[:n*layers].reshape(layers, n).sum(axis=0)
+        score = np.where(save, sflow + degree, -1)
+        q = sorted(zip(score.tolist(), range(n)), reverse=True)
+        candidates = [i for _, i in q if save[i]][:k]
+        if not candidates:
+            break
+        ret, prev_flow = pick_candidates(network, source, sink, candidates, save, method,
+                                         n_workers, backend, chunk_size)
+        save[ret[1]] = False
         ans_list.append(ret[1]+1)
-    del sflow
-    del q
 
     for i in range(len(ans_list)):
         ans_list[i] = node_of_index[ans_list[i]]
@@ -144,259 +148,60 @@ def get_structural_holes_MaxD(G, k, C: [frozenset]):
     return ans_list
 
 
-def pick_candidates(n, candidates, kernels, save):
+def pick_candidates(network, source, sink, candidates, save, method='dinic', n_workers=None,
+                    backend=None, chunk_size=None):
     '''
     detect candidates.
     Parameters
     ----------
-    n : #nodes
+    network : The flow network.
+    source : The source of the network.
+    sink : The sink of the network.
     candidates : A list of candidates.
-    kernels : A list of kernels
-    save : A bool list of visited candidates for max_flow.
+    save : A bool array of the nodes not removed yet.
+    method : The maximum flow algorithm.
 
     Returns
     -------
-    A tuple of min_cut, best_candidate of this round.
+    A tuple of min_cut, best_candidate of this round, and the flow with all the candidates removed.
     '''
-    for i in range(len(candidates)):
-        save[candidates[i]] = False
-    old_flow = max_flow(n, kernels, save)
-    global prev_flow
-    prev_flow.clear()
-    for i in range(nedge):
-        prev_flow.append(flow[i])
+    from easygraph.utils.parallel import parallel_map
+    n = len(save)
+    layers = (network.n - 2) // n
+    others = save.copy()
+    others[candidates] = False
+    prev_value, prev_flow = network.max_flow(source, sink, blocked=_blocked_of(others, layers),
+                                             method=method)
+    shared = (network, source, sink, save, prev_flow, method)
+    values = parallel_map(_candidate_flows_parallel, candidates, shared=shared, n_workers=n_workers,
+                          backend=backend, chunk_size=chunk_size)
     mcut = 100000000
     best_key = -1
-    for i in range(len(candidates)):
-        key = candidates[i]
-        for j in range(len(candidates)):
-            save[candidates[j]] = True
-        save[key] = False
-        tp = max_flow(n, kernels, save, prev_flow)
-        if tp < mcut:
-            mcut = tp
+    for key, value in zip(candidates, [value for chunk in values for value in chunk]):
+        if value < mcut:
+            mcut = value
             best_key = key
-    for i in range(len(candidates)):
-        save[candidates[i]] = True
-        save[best_key] = False
-    return (old_flow+mcut, best_key)
-
-
-head = []
-
-point = []
-nex = []
-flow = []
-capa = []
-
-dist = []
-work = []
-dsave = []
-
-src = 0
-dest = 0
-node = 0
-nedge = 0
-prev_flow = []
-oo = 1000000000
-
-def _init_data():
-    global head, point, nex, flow, capa
-    global dist, work, dsave
-    global src, dest, node, nedge, prev_flow, oo
+    return (mcut, best_key), prev_flow
 
-    head = []
 
-    point = []
-    nex = []
-    flow = []
-    capa = []
+def _candidate_flows_parallel(candidates, shared):
+    """Returns the maximum flow with only this candidate removed, for each of the candidates."""
+    network, source, sink, save, prev_flow, method = shared
+    layers = (network.n - 2) // len(save)
+    values = []
+    for key in candidates:
+        # Restoring the other candidates only adds capacity, so prev_flow stays valid
+        removed = save.copy()
+        removed[key] = False
+        value, _ = network.max_flow(source, sink, blocked=_blocked_of(removed, layers),
+                                    flow=prev_flow, method=method)
+        values.append(value)
+    return values
 
-    dist = []
-    work = []
-    dsave = []
 
-    src = 0
-    dest = 0
-    node = 0
-    nedge = 0
-    prev_flow = []
-    oo = 1000000000
-
-
-def dinic_bfs():
-    '''
-    using BFS to find augmenting path.
-
-    Returns
-    -------
-    A bool, whether found a augmenting path or not.
-    '''
-    global dist, dest, src, node
-    dist.clear()
-    for i in range(node):
-        dist.append(-1)
-    dist[src] = 0
-    Q = []
-    Q.append(src)
-    cl = 0
-    while cl < len(Q):
-        k_ = Q[cl]
-        i = head[k_]
-        while i >= 0:
-            if flow[i] < capa[i] and dsave[point[i]] == True and dist[point[i]] < 0:
-                dist[point[i]] = dist[k_]+1
-                Q.append(point[i])
-            i = nex[i]
-        cl += 1
-    return dist[dest] >= 0
-
-
-def dinic_dfs(x, exp):
-    '''
-    using DFS to calc the augmenting path and refresh network.
-    Parameters
-    ----------
-    x : current node.
-    exp : current flow.
-
-    Returns
-    -------
-    current flow.
-    '''
-    if x == dest:
-        return exp
-    res = 0
-    i = work[x]
-    global flow
-    while i >= 0:
-        v = point[i]
-        tmp = 0
-        if flow[i] < capa[i] and dist[v] == dist[x]+1:
-            tmp = dinic_dfs(v, min(exp, capa[i] - flow[i]))
-            if tmp > 0:
-                flow[i] += tmp
-                flow[i ^ 1] -= tmp
-                res += tmp
-                exp -= tmp
-                if exp == 0:
-                    break
-        i = nex[i]
-    return res
-
-
-def dinic_flow():
-    '''
-    Dinic algorithm to calc max_flow.
-
-    Returns
-    -------
-    max_flow.
-    '''
-    result = 0
-    global work
-    while dinic_bfs():
-        work.clear()
-        for i in range(node):
-            work.append(head[i])
-        result += dinic_dfs(src, oo)
-    return result
-
-
-def max_flow(n, kernels, save, prev_flow=None):
-    '''
-    Calculate max_flow.
-    Parameters
-    ----------
-    n : #nodes
-    kernels : A list of kernels.
-    save : A bool list of visited nodes.
-    prev_flow : A list of previous flows.
-
-    Returns
-    -------
-    max_flow
-    '''
-    global dsave, node
-    dsave.clear()
-    for i in range(node):
-        dsave.append(True)
-
-    if prev_flow != None:
-        for i in range(nedge):
-            flow.append(prev_flow[i])
-    else:
-        for i in range(nedge):
-            flow.append(0)
-
-    c = len(kernels)
-    for i in range(n):
-        for k_ in range(c-1):
-            dsave[k_*n+i] = save[i]
-    ret = dinic_flow()
-    return ret
-
-
-def init_MaxD(_node, _src, _dest):
-    '''
-    Initialize a network.
-    Parameters
-    ----------
-    _node : #nodes
-    _src : the source node
-    _dest : the destiny node
-
-    Returns
-    -------
-    void
-    '''
-    global node, src, dest
-    node = _node
-    src = _src
-    dest = _dest
-    global point, capa, flow, nex, head
-    head.clear()
-    for i in range(node):
-        head.append(-1)
-    nedge = 0
-    point.clear()
-    capa.clear()
-    flow.clear()
-    nex.clear()
-
-    return
-
-
-def addedge(u, v, c1, c2):
-    '''
-    Add an edge(u,v) with capacity c1 and inverse capacity c2.
-    Parameters
-    ----------
-    u : node u
-    v : node v
-    c1 : capacity c1
-    c2 : capacity c2
-
-    Returns
-    -------
-    void
-    '''
-    global nedge
-    global point, capa, flow, nex, head
-    point.append(v)
-    capa.append(c1)
-    flow.append(0)
-    nex.append(head[u])
-    head[u] = nedge
-    nedge += 1
-
-    point.append(u)
-    capa.append(c2)
-    flow.append(0)
-    nex.append(head[v])
-    head[v] = nedge
-    nedge += 1
-    return
+def _blocked_of(save, layers):
+    """Returns the mask of the removed nodes over all the layers of the network."""
+    return np.concatenate([np.tile(~save, layers), [False, False]])
 
 
 def build_network(kernels, c, G):
@@ -411,12 +216,15 @@ def build_network(kernels, c, G):
 
     Returns
     -------
-    void
+    A tuple of the network, its source and its sink.
     '''
     n = len(G)
-    init_MaxD(n*(c-1)+2, n*(c-1), n*(c-1)+1)
+    edges = [(u - 1, v - 1) for u, v, _ in G.edges if u != v]
+    us = np.array([u for u, _ in edges], dtype=np.int64)
+    vs = np.array([v for _, v in edges], dtype=np.int64)
 
-    base = 0
+    tails, heads, capacities, reverse_capacities = [], [], [], []
+    layers = []
     for k_iter in range(c):
         S1 = set()
         S2 = set()
@@ -428,16 +236,32 @@ def build_network(kernels, c, G):
                     S2.add(kernels[i][j])
         if len(S1) == 0 or len(S2) == 0:
             continue
-
-        for edges in G.edges:
-            addedge(base + edges[0] - 1, base + edges[1] - 1, 1, 1)
-            addedge(base + edges[1] - 1, base + edges[0] - 1, 1, 1)
-
-        for i in S1:
-            if i not in S2:
-                addedge(src, base + i - 1, n, 0)
-        for i in S2:
-            if i not in S1:
-                addedge(base + i - 1, dest, n, 0)
-        base += n
-    return
+        layers.append((S1, S2))
+
+    # Each layer is a copy of G, joined to the source by the kernel of its
+    # community and to the sink by the kernels of the earlier communities
+    src = n * len(layers)
+    dest = src + 1
+    for layer, (S1, S2) in enumerate(layers):
+        base = layer * n
+        # An edge has capacity 2 each way, the two unit arcs the original network gave each direction
+        tails.append(base + us)
+        heads.append(base + vs)
+        capacities.append(np.full(len(edges), 2))
+        reverse_capacities.append(np.full(len(edges), 2))
+        into = [base + i - 1 for i in S1 if i not in S2]
+        tails.append(np.full(len(into), src))
+        heads.append(np.array(into, dtype=np.int64))
+        capacities.append(np.full(len(into), n))
+        reverse_capacities.append(np.zeros(len(into), dtype=np.int64))
+        out = [base + i - 1 for i in S2 if i not in S1]
+        tails.append(np.array(out, dtype=np.int64))
+        heads.append(np.full(len(out), dest))
+        capacities.append(np.full(len(out), n))
+        reverse_capacities.append(np.zeros(len(out), dtype=np.int64))
+
+    if not layers:
+        return FlowNetwork(2, [], [], np.zeros(0, dtype=np.int64)), 0, 1
+    network = FlowNetwork(dest + 1, np.concatenate(tails), np.concatenate(heads),
+                          np.concatenate(capacities), np.concatenate(reverse_capacities))
+    return network, src, dest
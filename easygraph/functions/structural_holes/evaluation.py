@@ -1,7 +1,19 @@
-import sys
-sys.path.append('../../../')
-import easygraph as eg
-import math
+"""
+Burt's structural hole metrics, computed for all the nodes at once from
+sparse matrices.
+
+With A the weighted adjacency matrix, the mutual weights are M = A + A^T, and
+the normalized mutual weights are P = M divided by its row sums (the `sum`
+norm) or by its row maxima (the `max` norm). The neighbors of a node are the
+nonzero pattern B of its row of M. Then, restricted to the neighborhoods:
+
+- local constraint: L = (P + P @ P)^2, and constraint = row sums of L,
+- effective size = |neighbors| - row sums of P * (B @ P_max).
+
+The products are computed one block of rows at a time, so the memory of the
+two-step products is bounded by the block size.
+"""
+import numpy as np
 
 __all__ = [
     'effective_size',
@@ -10,88 +22,44 @@ __all__ = [
     'hierarchy'
 ]
 
-def mutual_weight(G, u, v, weight=None):
-    try:
-        a_uv = G[u][v].get(weight, 1)
-    except KeyError:
-        a_uv = 0
-    try:
-        a_vu = G[v][u].get(weight, 1)
-    except KeyError:
-        a_vu = 0
-    return a_uv + a_vu
-
-sum_nmw_rec = {}
-max_nmw_rec = {}
-
-def normalized_mutual_weight(G, u, v, norm=sum, weight=None):
-    if norm == sum:
-        try:
-            # res = sum_nmw_rec[(u, v)]
-            # print('yes')
-            return sum_nmw_rec[(u, v)]
-        except KeyError:
-            scale = norm(mutual_weight(G, u, w, weight)
-                    for w in G.all_neighbors(u))
-            nmw = 0 if scale == 0 else mutual_weight(G, u, v, weight) / scale
-            sum_nmw_rec[(u,v)] = nmw
-            return nmw
-    elif norm == max:
-        try:
-            return max_nmw_rec[(u, v)]
-        except KeyError:
-            scale = norm(mutual_weight(G, u, w, weight)
-                    for w in G.all_neighbors(u))
-            nmw = 0 if scale == 0 else mutual_weight(G, u, v, weight) / scale
-            max_nmw_rec[(u,v)] = nmw
-            return nmw
-
-<<<<<<< HEAD
-<<<<<<< HEAD
-=======
-def effective_size_parallel(nodes, G, weight):
-=======
-def effective_size_parallel(nodes, G, weight):
-    import time, os
-    #print('Run task %s (%s)...' % (len(nodes), os.getpid()))
-    start = time.time()
->>>>>>> 17dcc1e... parallel_partial
-    ret = []
-    for node in nodes:
-        neighbors_of_node = set(G.all_neighbors(node))
-        if len(neighbors_of_node) == 0:
-            ret.append([node, float('nan')])
-            continue
-        ret.append([node, sum(redundancy(G, node, u, weight)
-                                for u in neighbors_of_node)])
-<<<<<<< HEAD
-=======
-    end = time.time()
-    #print('Task %s finish %0.2f seconds.' % (len(nodes), (end - start)))
->>>>>>> 17dcc1e... parallel_partial
-    return ret
 
-def split(nodes, n):
-    ret = []
-    length = len(nodes)  # 总长
-    step = int(length / n) + 1  # 每份的长度
-    for i in range(0, length, step):
-        ret.append(nodes[i:i + step])
+def _burt_matrices(G, weight):
+    """Returns the CSR snapshot of G, the matrices P (sum norm), P_max (max norm) and B, and the out degree of each node."""
+    import scipy.sparse as sps
+    from easygraph.classes import CSRGraph
+    from easygraph.utils.convert_to_matrix import to_scipy_sparse
+    G_csr = CSRGraph.from_graph(G, weight=weight)
+    A = to_scipy_sparse(G_csr, weight=weight)
+    M = (A + A.T).tocsr()
+    B = M.copy()
+    B.data[:] = 1
+    row_sum = np.asarray(M.sum(axis=1)).ravel()
+    row_max = np.asarray(M.max(axis=1).todense()).ravel()
+    with np.errstate(divide='ignore'):
+        P = sps.diags(np.where(row_sum != 0, 1 / row_sum, 0)) @ M
+        P_max = sps.diags(np.where(row_max != 0, 1 / row_max, 0)) @ M
+    out_degree = np.diff(G_csr.indptr)
+    return G_csr, P.tocsr(), P_max.tocsr(), B, out_degree
+
+
+def _local_constraint_rows(rows, P, B):
+    """Returns the local constraint of the nodes of *rows* on each of their neighbors, as sparse rows."""
+    P_rows = P[rows]
+    L = P_rows + (P_rows @ P).multiply(B[rows])
+    return L.tocsr().power(2)
+
+
+def effective_size_parallel(rows, shared):
+    P, P_max, B, out_degree = shared
+    B_rows = B[rows]
+    redundancy = np.asarray((B_rows @ P_max).multiply(P[rows]).sum(axis=1)).ravel()
+    ret = np.diff(B_rows.indptr) - redundancy
+    # Effective size is not defined for isolated nodes
+    ret[out_degree[rows] == 0] = float('nan')
     return ret
 
-def redundancy(G, u, v, weight=None):
-    nmw = normalized_mutual_weight
-    r = sum(nmw(G, u, w, weight=weight) * nmw(G, v, w, norm=max, weight=weight)
-            for w in set(G.all_neighbors(u)))
-    return 1 - r
-<<<<<<< HEAD
->>>>>>> 880991f... parallel_almost
-
-def effective_size(G, nodes=None, weight=None, n_workers=None):
-=======
 
-def effective_size(G, nodes=None, weight=None):
->>>>>>> 17dcc1e... parallel_partial
+def effective_size(G, nodes=None, weight=None, n_workers=None, backend=None, chunk_size=None):
     """Burt's metric - Effective Size.
 
     Parameters
@@ -104,6 +72,16 @@ def effective_size(G, nodes=None, weight=None):
     weight : string or None, optional (default : None)
         The key for edge weight. If *None*, `G` will be regarded as unweighted graph.
 
+    n_workers : int or None, optional (default : None)
+        The number of workers calculating. None for serial computing, -1 for one worker per CPU.
+
+    backend : string or None, optional (default : None)
+        One of 'serial', 'process', 'thread', see `easygraph.utils.parallel_map`.
+
+    chunk_size : int or None, optional (default : None)
+        The number of nodes per task handed to a worker. The sparse products of
+        a task only cover its nodes, a smaller size bounds their memory.
+
     Returns
     -------
     effective_size : dict
@@ -119,101 +97,23 @@ def effective_size(G, nodes=None, weight=None):
 
     References
     ----------
-    .. [1] Burt R S. Structural holes: The social structure of competition[M]. 
+    .. [1] Burt R S. Structural holes: The social structure of competition[M].
        Harvard university press, 2009.
 
     """
-    sum_nmw_rec.clear()
-    max_nmw_rec.clear()
-    effective_size = {}
+    from easygraph.utils.parallel import parallel_map
+    G_csr, P, P_max, B, out_degree = _burt_matrices(G, weight)
     if nodes is None:
-        nodes = G
-    # Use Borgatti's simplified formula for unweighted and undirected graphs
-    if not G.is_directed() and weight is None:
-        for v in nodes:
-            # Effective size is not defined for isolated nodes
-            if len(G[v]) == 0:
-                effective_size[v] = float('nan')
-                continue
-            E = G.ego_subgraph(v)
-            if len(E)>1:
-                effective_size[v] = len(E) - 1 - (2 * E.size()) / (len(E) - 1)
-            else:
-                effective_size[v]=0    
-    else:
-<<<<<<< HEAD
-<<<<<<< HEAD
-        for v in nodes:
-            # Effective size is not defined for isolated nodes
-            if len(G[v]) == 0:
-                effective_size[v] = float('nan')
-                continue
-            effective_size[v] = sum(redundancy(G, v, u, weight)
-                                    for u in set(G.all_neighbors(v)))
-=======
-        
-        if n_workers is not None:
-            from multiprocessing import Pool
-            from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
-            from functools import partial
-            import random
-            nodes = list(nodes)
-            random.shuffle(nodes)
-            nodes = split(nodes, 4)
-            local_function = partial(effective_size_parallel, G=G, weight=weight)
-            with Pool(4) as p:
-                ret = p.map(local_function, nodes)
-            res = [x for i in ret for x in i]
-            effective_size = dict(res)
-        else:
-            for v in nodes:
-                # Effective size is not defined for isolated nodes
-                if len(G[v]) == 0:
-                    effective_size[v] = float('nan')
-                    continue
-                effective_size[v] = sum(redundancy(G, v, u, weight)
-                                        for u in set(G.all_neighbors(v)))
->>>>>>> 880991f... parallel_almost
-=======
-        import time
-        start = time.time()
-
-        print("-------pool-----------")
-        from multiprocessing import Pool
-        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
-        from functools import partial
-        import random
-        nodes = list(nodes)
-        random.shuffle(nodes)
-        nodes = split(nodes, 4)
-        local_function = partial(effective_size_parallel, G=G, weight=weight)
-        with Pool(4) as p:
-            ret = p.map(local_function, nodes)
-        res = [x for i in ret for x in i]
-        effective_size = dict(res)
-
-        # print("--------parallel-------")
-        # from joblib import Parallel, delayed
-        # from functools import partial
-        # local_function = partial(effective_size_parallel, G=G, weight=weight)
-        # res = Parallel(n_jobs=4)(delayed(local_function)([v]) for v in nodes)
-        # effective_size = dict(res)
-
-        # print("--------non parallel-------")
-        # for v in nodes:
-        #     # Effective size is not defined for isolated nodes
-        #     if len(G[v]) == 0:
-        #         effective_size[v] = float('nan')
-        #         continue
-        #     effective_size[v] = sum(redundancy(G, v, u, weight)
-        #                             for u in set(G.all_neighbors(v)))
-        
-        end = time.time()
-        print("use: ", end-start)
->>>>>>> 17dcc1e... parallel_partial
+        nodes = G_csr.node_of_index
+    nodes = list(nodes)
+    ret = parallel_map(effective_size_parallel, [G_csr.index_of_node[node] for node in nodes],
+                       shared=(P, P_max, B, out_degree), n_workers=n_workers, backend=backend,
+                       chunk_size=chunk_size)
+    effective_size = dict(zip(nodes, np.concatenate(ret).tolist() if ret else []))
     return effective_size
 
-def efficiency(G, nodes=None, weight=None):
+
+def efficiency(G, nodes=None, weight=None, n_workers=None, backend=None, chunk_size=None):
     """Burt's metric - Efficiency.
 
     Parameters
@@ -226,6 +126,11 @@ def efficiency(G, nodes=None, weight=None):
     weight : string or None, optional (default : None)
         The key for edge weight. If *None*, `G` will be regarded as unweighted graph.
 
+    n_workers : int or None, optional (default : None)
+    backend : string or None, optional (default : None)
+    chunk_size : int or None, optional (default : None)
+        See `effective_size`.
+
     Returns
     -------
     efficiency : dict
@@ -241,43 +146,25 @@ def efficiency(G, nodes=None, weight=None):
 
     References
     ----------
-    .. [1] Burt R S. Structural holes: The social structure of competition[M]. 
+    .. [1] Burt R S. Structural holes: The social structure of competition[M].
        Harvard university press, 2009.
 
     """
-    e_size = effective_size(G=G, nodes=nodes, weight=weight)
+    e_size = effective_size(G=G, nodes=nodes, weight=weight, n_workers=n_workers,
+                            backend=backend, chunk_size=chunk_size)
     degree = G.degree(weight=weight)
     efficiency = {n: v / degree[n] for n, v in e_size.items()}
     return efficiency
 
-<<<<<<< HEAD
-<<<<<<< HEAD
-=======
-def compute_constraint_of_nodes(nodes, G, weight):
-=======
-def compute_constraint_of_nodes(nodes, G, weight):
-    import time, os
-    print('Run task %s (%s)...' % (len(nodes), os.getpid()))
-    start = time.time()
->>>>>>> 17dcc1e... parallel_partial
-    ret = []
-    for node in nodes:
-        neighbors_of_node = set(G.all_neighbors(node))
-        if len(neighbors_of_node) == 0:
-            ret.append([node, float('nan')])
-            continue
-        ret.append([node, sum(local_constraint(G, node, u, weight)
-                                for u in neighbors_of_node)])
-<<<<<<< HEAD
-    return ret
->>>>>>> 880991f... parallel_almost
-=======
-    end = time.time()
-    print('Task %s finish %0.2f seconds.' % (len(nodes), (end - start)))
+
+def compute_constraint_of_nodes(rows, shared):
+    P, B = shared
+    ret = np.asarray(_local_constraint_rows(rows, P, B).sum(axis=1), dtype=float).ravel()
+    ret[np.diff(B[rows].indptr) == 0] = float('nan')
     return ret
->>>>>>> 17dcc1e... parallel_partial
 
-def constraint(G, nodes=None, weight=None, n_workers=None):
+
+def constraint(G, nodes=None, weight=None, n_workers=None, backend=None, chunk_size=None):
     """Burt's metric - Constraint.
 
     Parameters
@@ -290,9 +177,15 @@ def constraint(G, nodes=None, weight=None, n_workers=None):
     weight : string or None, optional (default : None)
         The key for edge weight. If *None*, `G` will be regarded as unweighted graph.
 
-    workers : int or None, optional (default : None)
-        The number of workers calculating (default: None). 
-        None if not using only one worker.
+    n_workers : int or None, optional (default : None)
+        The number of workers calculating. None for serial computing, -1 for one worker per CPU.
+
+    backend : string or None, optional (default : None)
+        One of 'serial', 'process', 'thread', see `easygraph.utils.parallel_map`.
+
+    chunk_size : int or None, optional (default : None)
+        The number of nodes per task handed to a worker. The sparse products of
+        a task only cover its nodes, a smaller size bounds their memory.
 
     Returns
     -------
@@ -310,144 +203,51 @@ def constraint(G, nodes=None, weight=None, n_workers=None):
 
     References
     ----------
-    .. [1] Burt R S. Structural holes: The social structure of competition[M]. 
+    .. [1] Burt R S. Structural holes: The social structure of competition[M].
        Harvard university press, 2009.
 
     """
-    sum_nmw_rec.clear()
-    max_nmw_rec.clear()
-    local_constraint_rec.clear()
+    from easygraph.utils.parallel import parallel_map
+    G_csr, P, _, B, _ = _burt_matrices(G, weight)
     if nodes is None:
-        nodes = G.nodes
-    constraint = {}
-
-    def compute_constraint_of_v(v):
-        neighbors_of_v = set(G.all_neighbors(v))
-        if len(neighbors_of_v) == 0:
-            constraint_of_v = float('nan')
-        else:
-            constraint_of_v = sum(local_constraint(G, v, n, weight)
-                                for n in neighbors_of_v)
-        return v, constraint_of_v
-
-<<<<<<< HEAD
-<<<<<<< HEAD
-=======
-    import time
-    start = time.time()
-
->>>>>>> 17dcc1e... parallel_partial
-    if n_workers is None:
-        print("------noparallel------")
-        constraint_results = []
-        for v in nodes:
-            constraint_results.append(compute_constraint_of_v(v))
-    else:
-<<<<<<< HEAD
-        from joblib import Parallel, delayed
-        constraint_results = Parallel(n_jobs=n_workers)(delayed(compute_constraint_of_v)(v) for v in nodes)
-    for v, constraint_of_v in constraint_results:
-        constraint[v] = constraint_of_v
-=======
-    if n_workers is not None:
-=======
-        print("-------pool-----------")
->>>>>>> 17dcc1e... parallel_partial
-        from multiprocessing import Pool
-        from functools import partial
-        import random
-        local_function = partial(compute_constraint_of_nodes, G=G, weight=weight)
-        nodes = list(nodes)
-        random.shuffle(nodes)
-        nodes = split(nodes, 4)
-        with Pool(4) as p:
-            ret = p.map(local_function, nodes)
-        constraint_results = [x for i in ret for x in i]
-<<<<<<< HEAD
-    else:
-        constraint_results = []
-        for v in nodes:
-            constraint_results.append(compute_constraint_of_v(v))
-
-    constraint = dict(constraint_results)
->>>>>>> 880991f... parallel_almost
-=======
-
-        # print("-------parallel-----------")
-        # from joblib import Parallel, delayed
-        # constraint_results = Parallel(n_jobs=n_workers)(delayed(compute_constraint_of_v)(v) for v in nodes)
-    
-    end = time.time()
-    print("use: ", end - start)
-    constraint = dict(constraint_results)
->>>>>>> 17dcc1e... parallel_partial
+        nodes = G_csr.node_of_index
+    nodes = list(nodes)
+    ret = parallel_map(compute_constraint_of_nodes, [G_csr.index_of_node[node] for node in nodes], shared=(P, B),
+                       n_workers=n_workers, backend=backend, chunk_size=chunk_size)
+    constraint = dict(zip(nodes, np.concatenate(ret).tolist() if ret else []))
     return constraint
 
-local_constraint_rec = {}
-def local_constraint(G, u, v, weight=None):
-    try:
-        return local_constraint_rec[(u, v)]
-    except KeyError:
-        nmw = normalized_mutual_weight
-        direct = nmw(G, u, v, weight=weight)
-        indirect = sum(nmw(G, u, w, weight=weight) * nmw(G, w, v, weight=weight)
-                    for w in set(G.all_neighbors(u)))
-        result = (direct + indirect) ** 2
-        local_constraint_rec[(u, v)] = result
-        return result
-
-<<<<<<< HEAD
-<<<<<<< HEAD
-=======
-def hierarchy_parallel(G, nodes):
-    import time, os
-    print('Run task %s (%s)...' % (len(nodes), os.getpid()))
-    start = time.time()
-    ret = []
-    for v in nodes:
-        E = G.ego_subgraph(v)
-        n=len(E)-1
-        C=0
-        c={}
-        neighbors_of_v = set(G.all_neighbors(v))
-        for w in neighbors_of_v:
-            C+=local_constraint(G,v,w)
-            c[w]=local_constraint(G,v,w)
-        if n > 1:
-            ret.append([v, sum(c[w]/C*n*math.log(c[w]/C*n)/(n*math.log(n)) for w in neighbors_of_v)])
-    end = time.time()
-    print('Task %s finish %0.2f seconds.' % (len(nodes), (end - start)))
-    return ret
-
->>>>>>> 17dcc1e... parallel_partial
-def hierarchy(G,nodes=None,weight=None):
-=======
-def hierarchy_parallel(nodes, G):
-
-    ret = []
-    for v in nodes:
-        E = G.ego_subgraph(v)
-        n=len(E)-1
-        C=0
-        c={}
-        neighbors_of_v = set(G.all_neighbors(v))
-        for w in neighbors_of_v:
-            C+=local_constraint(G,v,w)
-            c[w]=local_constraint(G,v,w)
-        if n > 1:
-            ret.append([v, sum(c[w] / C * n * math.log(c[w] / C * n) / (n * math.log(n)) for w in neighbors_of_v)])
-
-    return ret
 
-def hierarchy(G,nodes=None,weight=None,n_workers=None):
->>>>>>> 880991f... parallel_almost
+def hierarchy_parallel(rows, shared):
+    P, B = shared
+    L = _local_constraint_rows(rows, P, B)
+    rows = np.asarray(rows, dtype=np.int64)
+    # Size of the ego network without the ego
+    B_rows = B[rows].tocoo()
+    n = np.diff(B[rows].indptr) - np.bincount(B_rows.row[B_rows.col == rows[B_rows.row]],
+                                              minlength=len(rows))
+    C = np.asarray(L.sum(axis=1)).ravel()
+    row_of_entry = np.repeat(np.arange(len(rows)), np.diff(L.indptr))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = L.data / C[row_of_entry] * n[row_of_entry]
+        terms = np.where(r > 0, r * np.log(np.where(r > 0, r, 1)), 0)
+        h = np.bincount(row_of_entry, weights=terms, minlength=len(rows)) / (n * np.log(n))
+    kept = n > 1
+    return list(zip(rows[kept].tolist(), h[kept].tolist()))
+
+
+def hierarchy(G, nodes=None, weight=None, n_workers=None, backend=None, chunk_size=None):
     """Returns the hierarchy of nodes in the graph
 
     Parameters
-    ---------- 
+    ----------
     G : graph
     nodes :  dict, optional (default: None)
     weight : dict, optional (default: None)
+    n_workers : int or None, optional (default : None)
+    backend : string or None, optional (default : None)
+    chunk_size : int or None, optional (default : None)
+        See `constraint`.
 
     Returns
     -------
@@ -465,68 +265,11 @@ def hierarchy(G,nodes=None,weight=None,n_workers=None):
     https://m.book118.com/html/2019/0318/5320024122002021.shtm
 
     """
+    from easygraph.utils.parallel import parallel_map
+    G_csr, P, _, B, _ = _burt_matrices(G, weight)
     if nodes is None:
-        nodes = G.nodes
-    hierarchy = {}
-<<<<<<< HEAD
-<<<<<<< HEAD
-    con=constraint(G)
-    for v in G.nodes:
-        E = G.ego_subgraph(v)
-        n=len(E)-1
-        C=0
-        c={}
-        neighbors_of_v = set(G.all_neighbors(v))
-        for w in neighbors_of_v:
-            C+=local_constraint(G,v,w)
-            c[w]=local_constraint(G,v,w)
-        if n>1:
-            hierarchy[v]=sum(c[w]/C*n*math.log(c[w]/C*n)/(n*math.log(n)) for w in neighbors_of_v)
-=======
-
-    if n_workers is not None:
-        from multiprocessing import Pool
-        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
-        from functools import partial
-        import random
-        nodes = list(nodes)
-        random.shuffle(nodes)
-        nodes = split(nodes, 4)
-        local_function = partial(hierarchy_parallel, G=G)
-        with Pool(4) as p:
-            ret = p.map(local_function, nodes)
-        res = [x for i in ret for x in i]
-        hierarchy = dict(res)
-    else:
-        for v in G.nodes:
-            E = G.ego_subgraph(v)
-            n=len(E)-1
-            C=0
-            c={}
-            neighbors_of_v = set(G.all_neighbors(v))
-            for w in neighbors_of_v:
-                C+=local_constraint(G,v,w)
-                c[w]=local_constraint(G,v,w)
-            if n>1:
-                hierarchy[v]=sum(c[w]/C*n*math.log(c[w]/C*n)/(n*math.log(n)) for w in neighbors_of_v)
-
->>>>>>> 880991f... parallel_almost
-=======
-
-    print("-------pool-----------")
-    from multiprocessing import Pool
-    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
-    from functools import partial
-    import random
-    nodes = list(nodes)
-    random.shuffle(nodes)
-    nodes = split(nodes, 4)
-    local_function = partial(hierarchy_parallel, G=G)
-    with Pool(4) as p:
-        ret = p.map(local_function, nodes)
-    res = [x for i in ret for x in i]
-    hierarchy = dict(res)
-
->>>>>>> 17dcc1e... parallel_partial
+        nodes = G_csr.node_of_index
+    ret = parallel_map(hierarchy_parallel, [G_csr.index_of_node[node] for node in nodes], shared=(P, B),
+                       n_workers=n_workers, backend=backend, chunk_size=chunk_size)
+    hierarchy = dict((G_csr.node_of_index[i], h) for chunk in ret for i, h in chunk)
     return hierarchy
-
@@ -1,8 +1,9 @@
 import easygraph as eg
 import math
-import random
 import numpy as np
 
+from easygraph.functions.path.bfs import _gather_rows
+
 
 __all__ = [
     "sum_of_shortest_paths",
@@ -39,27 +40,24 @@ def sum_of_shortest_paths(G, S):
     .. [1] https://dl.acm.org/profile/81484650642
 
     """
-    mat_G = eg.Floyd(G)
-    sum_G = 0
-    inf_const_G=math.ceil((G.number_of_nodes()**3)/3)
-    for i in mat_G.values():
-        for j in i.values():
-            if math.isinf(j):
-                j=inf_const_G
-            sum_G += j
-    G_S = G.copy()
-    G_S.remove_nodes(S)
-    mat_G_S = eg.Floyd(G_S)
-    sum_G_S = 0
-    inf_const_G_S = math.ceil((G_S.number_of_nodes() ** 3) / 3)
-    for i in mat_G_S.values():
-        for j in i.values():
-            if math.isinf(j):
-                j = inf_const_G_S
-            sum_G_S += j
+    # One search per source gives both sums, the sources whose shortest paths
+    # avoid S are not searched again
+    base, (without_S,) = eg.shortest_path_sums_after_removal(G, [S], weight="weight")
+    N_G = G.number_of_nodes()
+    N_G_S = N_G - len(set(node for node in S if node in G))
+    sum_G = _sum_with_unreachable(*base, N_G)
+    sum_G_S = _sum_with_unreachable(*without_S, N_G_S)
     return sum_G_S - sum_G
 
 
+def _sum_with_unreachable(finite_sum, inf_count, n):
+    """An unreachable pair counts as ceil(n^3/3)."""
+    inf_const = math.ceil((n ** 3) / 3)
+    if isinstance(finite_sum, float) and finite_sum.is_integer():
+        finite_sum = int(finite_sum)
+    return finite_sum + inf_count * inf_const
+
+
 def nodes_of_max_cc_without_shs(G, S):
     """Returns the number of nodes in the maximum connected component in graph G\S.
     The experiment metrics in [1]_
@@ -97,17 +95,26 @@ def nodes_of_max_cc_without_shs(G, S):
             max_num = len(cc)
     return max_num
 
-class NodeParams:
-    def __init__(self, active, inWeight, threshold):
-        self.active = active
-        self.inWeight = inWeight
-        self.threshold = threshold
+# The probability that an active node activates a neighbor in the IC model,
+# P(toss + 0.1 >= p_vw) for two uniform draws toss and p_vw.
+_IC_PROBABILITY = 1 - 0.9 ** 2 / 2
+
+# The LT model activates a node when its active in-weight reaches its threshold plus this tolerance.
+_LT_TOLERANCE = 0.00001
+
+# The (cascade, node) cells of one batch of cascades, which bounds the memory of a batch.
+_CELLS_PER_BATCH = 1 << 22
 
 
 def structural_hole_influence_index(G_original, S, C, model, variant=False, seedRatio=0.05, randSeedIter=10,
-                                    countIterations=100, Directed=True):
+                                    countIterations=100, Directed=True, seed=None, n_workers=None, backend=None,
+                                    chunk_size=None):
     """Returns the SHII metric of each seed.
 
+    The cascades are simulated in batches, all the cascades of a batch at once
+    over the CSR adjacency of the graph, with one random draw per tried edge
+    (IC) or per node (LT) and cascade.
+
     Parameters
     ----------
     G_original: easygraph.Graph or easygraph.DiGraph
@@ -138,6 +145,19 @@ def structural_hole_influence_index(G_original, S, C, model, variant=False, seed
     Directed: bool, default is True
         Whether the graph is directed or not.
 
+    seed: int or None, default is None
+        The seed of the random numbers. The same seed gives the same result,
+        whatever the number of workers.
+
+    n_workers : int or None, optional (default : None)
+        The number of workers simulating. None for serial computing, -1 for one worker per CPU.
+
+    backend : string or None, optional (default : None)
+        One of 'serial', 'process', 'thread', see `easygraph.utils.parallel_map`.
+
+    chunk_size : int or None, optional (default : None)
+        The number of batches of cascades per task handed to a worker.
+
     Returns
     -------
     seed_shii_pair : dict
@@ -145,7 +165,7 @@ def structural_hole_influence_index(G_original, S, C, model, variant=False, seed
 
     Examples
     --------
-    # >>> structural_hole_influence_index(G, [3, 20, 9], Com, 'LT', seedRatio=0.1, Directed=False)
+    # >>> structural_hole_influence_index(G, [3, 20, 9], Com, 'LT', seedRatio=0.1, Directed=False, seed=1)
 
     References
     ----------
@@ -153,201 +173,174 @@ def structural_hole_influence_index(G_original, S, C, model, variant=False, seed
     .. [2] https://github.com/LifangHe/KDD16_HAM/tree/master/SHII_metric
 
     """
+    from easygraph.classes import CSRGraph
+    from easygraph.utils.convert_to_matrix import to_scipy_sparse
+    from easygraph.utils.parallel import parallel_sum
+    if model not in ('IC', 'LT'):
+        raise ValueError("model should be 'IC' or 'LT', got {}.".format(model))
+    G_csr = CSRGraph.from_graph(G_original, weight='weight')
+    n = len(G_csr)
+    adjacency = to_scipy_sparse(G_csr, weight='weight')
+    adjacency.data[:] = 1
     if not Directed:
-        G = eg.DiGraph()
-        for edge in G_original.edges:
-            G.add_edge(edge[0], edge[1])
-            G.add_edge(edge[1], edge[0])
-    else:
-        G = G_original.copy()
-    # form pair like {node_1:community_label_1,node_2:community_label_2}
-    node_label_pair = {}
+        adjacency = (adjacency + adjacency.T).tocsr()
+        adjacency.data[:] = 1
+    indptr, indices = adjacency.indptr.astype(np.int64), adjacency.indices.astype(np.int64)
+    # Each active in-neighbor of a node brings 1 / (the number of in-neighbors of the node) in LT,
+    # whatever the edge weights, so that all of them together bring 1
+    in_degree = np.asarray(adjacency.sum(axis=0)).ravel()
+    in_weight = 1 / in_degree[indices]
+    index_of_node = G_csr.index_of_node
+    # form array like community_of_node[node_index] = community_label, -1 for the nodes of no community
+    community_of_node = np.full(n, -1, dtype=np.int64)
     for community_label in range(len(C)):
-        for node_i in range(len(C[community_label])):
-            node_label_pair[C[community_label][node_i]] = community_label
-    # print(node_label_pair)
-    seed_shii_pair = {}
+        for node in C[community_label]:
+            community_of_node[index_of_node[node]] = community_label
+
+    root = np.random.SeedSequence(seed)
+    sample_seed, simulation_seed = root.spawn(2)
+    rng = np.random.default_rng(sample_seed)
+    S = set(S)
+    seed_sets = []
+    seeds_of_spanner = {}
     for community_label in range(len(C)):
-        nodesInCommunity = []
-        seedSetInCommunity = []
-        for node in node_label_pair.keys():
-            if node_label_pair[node] == community_label:
-                nodesInCommunity.append(node)
-                if node in S:
-                    seedSetInCommunity.append(node)
-
+        nodesInCommunity = np.flatnonzero(community_of_node == community_label)
+        seedSetInCommunity = [i for i in nodesInCommunity.tolist() if G_csr.node_of_index[i] in S]
         seedSetSize = int(math.ceil(len(nodesInCommunity) * seedRatio))
 
-        if len(seedSetInCommunity) == 0:
-            continue
-
-        for seed in seedSetInCommunity:
-            print(">>>>>> processing seed ", seed, " now.")
-            oneSeedSet = []
-            if node not in oneSeedSet:
-                oneSeedSet.append(seed)
-            seedNeighborSet = []
-            # using BFS to add neighbors of the SH spanner to the seedNeighborSet as seed candidates
-            queue = []
-            queue.append(seed)
-            while len(queue) > 0:
-                cur_node = queue[0]
-                count_neighbor = 0
-                for neighbor in G.neighbors(node=cur_node):
-                    if neighbor not in seedNeighborSet:
-                        seedNeighborSet.append(neighbor)
-                    count_neighbor = count_neighbor + 1
-                if count_neighbor > 0:
-                    if len(queue) == 1 and len(oneSeedSet) + len(seedNeighborSet) < seedSetSize:
-                        for node in seedNeighborSet:
-                            if node not in oneSeedSet:
-                                oneSeedSet.append(node)
-                            queue.append(node)
-                        seedNeighborSet.clear()
-                queue.pop(0)
-
-            avg_censor_score_1 = 0.0
-            avg_censor_score_2 = 0.0
-
+        for spanner in seedSetInCommunity:
+            print(">>>>>> processing seed ", G_csr.node_of_index[spanner], " now.")
+            oneSeedSet, seedNeighborSet = _seed_neighborhood(indptr, indices, spanner, seedSetSize)
+            seeds_of_spanner[spanner] = []
             for randIter in range(randSeedIter):
-                if randIter % 5 == 0:
-                    print("seed ", seed, ": ", randIter, " in ", randSeedIter)
-                randSeedSet = []
-                for node in oneSeedSet:
-                    randSeedSet.append(node)
-                seedNeighbors = []
-                for node in seedNeighborSet:
-                    seedNeighbors.append(node)
-                while len(seedNeighbors) > 0 and len(randSeedSet) < seedSetSize:
-                    r = random.randint(0, len(seedNeighbors) - 1)
-                    if seedNeighbors[r] not in randSeedSet:
-                        randSeedSet.append(seedNeighbors[r])
-                    seedNeighbors.pop(r)
-
-                if model == 'IC':
-                    censor_score_1, censor_score_2 = _independent_cascade(G, randSeedSet, community_label,
-                                                                          countIterations, node_label_pair)
-                elif model == 'LT':
-                    censor_score_1, censor_score_2 = _linear_threshold(G, randSeedSet, community_label, countIterations,
-                                                                       node_label_pair)
-                avg_censor_score_1 += censor_score_1 / randSeedIter
-                avg_censor_score_2 += censor_score_2 / randSeedIter
-                # print("seed ", seed, " avg_censor_score in ", randIter, "is ", censor_score_1 / randSeedIter)
-            if variant:
-                seed_shii_pair[seed] = avg_censor_score_2
-            else:
-                seed_shii_pair[seed] = avg_censor_score_1
+                randSeedSet = list(oneSeedSet)
+                chosen = set(randSeedSet)
+                for node in rng.permutation(seedNeighborSet).tolist():
+                    if len(randSeedSet) >= seedSetSize:
+                        break
+                    if node not in chosen:
+                        randSeedSet.append(node)
+                        chosen.add(node)
+                seeds_of_spanner[spanner].append(len(seed_sets))
+                seed_sets.append((np.array(randSeedSet, dtype=np.int64), community_label))
+
+    # Each job simulates one batch of cascades from one seed set
+    batch_size = max(1, min(countIterations, _CELLS_PER_BATCH // max(n, 1)))
+    jobs = [(set_index, min(batch_size, countIterations - begin))
+            for set_index in range(len(seed_sets)) for begin in range(0, countIterations, batch_size)]
+    jobs = [(set_index, size, job_seed)
+            for (set_index, size), job_seed in zip(jobs, simulation_seed.spawn(len(jobs)))]
+    censor_scores = parallel_sum(_simulate_parallel, jobs,
+                                 shared=(indptr, indices, in_weight, community_of_node, seed_sets, model),
+                                 n_workers=n_workers, backend=backend, chunk_size=chunk_size)
+
+    seed_shii_pair = {}
+    for spanner, set_indices in seeds_of_spanner.items():
+        avg_censor_score_1, avg_censor_score_2 = censor_scores[set_indices].sum(axis=0) / (
+                countIterations * randSeedIter)
+        if variant:
+            seed_shii_pair[G_csr.node_of_index[spanner]] = float(avg_censor_score_2)
+        else:
+            seed_shii_pair[G_csr.node_of_index[spanner]] = float(avg_censor_score_1)
     return seed_shii_pair
 
 
-def _independent_cascade(G, S, community_label, countIterations, node_label_pair):
-    avg_result_1 = 0
-    avg_result_2 = 0
-    N = G.number_of_nodes()
-    for b in range(countIterations):
-        # print(b, " in ", countIterations)
-        p_vw = np.zeros((N, N))  # 节点被激活时，激活其它节点的概率,a对b的影响等于b对a的影响
-        for random_i in range(N):
-            for random_j in range(random_i + 1, N):
-                num = random.random()
-                p_vw[random_i][random_j] = num
-                p_vw[random_j][random_i] = num
-        Q = []
-        activeNodes = []
-        for v in S:
-            Q.append(v)
-            activeNodes.append(v)
-        while len(Q) > 0:
-            v = Q[0]
-            for neighbor in G.neighbors(node=v):
-                if neighbor not in activeNodes:
-                    toss = random.random() + 0.1
-                    if v <= 0 or neighbor <= 0:
-                        print(v, neighbor)
-                    # if toss>0.5:
-                    #     activeNodes.append(neighbor)
-                    #     Q.append(neighbor)
-                    if toss >= p_vw[v - 1][neighbor - 1]:
-                        activeNodes.append(neighbor)
-                        Q.append(neighbor)
-            Q.pop(0)
-        self_cov = 0
-        total_cov = 0
-        uniqueActiveNodes = []
-        for i in activeNodes:
-            if i not in uniqueActiveNodes:
-                uniqueActiveNodes.append(i)
-        for v in uniqueActiveNodes:
-            total_cov += 1
-            if node_label_pair[v] == community_label:
-                self_cov += 1
-        censor_score_1 = (total_cov - self_cov) / total_cov
-        censor_score_2 = (total_cov - self_cov) / self_cov
-        avg_result_1 += censor_score_1 / countIterations
-        avg_result_2 += censor_score_2 / countIterations
-    return avg_result_1, avg_result_2
-
-
-def _linear_threshold(G, S, community_label, countIterations, node_label_pair):
-    tol = 0.00001
-    avg_result_1 = 0
-    avg_result_2 = 0
-    for b in range(countIterations):
-        activeNodes = []
-        # T is the set of nodes that are to be processed
-        T = []
-        Q = {}
-        for v in S:
-            activeNodes.append(v)
-            for neighbor in G.neighbors(node=v):
-                if neighbor not in S:
-                    weight_degree = 1.0 / float(G.in_degree()[neighbor])
-                    if neighbor not in Q.keys():
-                        np = NodeParams(False, weight_degree, random.random())
-                        Q[neighbor] = np
-                        T.append(neighbor)
-                    else:
-                        Q[neighbor].inWeight += weight_degree
-
-        while len(T) > 0:
-            u = T[0]
-            if Q[u].inWeight >= Q[u].threshold + tol and not Q[u].active:
-                activeNodes.append(u)
-                Q[u].active = True
-                for neighbor in G.neighbors(node=u):
-                    if neighbor in S:
-                        continue
-                    weight_degree = 1.0 / float(G.in_degree()[neighbor])
-                    if neighbor not in Q.keys():
-                        np = NodeParams(False, weight_degree, random.random())
-                        Q[neighbor] = np
-                        T.append(neighbor)
-                    else:
-                        if not Q[neighbor].active:
-                            T.append(neighbor)
-                            Q[neighbor].inWeight += weight_degree
-                            if Q[neighbor].inWeight - 1 > tol:
-                                print("Error: the inweight for a node is > 1.")
-            T.pop(0)
-
-        T.clear()
-        Q.clear()
-
-        self_cov = 0
-        total_cov = 0
-        uniqueActiveNodes = []
-        for i in activeNodes:
-            if i not in uniqueActiveNodes:
-                uniqueActiveNodes.append(i)
-        for v in uniqueActiveNodes:
-            total_cov += 1
-            if node_label_pair[v] == community_label:
-                self_cov += 1
-        censor_score_1 = (total_cov - self_cov) / total_cov  # ==> SHII
-        censor_score_2 = (total_cov - self_cov) / self_cov
-        avg_result_1 += censor_score_1 / countIterations
-        avg_result_2 += censor_score_2 / countIterations
-    return avg_result_1, avg_result_2
+def _seed_neighborhood(indptr, indices, spanner, seedSetSize):
+    """Returns the seeds surely sampled around a SH spanner, and the seed candidates.
+
+    Using BFS to add the whole levels of neighbors of the SH spanner while
+    the seeds stay fewer than seedSetSize. The next level are the candidates.
+    The nodes already seeds are not candidates again, so that the search ends
+    in the components smaller than seedSetSize.
+    """
+    oneSeedSet = [spanner]
+    seen = {spanner}
+    seedNeighborSet = []
+    queue = [spanner]
+    while len(queue) > 0:
+        cur_node = queue[0]
+        neighbors = indices[indptr[cur_node]:indptr[cur_node + 1]].tolist()
+        for neighbor in neighbors:
+            if neighbor not in seen:
+                seen.add(neighbor)
+                seedNeighborSet.append(neighbor)
+        if len(neighbors) > 0:
+            if len(queue) == 1 and len(oneSeedSet) + len(seedNeighborSet) < seedSetSize:
+                oneSeedSet.extend(seedNeighborSet)
+                queue.extend(seedNeighborSet)
+                seedNeighborSet.clear()
+        queue.pop(0)
+    return oneSeedSet, seedNeighborSet
+
+
+def _simulate_parallel(jobs, shared):
+    indptr, indices, in_weight, community_of_node, seed_sets, model = shared
+    # censor_scores[set_index]: the sums of the two censor scores over the cascades
+    censor_scores = np.zeros((len(seed_sets), 2))
+    for set_index, n_cascades, job_seed in jobs:
+        seeds, community_label = seed_sets[set_index]
+        rng = np.random.default_rng(job_seed)
+        if model == 'IC':
+            active = _independent_cascade(indptr, indices, seeds, n_cascades, rng)
+        else:
+            active = _linear_threshold(indptr, indices, in_weight, seeds, n_cascades, rng)
+        total_cov = active.sum(axis=1)
+        self_cov = active[:, community_of_node == community_label].sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            censor_scores[set_index, 0] += ((total_cov - self_cov) / total_cov).sum()
+            censor_scores[set_index, 1] += ((total_cov - self_cov) / self_cov).sum()
+    return censor_scores
+
+
+def _independent_cascade(indptr, indices, S, n_cascades, rng):
+    """Returns the active nodes of n_cascades IC cascades from the seeds S, as a boolean array[cascade, node].
+
+    The frontier of all the cascades is one array of cascade * n + node, each
+    step tries all the out edges of the frontier with one random draw each.
+    """
+    n = len(indptr) - 1
+    active = np.zeros((n_cascades, n), dtype=bool)
+    active[:, S] = True
+    active_flat = active.reshape(-1)
+    frontier = np.flatnonzero(active_flat)
+    while len(frontier) > 0:
+        cascades, nodes = np.divmod(frontier, n)
+        counts = indptr[nodes + 1] - indptr[nodes]
+        _, positions = _gather_rows(indptr, nodes)
+        live = rng.random(len(positions)) < _IC_PROBABILITY
+        reached = np.repeat(cascades, counts)[live] * n + indices[positions[live]]
+        frontier = np.unique(reached[~active_flat[reached]])
+        active_flat[frontier] = True
+    return active
+
+
+def _linear_threshold(indptr, indices, in_weight, S, n_cascades, rng):
+    """Returns the active nodes of n_cascades LT cascades from the seeds S, as a boolean array[cascade, node].
+
+    in_weight[e] is what the tail of the edge e brings to its head. As in
+    `_independent_cascade`, each step pushes the weights of the newly active
+    nodes of all the cascades at once, only the reached nodes are checked.
+    """
+    n = len(indptr) - 1
+    threshold = rng.random(n_cascades * n) + _LT_TOLERANCE
+    active = np.zeros((n_cascades, n), dtype=bool)
+    active[:, S] = True
+    active_flat = active.reshape(-1)
+    inWeight = np.zeros(n_cascades * n)
+    frontier = np.flatnonzero(active_flat)
+    while len(frontier) > 0:
+        cascades, nodes = np.divmod(frontier, n)
+        counts = indptr[nodes + 1] - indptr[nodes]
+        _, positions = _gather_rows(indptr, nodes)
+        reached = np.repeat(cascades, counts) * n + indices[positions]
+        kept = ~active_flat[reached]
+        reached, inverse = np.unique(reached[kept], return_inverse=True)
+        inWeight[reached] += np.bincount(inverse, weights=in_weight[positions[kept]], minlength=len(reached))
+        frontier = reached[inWeight[reached] >= threshold[reached]]
+        active_flat[frontier] = True
+    return active
+
+
 
 if __name__ == '__main__':
     G = eg.datasets.get_graph_karateclub()
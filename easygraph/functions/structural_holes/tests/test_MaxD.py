@@ -0,0 +1,42 @@
+import random
+
+import numpy as np
+
+import easygraph as eg
+from easygraph.functions.structural_holes.MaxD import (_blocked_of, build_network,
+                                                       get_community_kernel, pick_candidates)
+
+
+def _two_communities(n, p_in, p_out, seed):
+    rng = random.Random(seed)
+    G = eg.Graph()
+    G.add_nodes(list(range(n)))
+    for u in range(n):
+        for v in range(u + 1, n):
+            if rng.random() < (p_in if (u < n // 2) == (v < n // 2) else p_out):
+                G.add_edge(u, v)
+    return G, [frozenset(range(n // 2)), frozenset(range(n // 2, n))]
+
+
+def test_pick_candidates_removes_one_candidate_at_a_time():
+    for seed in range(4):
+        G, C = _two_communities(16, 0.5, 0.1, seed)
+        G_index, index_of_node, _ = G.to_index_node_graph(begin_index=1)
+        kernels = get_community_kernel(G_index, [frozenset(index_of_node[u] for u in c) for c in C])
+        network, source, sink = build_network(kernels, len(kernels), G_index)
+        n = len(G_index)
+        layers = (network.n - 2) // n
+        save = np.ones(n, dtype=bool)
+        save[seed] = False
+        candidates = [i for i in range(n) if save[i]][:6]
+
+        (mcut, best_key), _ = pick_candidates(network, source, sink, candidates, save)
+
+        values = []
+        for key in candidates:
+            removed = save.copy()
+            removed[key] = False
+            value, _ = network.max_flow(source, sink, blocked=_blocked_of(removed, layers))
+            values.append(value)
+        assert mcut == min(values)
+        assert best_key == candidates[values.index(min(values))]
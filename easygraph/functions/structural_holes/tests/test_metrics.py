@@ -0,0 +1,28 @@
+import random
+
+import easygraph as eg
+
+
+def _random_digraph(n, m, seed, weighted):
+    rng = random.Random(seed)
+    G = eg.DiGraph()
+    G.add_nodes(list(range(n)))
+    for _ in range(m):
+        u, v, w = rng.randrange(n), rng.randrange(n), rng.choice([0.2, 0.5, 3.0])
+        if u != v:
+            if weighted:
+                G.add_edge(u, v, weight=w)
+            else:
+                G.add_edge(u, v)
+    return G
+
+
+def test_SHII_LT_ignores_the_weights_of_a_digraph():
+    # LT gives each in-neighbor 1 / (the number of in-neighbors), as on the unweighted graph
+    C = [frozenset(range(15)), frozenset(range(15, 30))]
+    S = [0, 3, 17, 22]
+    weighted = _random_digraph(30, 120, seed=2, weighted=True)
+    unweighted = _random_digraph(30, 120, seed=2, weighted=False)
+    kwargs = dict(seedRatio=0.2, randSeedIter=2, countIterations=20, Directed=True, seed=1)
+    assert (eg.structural_hole_influence_index(weighted, S, C, 'LT', **kwargs) ==
+            eg.structural_hole_influence_index(unweighted, S, C, 'LT', **kwargs))
@@ -0,0 +1 @@
+from easygraph.readwrite.binary import *
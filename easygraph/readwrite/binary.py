@@ -0,0 +1,312 @@
+"""
+A compact binary file format for graphs.
+
+A file holds the CSR arrays of the adjacency (see `easygraph.CSRGraph`), the node
+labels, and the edge attributes as one column per attribute key. Every array is
+stored raw at an aligned offset, so that it can be memory-mapped: loading a
+snapshot then only reads the header, and the worker processes reading the same
+file share one physical copy of it.
+
+Layout::
+
+    magic (8 bytes) | header length (uint64) | JSON header | padding | arrays ...
+
+The header records the dtype, shape and offset of each array. Values that are
+not numbers, i.e. labels that are neither all integers nor all strings, the
+node and graph attributes and the non-numeric edge attributes, are pickled
+into byte arrays.
+"""
+import json
+import pickle
+
+import numpy as np
+
+from easygraph.classes import CSRGraph, DiGraph, Graph
+
+__all__ = [
+    "save",
+    "load",
+]
+
+MAGIC = b'\x93EGRAPH\x00'
+FORMAT_VERSION = 1
+_ALIGNMENT = 64
+# Marks the edges without some attribute in a column
+_MISSING = object()
+
+
+def save(G, path):
+    """Writes a graph to a binary file.
+
+    Parameters
+    ----------
+    G : easygraph.Graph, easygraph.DiGraph or easygraph.CSRGraph
+
+    path : string
+        The file path, conventionally ending with `.egb`.
+
+    See Also
+    --------
+    load
+
+    Examples
+    --------
+    >>> eg.save(G, 'youtube.egb')
+    >>> G_csr = eg.load('youtube.egb', frozen=True)
+
+    """
+    nodes = list(G.nodes)
+    arrays = {}
+    header = {
+        'format_version': FORMAT_VERSION,
+        'frozen': isinstance(G, CSRGraph),
+        'directed': G.is_directed(),
+    }
+
+    if isinstance(G, CSRGraph):
+        arrays['indptr'], arrays['indices'] = G.indptr, G.indices
+        columns = {G.weight: G.weights} if G.weight is not None else {}
+        header['weight'] = G.weight
+    else:
+        snapshot = CSRGraph.from_graph(G, weight=None)
+        arrays['indptr'], arrays['indices'] = snapshot.indptr, snapshot.indices
+        adj = G.adj
+        columns = _edge_columns([data for u in nodes for data in adj[u].values()])
+        header['weight'] = 'weight' if 'weight' in columns else None
+
+    header['node_labels'] = _put_labels(nodes, arrays)
+    header['edge_attrs'] = {}
+    for key, column in columns.items():
+        name = 'edge_attr.{}'.format(len(header['edge_attrs']))
+        header['edge_attrs'][name] = {'key': key, 'pickled': _put_column(name, column, arrays)}
+    node_attr = [dict(G.nodes[u]) for u in nodes]
+    arrays['node_attr'] = _pickled(node_attr if any(node_attr) else None)
+    arrays['graph_attr'] = _pickled(dict(G.graph))
+    _write(path, header, arrays)
+
+
+def load(path, mmap=True, frozen=None, weight='weight'):
+    """Reads a graph written by `save`.
+
+    Parameters
+    ----------
+    path : string
+        The file path.
+
+    mmap : boolean, optional (default : True)
+        Whether to memory-map the arrays of the file instead of reading them.
+        Only a frozen graph keeps the mapped arrays.
+
+    frozen : boolean or None, optional (default : None)
+        If True, returns a read-only `CSRGraph` on the arrays of the file, which
+        loads in a time independent of the number of edges. If False, rebuilds
+        a `Graph` or `DiGraph`. If None, the class of the saved graph.
+
+    weight : string or None, optional (default : 'weight')
+        For a frozen graph of a saved `Graph` or `DiGraph`, the edge attribute
+        used as the weights of the snapshot. Edges without it get weight 1.
+
+    Returns
+    -------
+    G : easygraph.Graph, easygraph.DiGraph or easygraph.CSRGraph
+
+    Notes
+    -----
+    Part of the file is unpickled, only load the files you trust.
+
+    See Also
+    --------
+    save
+
+    Examples
+    --------
+    >>> G = eg.load('youtube.egb')
+
+    Share one copy of a large graph among the processes of a machine
+
+    >>> G_csr = eg.load('youtube.egb', frozen=True)
+    >>> eg.betweenness_centrality(G_csr, n_workers=-1)
+
+    """
+    header, arrays = _read(path, mmap)
+    if header.get('format_version') != FORMAT_VERSION:
+        raise ValueError("Unsupported file format version {}.".format(header.get('format_version')))
+    nodes = _get_labels(header['node_labels'], arrays)
+    node_attr = pickle.loads(arrays['node_attr'].tobytes())
+    graph_attr = pickle.loads(arrays['graph_attr'].tobytes())
+    columns = {}
+    for name, info in header['edge_attrs'].items():
+        columns[info['key']] = _get_column(name, info['pickled'], arrays)
+    indptr, indices = arrays['indptr'], arrays['indices']
+    directed = header['directed']
+    if frozen is None:
+        frozen = header['frozen']
+
+    if frozen:
+        if header['frozen']:
+            weight = header['weight']
+        weights = _weights_of(columns.get(weight), len(indices))
+        return CSRGraph(indptr, indices, weights, nodes, directed=directed, weight=weight,
+                        node_attr=node_attr, graph_attr=graph_attr)
+
+    G = DiGraph(**graph_attr) if directed else Graph(**graph_attr)
+    G.add_nodes(nodes, nodes_attr=node_attr or [])
+    tails = np.repeat(np.arange(len(nodes)), np.diff(indptr))
+    heads = np.asarray(indices)
+    if not directed:
+        kept = tails <= heads
+        tails, heads = tails[kept], heads[kept]
+        columns = {key: (values[kept] if isinstance(values, np.ndarray) else
+                         [value for value, keep in zip(values, kept) if keep],
+                         None if present is None else present[kept])
+                   for key, (values, present) in columns.items()}
+    us = [nodes[i] for i in tails.tolist()]
+    vs = [nodes[j] for j in heads.tolist()]
+    if not columns or (set(columns) == {'weight'} and columns['weight'][1] is None):
+        # The edges of most large graphs have no attribute but a weight
+        weights = columns['weight'][0] if columns else None
+        if weights is not None and not isinstance(weights, list):
+            weights = weights.tolist()
+        G._add_edges_in_bulk(us, vs, weights)
+        return G
+    rows = [[] for _ in range(len(heads))]
+    for key, (values, present) in columns.items():
+        values = values if isinstance(values, list) else values.tolist()
+        if present is None:
+            for row, value in zip(rows, values):
+                row.append((key, value))
+        else:
+            for row, value, keep in zip(rows, values, present.tolist()):
+                if keep:
+                    row.append((key, value))
+    G.add_edges(list(zip(us, vs)), edges_attr=[dict(row) for row in rows])
+    return G
+
+
+def _edge_columns(datadicts):
+    """Returns the values of each edge attribute key, `_MISSING` where an edge lacks it."""
+    columns = {}
+    for p, data in enumerate(datadicts):
+        for key, value in data.items():
+            if key not in columns:
+                columns[key] = [_MISSING] * len(datadicts)
+            columns[key][p] = value
+    return columns
+
+
+def _put_column(name, column, arrays):
+    """Stores a column of edge attribute values, and returns whether it is pickled."""
+    if isinstance(column, np.ndarray):
+        arrays[name] = column
+        return False
+    present = [value is not _MISSING for value in column]
+    if not all(present):
+        arrays[name + '.present'] = np.array(present, dtype=np.bool_)
+    kinds = {type(value) for value in column if value is not _MISSING}
+    for dtype, types in ((np.bool_, {bool}), (np.int64, {int}), (np.float64, {float})):
+        if kinds <= types:
+            try:
+                arrays[name] = np.array([0 if value is _MISSING else value for value in column],
+                                        dtype=dtype)
+                return False
+            except OverflowError:
+                break
+    arrays[name] = _pickled([None if value is _MISSING else value for value in column])
+    return True
+
+
+def _get_column(name, pickled, arrays):
+    """Returns the values and the mask of the edges having the attribute, None if all have it."""
+    values = arrays[name]
+    if pickled:
+        values = pickle.loads(values.tobytes())
+    return values, arrays.get(name + '.present')
+
+
+def _weights_of(column, m):
+    if column is None:
+        return np.ones(m)
+    values, present = column
+    if isinstance(values, list):
+        values = [value if isinstance(value, (bool, int, float)) else 1 for value in values]
+    if present is None:
+        # Keeps the memory-mapped array of float weights as is
+        return np.asarray(values, dtype=np.float64)
+    return np.where(present, values, 1).astype(np.float64)
+
+
+def _put_labels(nodes, arrays):
+    """Stores the node labels, and returns how they are stored."""
+    if nodes and all(type(node) is int for node in nodes):
+        try:
+            arrays['node_labels'] = np.array(nodes, dtype=np.int64)
+            return 'int'
+        except OverflowError:
+            pass
+    elif all(type(node) is str for node in nodes):
+        arrays['node_labels'] = np.frombuffer(''.join(nodes).encode('utf-8'), dtype=np.uint8)
+        offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+        np.cumsum([len(node) for node in nodes], out=offsets[1:])
+        arrays['node_labels.offsets'] = offsets
+        return 'str'
+    arrays['node_labels'] = _pickled(nodes)
+    return 'pickle'
+
+
+def _get_labels(kind, arrays):
+    labels = arrays['node_labels']
+    if kind == 'int':
+        return labels.tolist()
+    if kind == 'str':
+        text = labels.tobytes().decode('utf-8')
+        offsets = arrays['node_labels.offsets'].tolist()
+        return [text[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+    return pickle.loads(labels.tobytes())
+
+
+def _pickled(obj):
+    return np.frombuffer(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL), dtype=np.uint8)
+
+
+def _aligned(offset):
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def _write(path, header, arrays):
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    # The offsets are relative to the aligned end of the header
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = [array.dtype.str, list(array.shape), offset]
+        offset = _aligned(offset + array.nbytes)
+    header['arrays'] = layout
+    encoded = json.dumps(header).encode('utf-8')
+    start = _aligned(len(MAGIC) + 8 + len(encoded))
+    with open(path, 'wb') as fp:
+        fp.write(MAGIC)
+        fp.write(np.uint64(len(encoded)).tobytes())
+        fp.write(encoded)
+        for name, array in arrays.items():
+            fp.write(b'\x00' * (start + layout[name][2] - fp.tell()))
+            fp.write(array.tobytes() if array.size else b'')
+
+
+def _read(path, mmap):
+    with open(path, 'rb') as fp:
+        if fp.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{} is not a graph file written by easygraph.save.".format(path))
+        length = int(np.frombuffer(fp.read(8), dtype=np.uint64)[0])
+        header = json.loads(fp.read(length).decode('utf-8'))
+        start = _aligned(len(MAGIC) + 8 + length)
+        arrays = {}
+        for name, (dtype, shape, offset) in header['arrays'].items():
+            count = int(np.prod(shape))
+            if count == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            elif mmap:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=start + offset,
+                                         shape=tuple(shape))
+            else:
+                fp.seek(start + offset)
+                arrays[name] = np.fromfile(fp, dtype=dtype, count=count).reshape(shape)
+    return header, arrays
@@ -2,4 +2,7 @@ from easygraph.utils.decorators import *
 from easygraph.utils.mapped_queue import *
 from easygraph.utils.convert_to_matrix import *
 from easygraph.utils.alias import *
-from easygraph.utils.index_of_node import *
\ No newline at end of file
+from easygraph.utils.index_of_node import *
+from easygraph.utils.parallel import *
+
+from easygraph.utils.edgelist import *
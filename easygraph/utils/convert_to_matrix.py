@@ -1,5 +1,7 @@
 __all__ = [
-    "to_numpy_matrix"
+    "to_numpy_matrix",
+    "to_scipy_sparse",
+    "from_scipy_sparse",
 ]
 
 def to_numpy_matrix(G, edge_sign = 1.0, not_edge_sign = 0.0):
@@ -16,13 +18,125 @@ def to_numpy_matrix(G, edge_sign = 1.0, not_edge_sign = 0.0):
 
     """
     import numpy as np
-    index_of_node = dict(zip(G.nodes, range(len(G))))
+    from easygraph.classes import CSRGraph
+    G = CSRGraph.from_graph(G, weight=None)
     N = len(G)
     M = np.full((N, N), not_edge_sign)
-
-    for u, udict in G.adj.items():
-        for v, data in udict.items():
-            M[index_of_node[u], index_of_node[v]] = edge_sign
+    M[G.tails(), G.indices] = edge_sign
 
     M = np.asmatrix(M)
     return M
+
+def to_scipy_sparse(G, weight='weight', dtype=None, nodelist=None, format='csr'):
+    """
+    Returns the graph adjacency matrix as a SciPy sparse matrix.
+
+    The matrix is assembled from the CSR arrays of the graph in bulk. The arrays
+    of a `CSRGraph` are reused as they are, so freezing a graph once caches its
+    node order and matrix for repeated conversions.
+
+    Parameters
+    ----------
+    G : easygraph.Graph, easygraph.DiGraph or easygraph.CSRGraph
+
+    weight : string or None, optional (default : 'weight')
+        The key for edge weight. Edges without this attribute get weight 1.
+        If None, all the weights will be 1. For a `CSRGraph`, any non-None value
+        uses the weights of the snapshot.
+
+    dtype : numpy dtype or None, optional (default : None)
+        The dtype of the matrix. If None, float64.
+
+    nodelist : list or None, optional (default : None)
+        The nodes of the rows and columns, in order. If None, the nodes of `G`.
+        The edges to nodes not in *nodelist* are left out.
+
+    format : string, optional (default : 'csr')
+        The sparse format of the matrix, e.g. 'csr', 'csc' or 'coo'.
+
+    Returns
+    -------
+    A : scipy.sparse matrix
+        ``A[i, j]`` is the weight of the edge from the i-th to the j-th node.
+        For undirected graph the matrix is symmetric.
+
+    Examples
+    --------
+    >>> A = to_scipy_sparse(G, weight=None, format='coo')
+
+    """
+    from easygraph.classes import CSRGraph
+    G_csr = CSRGraph.from_graph(G, weight=weight)
+    A = G_csr._as_csgraph().copy()
+    if weight is None:
+        A.data[:] = 1
+    if nodelist is not None:
+        nodelist = list(nodelist)
+        if len(set(nodelist)) != len(nodelist):
+            raise ValueError("nodelist contains duplicates.")
+        index = [G_csr.index_of_node[node] for node in nodelist]
+        A = A[index][:, index]
+    if dtype is not None:
+        A = A.astype(dtype)
+    return A.asformat(format)
+
+def from_scipy_sparse(A, create_using=None, nodelist=None, weight='weight'):
+    """
+    Returns a graph from the adjacency matrix in a SciPy sparse matrix.
+
+    Parameters
+    ----------
+    A : scipy.sparse matrix
+        A square matrix, each stored entry ``A[i, j]`` is an edge from the i-th
+        to the j-th node.
+
+    create_using : easygraph graph class or instance, optional (default : None)
+        The graph to fill, e.g. `eg.DiGraph`. If None, a new `eg.Graph`.
+        For undirected graph, the entries ``A[i, j]`` and ``A[j, i]`` are the same edge.
+
+    nodelist : list or None, optional (default : None)
+        The nodes of the rows and columns, in order. If None, 0 to n-1.
+
+    weight : string or None, optional (default : 'weight')
+        The edge attribute the entries are stored as. If None, they are not stored.
+
+    Returns
+    -------
+    G : easygraph graph
+
+    Examples
+    --------
+    >>> G = from_scipy_sparse(A, create_using=eg.DiGraph)
+
+    """
+    import numpy as np
+    from easygraph.classes import Graph
+    n, m = A.shape
+    if n != m:
+        raise ValueError("Adjacency matrix not square: nx,ny={}".format(A.shape))
+    if create_using is None:
+        G = Graph()
+    elif isinstance(create_using, type):
+        G = create_using()
+    else:
+        G = create_using
+    if nodelist is None:
+        nodelist = range(n)
+    nodelist = list(nodelist)
+    if len(nodelist) != n:
+        raise ValueError("nodelist should have one node per row of the matrix.")
+    A = A.tocoo()
+    rows, cols, data = A.row, A.col, A.data
+    if not G.is_directed():
+        # Each undirected edge once, from the entry in the upper triangle if any
+        keys = np.minimum(rows, cols).astype(np.int64) * n + np.maximum(rows, cols)
+        order = np.lexsort((rows > cols, keys))
+        first = order[np.r_[True, keys[order][1:] != keys[order][:-1]]]
+        rows, cols, data = rows[first], cols[first], data[first]
+    G.add_nodes(nodelist)
+    edges = [(nodelist[i], nodelist[j]) for i, j in zip(rows.tolist(), cols.tolist())]
+    if weight is None:
+        G.add_edges(edges)
+    else:
+        G.add_edges(edges, edges_attr=[{weight: w} for w in data.tolist()])
+    return G
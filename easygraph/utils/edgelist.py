@@ -0,0 +1,131 @@
+import bz2
+import gzip
+
+import numpy as np
+
+__all__ = [
+    "iter_edge_list",
+]
+
+# Stands for the line breaks among the tokens of a chunk, so that the rows are
+# found with one vectorized comparison instead of splitting line by line.
+_LINE_END = '\x01'
+
+
+def iter_edge_list(file, delimiter=None, comments='#', nodetype=None, weighted=False,
+                   chunk_size=1 << 24):
+    """Reads an edge list file chunk by chunk.
+
+    Each line holds the two end nodes of an edge, then optionally its weight.
+    Further columns are ignored, and so are the lines with too few columns.
+
+    Parameters
+    ----------
+    file : string
+        The file path. Files ending with `.gz` or `.bz2` are decompressed on the fly.
+
+    delimiter : string or None, optional (default : None)
+        The column separator. If None, any whitespace or comma.
+
+    comments : string or None, optional (default : '#')
+        The lines starting with it, after any leading whitespace, are ignored.
+        Elsewhere on a line it is an ordinary character. If None, there are no comments.
+
+    nodetype : callable or None, optional (default : None)
+        Converts the node labels, e.g. `int`. If None, the labels stay strings.
+
+    weighted : boolean, optional (default : False)
+        Whether to read the third column as a float weight. The lines whose
+        weight can not be read are skipped.
+
+    chunk_size : int, optional (default : 2 ** 24)
+        The approximate number of characters read at a time.
+
+    Yields
+    ------
+    (us, vs, weights) : (list, list, list or None)
+        The end nodes and the weights of the edges of one chunk. `weights` is
+        None if not *weighted*.
+
+    Examples
+    --------
+    >>> for us, vs, _ in iter_edge_list('youtube-links.txt.gz', nodetype=int):
+    ...     print(len(us))
+
+    """
+    need = 3 if weighted else 2
+    with _open_text(file) as fp:
+        while True:
+            lines = fp.readlines(chunk_size)
+            if not lines:
+                return
+            tokens, starts, ends = _tokenize(lines, delimiter, comments)
+            starts = starts[ends - starts >= need]
+            if delimiter is not None:
+                # empty fields between two delimiters
+                starts = starts[(tokens[starts] != '') & (tokens[starts + 1] != '')]
+            us, vs, weights = tokens[starts], tokens[starts + 1], None
+            if nodetype is not None:
+                us, valid = _parse(us, nodetype)
+                vs, valid = _parse(vs, nodetype, valid)
+                us, vs, starts = us[valid], vs[valid], starts[valid]
+            if weighted:
+                weights, valid = _parse(tokens[starts + 2], float)
+                us, vs, weights = us[valid], vs[valid], weights[valid]
+            if weights is not None:
+                weights = weights.tolist()
+            yield us.tolist(), vs.tolist(), weights
+
+
+def _open_text(file):
+    if file.endswith('.gz'):
+        return gzip.open(file, 'rt')
+    if file.endswith('.bz2'):
+        return bz2.open(file, 'rt')
+    return open(file, 'r')
+
+
+def _tokenize(lines, delimiter, comments):
+    """Returns the tokens of the lines, and the index of the first token and of
+    the `_LINE_END` token following each line.
+    """
+    text = ''.join(lines)
+    if comments is not None and comments in text:
+        # Only whole comment lines, a node label may contain the comment string
+        text = ''.join('\n' if line.lstrip().startswith(comments) else line.rstrip('\r\n') + '\n'
+                       for line in lines)
+    elif not text.endswith('\n'):
+        text += '\n'
+    if delimiter is None:
+        tokens = text.replace(',', ' ').replace('\n', ' ' + _LINE_END + ' ').split()
+    else:
+        text = text.replace('\r\n', '\n').replace('\n', delimiter + _LINE_END + delimiter)
+        tokens = [token.strip() for token in text.split(delimiter)]
+    tokens = np.array(tokens, dtype=object)
+    ends = np.flatnonzero(tokens == _LINE_END)
+    starts = np.empty_like(ends)
+    starts[:1] = 0
+    starts[1:] = ends[:-1] + 1
+    return tokens, starts, ends
+
+
+def _parse(tokens, convert, valid=None):
+    """Converts the tokens, and returns them with the mask of the convertible ones.
+
+    The mask is combined with *valid* if given.
+    """
+    if valid is None:
+        valid = np.ones(len(tokens), dtype=bool)
+    if convert is int or convert is float:
+        try:
+            return tokens.astype(convert).astype(object), valid
+        except ValueError:
+            pass
+    values = np.empty(len(tokens), dtype=object)
+    valid = valid.copy()
+    for i, token in enumerate(tokens):
+        try:
+            values[i] = convert(token)
+        except ValueError:
+            valid[i] = False
+    return values, valid
@@ -5,7 +5,7 @@ Codes from NetworkX - http://networkx.github.io/
 
 import heapq
 
-__all__ = ['MappedQueue']
+__all__ = ['MappedQueue', 'IndexedHeap']
 
 
 class MappedQueue(object):
@@ -183,3 +183,122 @@ class MappedQueue(object):
                 # Invariant is satisfied
                 break
         return pos
+
+
+class IndexedHeap(object):
+    """
+    The IndexedHeap class implements a minimum heap of the integer keys
+    0, ..., n - 1 by priority, with the smallest key first among equal
+    priorities. The heap and the position and priority of each key are flat
+    lists indexed by the keys, instead of the dict of MappedQueue from
+    elements to positions, so an entry takes a few machine words and no
+    tuple. Any key can be pushed, updated or removed in O(log n) time.
+
+    Examples
+    --------
+
+    >>> q = IndexedHeap(5)
+    >>> q.push(3, 0.5)
+    >>> q.push(1, 0.2)
+    >>> q.push(4, 0.2)
+    >>> q.update(3, 0.1)
+    >>> [q.pop() for i in range(len(q))]
+    [(3, 0.1), (1, 0.2), (4, 0.2)]
+
+    """
+
+    def __init__(self, n):
+        """Empty heap of the keys 0, ..., n - 1."""
+        self.h = []
+        self.pos = [-1] * n
+        self.priority = [0.0] * n
+
+    def __len__(self):
+        return len(self.h)
+
+    def __contains__(self, key):
+        return self.pos[key] >= 0
+
+    def peek(self):
+        """Return the key of smallest priority and its priority."""
+        key = self.h[0]
+        return key, self.priority[key]
+
+    def push(self, key, priority):
+        """Add a key to the heap, or update its priority if already in."""
+        if self.pos[key] >= 0:
+            self.update(key, priority)
+            return
+        self.priority[key] = priority
+        self.pos[key] = len(self.h)
+        self.h.append(key)
+        self._siftdown(len(self.h) - 1)
+
+    def pop(self):
+        """Remove and return the key of smallest priority and its priority."""
+        key = self.h[0]
+        self.remove(key)
+        return key, self.priority[key]
+
+    def update(self, key, priority):
+        """Change the priority of a key in the heap."""
+        self.priority[key] = priority
+        pos = self._siftup(self.pos[key])
+        self._siftdown(pos)
+
+    def remove(self, key):
+        """Remove a key from the heap."""
+        pos = self.pos[key]
+        if pos < 0:
+            raise KeyError(key)
+        self.pos[key] = -1
+        last = self.h.pop()
+        if pos == len(self.h):
+            return
+        # Replace key with last key
+        self.h[pos] = last
+        self.pos[last] = pos
+        pos = self._siftup(pos)
+        self._siftdown(pos)
+
+    def _less(self, a, b):
+        pa, pb = self.priority[a], self.priority[b]
+        return pa < pb or (pa == pb and a < b)
+
+    def _siftup(self, pos):
+        """Move the key at pos down to a leaf by repeatedly moving the smaller
+        child up."""
+        h, position = self.h, self.pos
+        key = h[pos]
+        end_pos = len(h)
+        child_pos = (pos << 1) + 1
+        while child_pos < end_pos:
+            right_pos = child_pos + 1
+            if right_pos < end_pos and self._less(h[right_pos], h[child_pos]):
+                child_pos = right_pos
+            child = h[child_pos]
+            h[pos] = child
+            position[child] = pos
+            pos = child_pos
+            child_pos = (pos << 1) + 1
+        h[pos] = key
+        position[key] = pos
+        return pos
+
+    def _siftdown(self, pos):
+        """Restore invariant by repeatedly replacing out-of-place key with
+        its parent."""
+        h, position = self.h, self.pos
+        key = h[pos]
+        while pos > 0:
+            parent_pos = (pos - 1) >> 1
+            parent = h[parent_pos]
+            if self._less(key, parent):
+                h[pos] = parent
+                position[parent] = pos
+                pos = parent_pos
+            else:
+                break
+        h[pos] = key
+        position[key] = pos
+        return pos
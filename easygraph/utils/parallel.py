@@ -0,0 +1,168 @@
+"""
+Shared scheduler for the algorithms that repeat the same work for every node,
+e.g. one shortest-path search per source in betweenness or closeness centrality.
+
+The items (usually nodes) are cut into many small chunks that idle workers pick
+up one at a time, so a few expensive chunks do not hold back the others. The
+object the workers read from, usually the graph, is handed over once instead
+of being pickled with every task: with the `fork` start method the workers
+inherit it from the parent process, otherwise it is sent once per worker.
+"""
+import os
+
+__all__ = [
+    "parallel_map",
+    "parallel_sum",
+]
+
+BACKENDS = ('serial', 'process', 'thread')
+
+# The chunks per worker when *chunk_size* is not given, small enough for
+# idle workers to pick up the tail of the work.
+CHUNKS_PER_WORKER = 8
+
+# Read by the worker processes, set in each of them by the pool initializer.
+_shared = None
+
+
+def parallel_map(func, items, shared=None, n_workers=None, backend=None, chunk_size=None):
+    """Returns the results of ``func(chunk, shared)`` for the chunks of *items*, in order.
+
+    Parameters
+    ----------
+    func : callable
+        A module-level function ``func(chunk, shared)``, where chunk is a list of items.
+
+    items : iterable
+        The items to process, e.g. the nodes of a graph.
+
+    shared : object, optional (default : None)
+        Read-only object passed to every call of *func*, e.g. the graph.
+
+    n_workers : int or None, optional (default : None)
+        The number of workers. None or 1 for serial computing, -1 for one worker per CPU.
+
+    backend : string or None, optional (default : None)
+        One of 'serial', 'process', 'thread'. If None, 'serial' for one worker
+        and 'process' otherwise.
+
+    chunk_size : int or None, optional (default : None)
+        The number of items per task. If None, the items are cut into about
+        8 chunks per worker.
+
+    Returns
+    -------
+    results : list
+        The result of each chunk, in the order of *items*.
+
+    Examples
+    --------
+    >>> def count_neighbors(nodes, G):
+    ...     return [len(G[node]) for node in nodes]
+    >>> parallel_map(count_neighbors, G.nodes, shared=G, n_workers=8)
+
+    """
+    return list(_imap(func, items, shared, n_workers, backend, chunk_size))
+
+
+def parallel_sum(func, items, shared=None, n_workers=None, backend=None, chunk_size=None):
+    """Returns the sum of ``func(chunk, shared)`` over the chunks of *items*.
+
+    The chunk results, usually NumPy arrays, are added up as they arrive, so only
+    one of them per worker is alive at a time.
+
+    Parameters
+    ----------
+    func : callable
+        A module-level function ``func(chunk, shared)``, where chunk is a list of items.
+
+    items : iterable
+        The items to process, e.g. the nodes of a graph.
+
+    shared : object, optional (default : None)
+        Read-only object passed to every call of *func*, e.g. the graph.
+
+    n_workers : int or None, optional (default : None)
+        The number of workers. None or 1 for serial computing, -1 for one worker per CPU.
+
+    backend : string or None, optional (default : None)
+        One of 'serial', 'process', 'thread'. If None, 'serial' for one worker
+        and 'process' otherwise.
+
+    chunk_size : int or None, optional (default : None)
+        The number of items per task. If None, the items are cut into about
+        8 chunks per worker.
+
+    Returns
+    -------
+    total : object
+        The sum of the chunk results, None if there is no item.
+
+    """
+    total = None
+    for result in _imap(func, items, shared, n_workers, backend, chunk_size):
+        if total is None:
+            total = result
+        else:
+            total += result
+    return total
+
+
+def _imap(func, items, shared, n_workers, backend, chunk_size):
+    items = list(items)
+    n_workers = _resolve_n_workers(n_workers)
+    if backend is None:
+        backend = 'serial' if n_workers == 1 else 'process'
+    if backend not in BACKENDS:
+        raise ValueError("backend should be one of {}, got {}.".format(BACKENDS, backend))
+    if chunk_size is None:
+        chunk_size = max(1, -(-len(items) // (n_workers * CHUNKS_PER_WORKER)))
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+    if backend == 'serial' or len(chunks) <= 1:
+        for chunk in chunks:
+            yield func(chunk, shared)
+    elif backend == 'thread':
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(n_workers) as executor:
+            yield from executor.map(lambda chunk: func(chunk, shared), chunks)
+    else:
+        yield from _process_imap(func, chunks, shared, n_workers)
+
+
+def _process_imap(func, chunks, shared, n_workers):
+    import multiprocessing
+    tasks = [(func, chunk) for chunk in chunks]
+    if 'fork' in multiprocessing.get_all_start_methods():
+        # The forked workers get the initializer arguments without any pickling
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()
+    # The parent never sets _shared, so concurrent calls from several threads do not race
+    pool = context.Pool(n_workers, initializer=_set_shared, initargs=(shared,))
+    try:
+        # chunksize=1: each idle worker takes the next chunk
+        yield from pool.imap(_call_with_shared, tasks, chunksize=1)
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _set_shared(shared):
+    global _shared
+    _shared = shared
+
+
+def _call_with_shared(task):
+    func, chunk = task
+    return func(chunk, _shared)
+
+
+def _resolve_n_workers(n_workers):
+    if n_workers is None:
+        return 1
+    if n_workers == -1:
+        return os.cpu_count() or 1
+    if n_workers < 1:
+        raise ValueError("n_workers should be a positive integer or -1, got {}.".format(n_workers))
+    return n_workers